@@ -1,29 +1,42 @@
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import json
-from dataclasses import asdict
-from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, Callable, Optional
 
 from config import Config
 from server import StockDataClient, TradingDataClient, get_logger
+from server.models import SeriesUpdate
+from server.fanout import ClientConnection, ClientRegistry
+from server.metrics import metrics
+from server.serialization import ENCODINGS, dumps
+from server.tracing import traces
+from server.snapshot_cache import EncodedSnapshot, SnapshotCache
 
 logger = get_logger(__name__)
 
 config = Config()
 
-def to_dict(obj):
-    d = asdict(obj)
-    if 'timestamp' in d and isinstance(d['timestamp'], datetime):
-        d['timestamp'] = d['timestamp'].isoformat()
-    return d
-
-app = FastAPI()
-
 stock_client = None
 trading_client = None
-connected = set()
+# Chosen by the entry point: main.py runs ingestion itself, worker.py follows it over the pub/sub socket.
+lifespan_factory: Optional[Callable[[FastAPI], AsyncContextManager[None]]] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if lifespan_factory is None:
+        yield
+        return
+    async with lifespan_factory(app):
+        yield
+
+
+app = FastAPI(lifespan=lifespan)
+clients = ClientRegistry(config.ws_max_pending, config.ws_stall_timeout)
+snapshot_cache = SnapshotCache()
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +47,11 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(asyncio.TimeoutError)
+async def timeout_handler(request, exc):
+    return JSONResponse(content={"error": "Upstream request timed out"}, status_code=504)
+
+
 def set_stock_client(client: StockDataClient):
     global stock_client
     stock_client = client
@@ -44,40 +62,104 @@ def set_trading_client(client: TradingDataClient):
     trading_client = client
 
 
-async def send_message(message):
-    if isinstance(message, dict):
-        message = {k: [to_dict(item) if hasattr(item, '__dataclass_fields__') else item for item in v] if isinstance(v, list) else v for k, v in message.items()}
-    message_str = json.dumps(message)
-    await asyncio.gather(*(ws.send_text(message_str) for ws in connected), return_exceptions=True)
+def set_lifespan(factory: Callable[[FastAPI], AsyncContextManager[None]]):
+    global lifespan_factory
+    lifespan_factory = factory
+
+
+def resolve_symbol(symbol: Optional[str]) -> str:
+    return symbol.strip().upper() if symbol else config.symbols[0]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+
+async def get_encoded_snapshot(symbol: str) -> Optional[EncodedSnapshot]:
+    # Encoding happens at most once per symbol version; every reader in between gets the same bytes.
+    version = stock_client.get_version(symbol) if stock_client else None
+    if version is None:
+        return None
+    cached = snapshot_cache.get(symbol, version)
+    if cached is not None:
+        return cached
+    snapshot = await stock_client.get_current_data(symbol)
+    return snapshot_cache.store(snapshot) if snapshot is not None else None
+
+
+async def send_message(update: SeriesUpdate):
+    clients.broadcast(update)
+
+
+async def send_snapshot(client: ClientConnection) -> None:
+    snapshot = await get_encoded_snapshot(client.symbol)
+    if snapshot is not None and snapshot.snapshot is not None:
+        client.send_snapshot(snapshot.snapshot, snapshot.message_for(client.encoding))
+    elif snapshot is not None:
+        client.send(snapshot.message_for(client.encoding))
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, symbol: Optional[str] = None, encoding: str = "json"):
+    # `encoding` picks the wire format for this connection; see server/serialization.py. Errors are always JSON.
+    symbol = resolve_symbol(symbol)
     await websocket.accept()
-    logger.info("WebSocket connection established")
-    connected.add(websocket)
+    if encoding not in ENCODINGS:
+        await websocket.send_text(json.dumps({"type": "error", "error": f"Unknown encoding {encoding}, expected one of {', '.join(ENCODINGS)}"}))
+        await websocket.close()
+        return
+    if stock_client and not stock_client.ready.is_set():
+        # Held open while the backfill runs; the snapshot follows as soon as it is done.
+        await websocket.send_text(json.dumps({"type": "status", "status": stock_client.status}))
+        await stock_client.ready.wait()
+    if not stock_client or stock_client.get_version(symbol) is None:
+        await websocket.send_text(json.dumps({"type": "error", "error": f"Unknown symbol {symbol}"}))
+        await websocket.close()
+        return
+    logger.info(f"WebSocket connection established for {symbol} ({encoding})")
+    client = clients.add(websocket, symbol, encoding)
     try:
+        await send_snapshot(client)
         while True:
-            await websocket.receive_text()
+            try:
+                request = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "resync":
+                await send_snapshot(client)
     except Exception as e:
         logger.info(f"Client disconnected: {e}")
     finally:
-        connected.remove(websocket)
+        clients.remove(client)
         logger.info("WebSocket connection closed")
 
 
 @app.get("/data")
-async def get_data():
+async def get_data(request: Request, symbol: Optional[str] = None):
     if stock_client:
-        data = await stock_client.get_current_data()
-        return JSONResponse(content={k: [to_dict(item) for item in v] for k, v in data.items()})
+        if not stock_client.ready.is_set():
+            return JSONResponse(content={"status": stock_client.status}, status_code=503, headers={"Retry-After": "1"})
+        symbol = resolve_symbol(symbol)
+        snapshot = await get_encoded_snapshot(symbol)
+        if snapshot is None:
+            return JSONResponse(content={"error": f"Unknown symbol {symbol}"}, status_code=404)
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
     return JSONResponse(content={"error": "No stock client available"})
 
 
+@app.get("/status")
+async def get_status():
+    return JSONResponse(content={"status": stock_client.status if stock_client else "warming"})
+
+
 @app.get("/positions")
 async def get_positions():
     if trading_client:
-        data = trading_client.get_open_positions()
+        data = await trading_client.get_open_positions_async()
         return JSONResponse(content=data)
     return JSONResponse(content={"error": "No trading client available"})
 
@@ -85,7 +167,7 @@ async def get_positions():
 @app.get("/account")
 async def get_account_info():
     if trading_client:
-        data = trading_client.get_account_info()
+        data = await trading_client.get_account_info_async()
         return JSONResponse(content=data)
     return JSONResponse(content={"error": "No trading client available"})
 
@@ -93,11 +175,29 @@ async def get_account_info():
 @app.get("/portfoliovalue")
 async def get_portfolio_value():
     if trading_client:
-        one, fifteen, hour, day = trading_client.get_account_value()
+        one, fifteen, hour, day = await trading_client.get_account_value_async()
         return JSONResponse(content={"one": one, "fifteen": fifteen, "hour": hour, "day": day})
     return JSONResponse(content={"error": "No trading client available"})
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces")
+async def get_traces(symbol: Optional[str] = None, limit: int = 50):
+    return Response(dumps([trace.summary() for trace in traces.recent(limit, symbol.upper() if symbol else None)]), media_type="application/json")
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    trace = traces.get(trace_id)
+    if trace is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown trace"})
+    return Response(dumps(trace.to_dict()), media_type="application/json")
+
+
 @app.get("/settings")
 async def get_settings():
     if stock_client:
@@ -0,0 +1,27 @@
+import asyncio
+from typing import List
+
+
+class FakeWebSocket:
+    # Accepts sends like a Starlette WebSocket; `delay` turns it into a slow reader.
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay: float = delay
+        self.sent: int = 0
+        self.bytes: int = 0
+        self.closed: bool = False
+
+    async def send_text(self, text: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+        self.bytes += len(text)
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.send_text(data)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def client_pool(count: int, slow_every: int = 0, delay: float = 0.01) -> List[FakeWebSocket]:
+    return [FakeWebSocket(delay if slow_every and index % slow_every == 0 else 0.0) for index in range(count)]
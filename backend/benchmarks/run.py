@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.fake_clients import client_pool
+from benchmarks.synthetic import START, alpaca_bars, bar_columns, bar_messages, data_points, history
+from server.bars import BarColumns
+from server.data_processor import DataProcessor
+from server.fanout import ClientRegistry
+from server.models import SeriesUpdate
+from server.serialization import ENCODINGS, encode_message
+from server.stockClient import StockDataClient
+from server.symbol_state import TIMEFRAMES, SymbolState
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Every configurable indicator, to price the pipeline against the built-in three.
+ALL_INDICATORS = ["ema:12", "macd:12:26:9", "bollinger:20:2", "atr:14", "vwap"]
+
+# One round returns (elapsed seconds, operations); results are reported per operation.
+Round = Callable[[], Tuple[float, int]]
+
+
+def indicators_vectorized(bars: int, indicators: Sequence[str] = ()) -> Round:
+    processor, columns = DataProcessor(indicators), bar_columns(bars)
+
+    def round_() -> Tuple[float, int]:
+        started = time.perf_counter()
+        processor.compute_indicators(columns)
+        return time.perf_counter() - started, 1
+
+    return round_
+
+
+def indicators_incremental(bars: int, indicators: Sequence[str] = ()) -> Round:
+    processor = DataProcessor(indicators)
+    points = bar_columns(bars).to_points()
+
+    def round_() -> Tuple[float, int]:
+        engine = processor.create_engine()
+        started = time.perf_counter()
+        for point in points:
+            engine.update_point(point)
+        return time.perf_counter() - started, len(points)
+
+    return round_
+
+
+def fetch_post_processing(bars: int) -> Round:
+    # Everything fetch_bars does after Alpaca answers: columns, indicators and the point list.
+    processor, raw = DataProcessor(), alpaca_bars(bars)
+
+    def round_() -> Tuple[float, int]:
+        started = time.perf_counter()
+        processor.compute_indicators(BarColumns.from_bars(raw)).to_points()
+        return time.perf_counter() - started, 1
+
+    return round_
+
+
+def loaded_state(symbol: str, depth: int) -> SymbolState:
+    # Backfilled up to the minute before the first live bar of bar_messages(..., offset=depth).
+    end = START + timedelta(minutes=depth - 1)
+    state = SymbolState(symbol, DataProcessor(), depth)
+    state.load({key: DataProcessor().compute_indicators(history(depth, minutes, end)) for key, minutes in TIMEFRAMES.items()})
+    return state
+
+
+def encode_snapshot(depth: int, encoding: str = "json") -> Round:
+    state = loaded_state("TSLA", depth)
+
+    def round_() -> Tuple[float, int]:
+        started = time.perf_counter()
+        encode_message("snapshot", state.snapshot(), encoding)
+        return time.perf_counter() - started, 1
+
+    return round_
+
+
+def encode_delta(encoding: str = "json") -> Round:
+    points = data_points(4)
+    update = SeriesUpdate("TSLA", 2, {key: [point] for key, point in zip(TIMEFRAMES, points)})
+
+    def round_() -> Tuple[float, int]:
+        started = time.perf_counter()
+        for _ in range(100):
+            encode_message("delta", update, encoding)
+        return time.perf_counter() - started, 100
+
+    return round_
+
+
+def fanout_broadcast(clients: int, messages: int = 50) -> Round:
+    # What app.send_message does per bar, including delivery to every fake socket.
+    points = data_points(messages)
+
+    async def run() -> float:
+        registry = ClientRegistry(max_pending=messages + 1, stall_timeout=10)
+        sockets = client_pool(clients)
+        for socket in sockets:
+            registry.add(socket, "TSLA")
+        started = time.perf_counter()
+        for version, point in enumerate(points, start=1):
+            registry.broadcast(SeriesUpdate("TSLA", version, {"one": [point]}))
+        while any(socket.sent < messages for socket in sockets):
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+        for connection in list(registry.clients["TSLA"]):
+            registry.remove(connection)
+        return elapsed
+
+    def round_() -> Tuple[float, int]:
+        return asyncio.run(run()), messages
+
+    return round_
+
+
+async def discard_update(update: SeriesUpdate) -> None:
+    pass
+
+
+def handler_tick(symbols: int, depth: int, ticks: int = 200) -> Round:
+    names = [f"SYM{index}" for index in range(symbols)]
+    messages = bar_messages(names, ticks, offset=depth)
+
+    def round_() -> Tuple[float, int]:
+        client = StockDataClient("bench", "bench", discard_update, None, 5, depth, names)
+        for name in names:
+            client.states[name] = loaded_state(name, depth)
+
+        async def run() -> float:
+            started = time.perf_counter()
+            for message in messages:
+                await client.quote_data_handler(message)
+            return time.perf_counter() - started
+
+        elapsed = asyncio.run(run())
+        client.executor.shutdown()
+        return elapsed, len(messages)
+
+    return round_
+
+
+def benchmarks(full: bool) -> Dict[str, Callable[[], Round]]:
+    sizes = [1000, 10000, 100000] if full else [1000, 10000]
+    depths = [100, 1000, 5000] if full else [100, 1000]
+    cases: Dict[str, Callable[[], Round]] = {}
+    for bars in sizes:
+        cases[f"indicators.vectorized[bars={bars}]"] = lambda bars=bars: indicators_vectorized(bars)
+        cases[f"indicators.incremental[bars={bars}]"] = lambda bars=bars: indicators_incremental(bars)
+        cases[f"indicators.vectorized[bars={bars},extras=all]"] = lambda bars=bars: indicators_vectorized(bars, ALL_INDICATORS)
+        cases[f"indicators.incremental[bars={bars},extras=all]"] = lambda bars=bars: indicators_incremental(bars, ALL_INDICATORS)
+        cases[f"fetch.post_processing[bars={bars}]"] = lambda bars=bars: fetch_post_processing(bars)
+    for depth in depths:
+        cases[f"encode.snapshot[depth={depth}]"] = lambda depth=depth: encode_snapshot(depth)
+    cases["encode.delta"] = encode_delta
+    for encoding in ENCODINGS[1:]:
+        cases[f"encode.snapshot[depth={depths[-1]},encoding={encoding}]"] = lambda encoding=encoding: encode_snapshot(depths[-1], encoding)
+        cases[f"encode.delta[encoding={encoding}]"] = lambda encoding=encoding: encode_delta(encoding)
+    for clients in ([1, 10, 100, 1000] if full else [1, 10, 100]):
+        cases[f"fanout.broadcast[clients={clients}]"] = lambda clients=clients: fanout_broadcast(clients)
+    for symbols in ([1, 5, 20] if full else [1, 5]):
+        for depth in depths:
+            cases[f"handler.tick[symbols={symbols},depth={depth}]"] = lambda symbols=symbols, depth=depth: handler_tick(symbols, depth)
+    return cases
+
+
+def measure(factory: Callable[[], Round], rounds: int, min_time: float = 0.05) -> float:
+    # Each sample repeats the round until it has run for `min_time`; the fastest sample is the least disturbed one.
+    round_ = factory()
+    round_()  # warm-up
+    samples = []
+    for _ in range(rounds):
+        elapsed, operations = 0.0, 0
+        while operations == 0 or elapsed < min_time:
+            round_elapsed, round_operations = round_()
+            elapsed += round_elapsed
+            operations += round_operations
+        samples.append(elapsed / operations)
+    return min(samples)
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    return [name for name, seconds in results.items() if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+
+def load_baseline(path: str) -> Optional[Dict[str, float]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion, indicator, serialization and fan-out hot paths.")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--full", action="store_true", help="Also run the large history, symbol and client counts.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown against the baseline, 0.25 = 25%%.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    baseline = load_baseline(args.baseline) or {}
+    results: Dict[str, float] = {}
+    for name, factory in benchmarks(args.full).items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(factory, args.rounds)
+        previous = baseline.get(name)
+        change = f"{(results[name] / previous - 1) * 100:+7.1f}%" if previous else "     new"
+        print(f"{name:<45} {results[name] * 1e6:12.2f} us/op  {change}")
+
+    regressions = compare(results, baseline, args.threshold)
+    for name in regressions:
+        print(f"REGRESSION {name}: {results[name] * 1e6:.2f} us/op against {baseline[name] * 1e6:.2f} us/op")
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump({"python": sys.version.split()[0], "results": {**baseline, **results}}, file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    return 1 if regressions and not args.save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
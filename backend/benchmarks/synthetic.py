@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+from server.bars import BarColumns, to_epoch_micros
+from server.models import FinancialDataPoint
+from server.resampler import bucket_start
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def random_walk(count: int, seed: int = 7, start: float = 250.0) -> np.ndarray:
+    # Seeded so every run of a benchmark sees exactly the same prices.
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+
+
+def timestamps(count: int, minutes: int = 1) -> List[datetime]:
+    return [START + timedelta(minutes=index * minutes) for index in range(count)]
+
+
+def alpaca_bars(count: int, seed: int = 7) -> List[Any]:
+    closes = random_walk(count, seed)
+    return [SimpleNamespace(timestamp=timestamp, open=close, high=close * 1.001, low=close * 0.999, close=close, volume=1000.0, trade_count=10) for timestamp, close in zip(timestamps(count), closes.tolist())]
+
+
+def bar_columns(count: int, seed: int = 7) -> BarColumns:
+    return BarColumns.from_bars(alpaca_bars(count, seed))
+
+
+def data_points(count: int, seed: int = 7) -> List[FinancialDataPoint]:
+    closes = random_walk(count, seed)
+    return [FinancialDataPoint(close=close, high=close * 1.001, low=close * 0.999, open=close, timestamp=timestamp, tradeCount=10, volume=1000.0) for timestamp, close in zip(timestamps(count), closes.tolist())]
+
+
+def bar_messages(symbols: List[str], count: int, seed: int = 7, offset: int = 0) -> List[Dict[str, Any]]:
+    # Interleaved like the live stream: every symbol's bar for a minute, then the next minute.
+    closes = {symbol: random_walk(offset + count, seed + index) for index, symbol in enumerate(symbols)}
+    messages = []
+    for minute, timestamp in enumerate(timestamps(offset + count)[offset:], start=offset):
+        for symbol in symbols:
+            close = float(closes[symbol][minute])
+            messages.append({"T": "b", "S": symbol, "o": close, "h": close * 1.001, "l": close * 0.999, "c": close, "v": 1000.0, "n": 10, "t": timestamp.isoformat()})
+    return messages
+
+
+def history(count: int, minutes: int, end: datetime, seed: int = 7) -> BarColumns:
+    # `count` bars of the given size whose last bucket holds `end`, so live bars after `end` continue the series.
+    columns = bar_columns(count, seed)
+    columns.timestamp[:] = [to_epoch_micros(bucket_start(end - timedelta(minutes=minutes * index), minutes)) for index in reversed(range(count))]
+    return columns
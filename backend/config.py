@@ -9,7 +9,25 @@ class Config:
     grok_api_key: str = dataclasses.field(default_factory=lambda: os.getenv("GROK_API_KEY", ""))
     alpaca_api_key: str = dataclasses.field(default_factory=lambda: os.getenv("APCA_API_KEY_ID", ""))
     alpaca_secret: str = dataclasses.field(default_factory=lambda: os.getenv("APCA_API_SECRET_KEY", ""))
+    symbols: typing.List[str] = dataclasses.field(default_factory=lambda: [os.getenv("SYMBOLS", "TSLA")])
     interval: int = dataclasses.field(default_factory=lambda: int(os.getenv("INTERVAL", "5")))
+    history_depth: int = dataclasses.field(default_factory=lambda: int(os.getenv("HISTORY_DEPTH", "1000")))
+    rest_max_concurrency: int = dataclasses.field(default_factory=lambda: int(os.getenv("REST_MAX_CONCURRENCY", "8")))
+    rest_timeout: float = dataclasses.field(default_factory=lambda: float(os.getenv("REST_TIMEOUT", "10")))
+    stream_queue_size: int = dataclasses.field(default_factory=lambda: int(os.getenv("STREAM_QUEUE_SIZE", "1000")))
+    stream_workers: int = dataclasses.field(default_factory=lambda: int(os.getenv("STREAM_WORKERS", "4")))
+    ws_max_pending: int = dataclasses.field(default_factory=lambda: int(os.getenv("WS_MAX_PENDING", "32")))
+    ws_stall_timeout: float = dataclasses.field(default_factory=lambda: float(os.getenv("WS_STALL_TIMEOUT", "10")))
+    bar_cache_path: str = dataclasses.field(default_factory=lambda: os.getenv("BAR_CACHE_PATH", "bar_cache.sqlite3"))
+    decision_workers: int = dataclasses.field(default_factory=lambda: int(os.getenv("DECISION_WORKERS", "2")))
+    decision_deadline: float = dataclasses.field(default_factory=lambda: float(os.getenv("DECISION_DEADLINE", "0")))
+    tool_workers: int = dataclasses.field(default_factory=lambda: int(os.getenv("TOOL_WORKERS", "4")))
+    option_chain_refresh: float = dataclasses.field(default_factory=lambda: float(os.getenv("OPTION_CHAIN_REFRESH", "60")))
+    option_chain_max_age: float = dataclasses.field(default_factory=lambda: float(os.getenv("OPTION_CHAIN_MAX_AGE", "300")))
+    option_chain_days: int = dataclasses.field(default_factory=lambda: int(os.getenv("OPTION_CHAIN_DAYS", "45")))
+    indicators: typing.List[str] = dataclasses.field(default_factory=lambda: [spec.strip() for spec in os.getenv("INDICATORS", "").split(",") if spec.strip()])
+    pubsub_socket: str = dataclasses.field(default_factory=lambda: os.getenv("PUBSUB_SOCKET", ""))
+    pubsub_max_pending: int = dataclasses.field(default_factory=lambda: int(os.getenv("PUBSUB_MAX_PENDING", "1024")))
     disable_grok: bool = dataclasses.field(default_factory=lambda: os.getenv("DISABLE_GROK", "false").lower() == "true")
     cors_origins: typing.List[str] = dataclasses.field(default_factory=lambda: [os.getenv("CORS_ORIGINS", "http://localhost:5173")])
 
@@ -22,6 +40,39 @@ class Config:
             raise ValueError("APCA_API_SECRET_KEY environment variable is required")
         if self.interval <= 0:
             raise ValueError("INTERVAL must be a positive integer")
+        if self.history_depth < 60:
+            raise ValueError("HISTORY_DEPTH must be at least 60")
+        if self.rest_max_concurrency <= 0:
+            raise ValueError("REST_MAX_CONCURRENCY must be a positive integer")
+        if self.rest_timeout <= 0:
+            raise ValueError("REST_TIMEOUT must be a positive number")
+        if self.stream_queue_size <= 0:
+            raise ValueError("STREAM_QUEUE_SIZE must be a positive integer")
+        if self.stream_workers <= 0:
+            raise ValueError("STREAM_WORKERS must be a positive integer")
+        if self.ws_max_pending <= 0:
+            raise ValueError("WS_MAX_PENDING must be a positive integer")
+        if self.ws_stall_timeout <= 0:
+            raise ValueError("WS_STALL_TIMEOUT must be a positive number")
+        if self.decision_workers <= 0:
+            raise ValueError("DECISION_WORKERS must be a positive integer")
+        if self.decision_deadline < 0:
+            raise ValueError("DECISION_DEADLINE must not be negative")
+        if self.tool_workers <= 0:
+            raise ValueError("TOOL_WORKERS must be a positive integer")
+        if self.option_chain_refresh <= 0:
+            raise ValueError("OPTION_CHAIN_REFRESH must be a positive number")
+        if self.option_chain_max_age <= 0:
+            raise ValueError("OPTION_CHAIN_MAX_AGE must be a positive number")
+        if self.option_chain_days <= 0:
+            raise ValueError("OPTION_CHAIN_DAYS must be a positive integer")
+        if self.pubsub_max_pending <= 0:
+            raise ValueError("PUBSUB_MAX_PENDING must be a positive integer")
         # Parse CORS_ORIGINS as comma-separated list
         origins_env = os.getenv("CORS_ORIGINS", "http://localhost:5173")
-        self.cors_origins = [origin.strip() for origin in origins_env.split(",") if origin.strip()]
\ No newline at end of file
+        self.cors_origins = [origin.strip() for origin in origins_env.split(",") if origin.strip()]
+        # Parse SYMBOLS as comma-separated list
+        symbols_env = os.getenv("SYMBOLS", "TSLA")
+        self.symbols = [symbol.strip().upper() for symbol in symbols_env.split(",") if symbol.strip()]
+        if not self.symbols:
+            raise ValueError("SYMBOLS must contain at least one symbol")
\ No newline at end of file
@@ -2,7 +2,9 @@ import asyncio
 import uvicorn
 from dotenv import load_dotenv
 from config import Config
-from server import GrokAPIClient, StockDataClient, TradingDataClient, get_logger
+from server import AsyncExecutor, BarCache, GrokAPIClient, StockDataClient, StreamManager, TradingDataClient, get_logger
+from server.models import SeriesUpdate
+from server.pubsub import Publisher
 from app import app, set_stock_client, send_message, set_trading_client
 
 logger = get_logger(__name__)
@@ -13,17 +15,38 @@ async def main():
 
     config = Config()
 
-    trading_client = TradingDataClient(config.alpaca_api_key, config.alpaca_secret)
-    grok_client = GrokAPIClient(api_key=config.grok_api_key, trading_client=trading_client, disable=config.disable_grok)
-    stock_client = StockDataClient(config.alpaca_api_key, config.alpaca_secret, send_message, grok_client, config.interval)
+    executor = AsyncExecutor(config.rest_max_concurrency, config.rest_timeout)
+    trading_client = TradingDataClient(config.alpaca_api_key, config.alpaca_secret, executor, config.option_chain_max_age, config.option_chain_days)
+    grok_client = GrokAPIClient(api_key=config.grok_api_key, trading_client=trading_client, disable=config.disable_grok, tool_workers=config.tool_workers)
+    bar_cache = BarCache(config.bar_cache_path) if config.bar_cache_path else None
+    publisher = None
+
+    async def send_update(update: SeriesUpdate) -> None:
+        await send_message(update)
+        if publisher is not None:
+            publisher.publish(update)
+
+    stream_manager = StreamManager(send_update, config.stream_queue_size, config.stream_workers)
+    stock_client = StockDataClient(config.alpaca_api_key, config.alpaca_secret, send_update, grok_client, config.interval, config.history_depth, config.symbols, executor, stream_manager, bar_cache, config.decision_workers, config.decision_deadline, config.indicators)
     set_stock_client(stock_client)
     set_trading_client(trading_client)
+    if config.pubsub_socket:
+        # API workers started with `uvicorn worker:app` follow this process over the socket.
+        publisher = Publisher(config.pubsub_socket, stock_client, config.pubsub_max_pending)
+        await publisher.start()
 
-    await stock_client.start_streaming()
+    async def warm_up() -> None:
+        # Option chains are refreshed once the backfill no longer needs the REST executor.
+        await stock_client.start_streaming()
+        trading_client.start_option_refresh(config.symbols, config.option_chain_refresh)
 
     server_config = uvicorn.Config(app, host="0.0.0.0", port=8000)
     server = uvicorn.Server(server_config)
-    await server.serve()
+    # The server answers with a "warming" status while the backfill runs; a failed backfill still stops the process.
+    try:
+        await asyncio.gather(server.serve(), warm_up())
+    finally:
+        grok_client.close()
 
 
 if __name__ == "__main__":
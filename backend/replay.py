@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from server.replay import read_bars, run_replay, write_bars
+from server.simulation import SimulatedBroker
+from server.stockClient import StockDataClient, to_bar_message
+
+
+def record(args: argparse.Namespace) -> None:
+    load_dotenv()
+    client = StockDataClient(os.getenv("APCA_API_KEY_ID", ""), os.getenv("APCA_API_SECRET_KEY", ""), None, None, 1)
+    start = datetime.fromisoformat(args.start).replace(tzinfo=timezone.utc)
+    end = datetime.fromisoformat(args.end).replace(tzinfo=timezone.utc)
+    messages = []
+    for symbol in args.symbols.split(","):
+        symbol = symbol.strip().upper()
+        messages.extend(to_bar_message(symbol, point) for point in client.fetch_bars(symbol, end, 1, start).to_points())
+    messages.sort(key=lambda message: message["t"])
+    print(f"Recorded {write_bars(args.path, messages)} bars to {args.path}")
+
+
+def run(args: argparse.Namespace) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(run_replay(read_bars(args.path), args.interval, args.speed, SimulatedBroker(args.cash), history_depth=args.history_depth, wait_for_decisions=not args.no_wait))
+    print(json.dumps(dataclasses.asdict(report), indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record one-minute bars and replay them through the trading pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Download one-minute bars from Alpaca into a replay file.")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--symbols", default=os.getenv("SYMBOLS", "TSLA"))
+    record_parser.add_argument("--start", required=True, help="e.g. 2025-01-02")
+    record_parser.add_argument("--end", required=True, help="e.g. 2025-03-31")
+    record_parser.set_defaults(func=record)
+
+    run_parser = commands.add_parser("run", help="Replay a recorded file with simulated Grok and trading clients.")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--interval", type=int, default=int(os.getenv("INTERVAL", "5")))
+    run_parser.add_argument("--speed", type=float, default=0.0, help="Multiple of real time, 0 replays as fast as possible.")
+    run_parser.add_argument("--cash", type=float, default=100000.0)
+    run_parser.add_argument("--history-depth", type=int, default=int(os.getenv("HISTORY_DEPTH", "1000")))
+    run_parser.add_argument("--no-wait", action="store_true", help="Do not wait for a decision before feeding the next bar.")
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
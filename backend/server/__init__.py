@@ -1,4 +1,7 @@
 from .stockClient import StockDataClient
 from .grokClient import GrokAPIClient
 from .tradingClient import TradingDataClient
+from .async_executor import AsyncExecutor
+from .bar_cache import BarCache
+from .stream_manager import StreamManager
 from .logger import get_logger
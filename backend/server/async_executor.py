@@ -0,0 +1,52 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from server.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncExecutor:
+    # The Alpaca SDK only offers blocking clients, so every REST call is pushed onto a bounded pool
+    # and awaited with a deadline instead of running on the event loop that serves the stream.
+    def __init__(self, max_workers: int = 8, timeout: float = 10.0) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be a positive integer")
+        if timeout <= 0:
+            raise ValueError("timeout must be a positive number")
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rest")
+        self.timeout: float = timeout
+        self.max_workers: int = max_workers
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        # The deadline starts once a thread picks the call up, so waiting behind a burst of other calls
+        # (a multi-symbol backfill) does not count against it.
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def call() -> Any:
+            loop.call_soon_threadsafe(started.set)
+            return func(*args, **kwargs)
+
+        future = loop.run_in_executor(self.executor, call)
+        waiting = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait((waiting, future), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            waiting.cancel()
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{getattr(func, '__qualname__', func)} timed out after {timeout or self.timeout} seconds")
+            raise
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        # Fire-and-forget work from threads that have no event loop, such as a refresh started by a tool call.
+        return self.executor.submit(func, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
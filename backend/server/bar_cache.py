@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+from server.bars import COLUMN_NAMES, BarColumns
+from server.logger import get_logger
+
+logger = get_logger(__name__)
+
+COLUMN_LIST = ", ".join(COLUMN_NAMES)
+
+
+class BarCache:
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    interval INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    close REAL, high REAL, low REAL, open REAL, tradeCount INTEGER, volume REAL,
+                    fivePeriodMovingAverage REAL, tenPeriodMovingAverage REAL, sixPeriodRsi REAL,
+                    PRIMARY KEY (symbol, interval, timestamp)
+                ) WITHOUT ROWID"""
+            )
+        logger.info(f"Bar cache opened at {path}")
+
+    def load(self, symbol: str, interval: int, since: int) -> BarColumns:
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {COLUMN_LIST} FROM bars WHERE symbol = ? AND interval = ? AND timestamp >= ? ORDER BY timestamp",
+                (symbol, interval, since),
+            ).fetchall()
+        columns = BarColumns.empty(len(rows))
+        if rows:
+            values = list(zip(*rows))
+            for name, column in zip(COLUMN_NAMES, values):
+                getattr(columns, name)[:] = np.asarray(column)
+        return columns
+
+    def store(self, symbol: str, interval: int, columns: BarColumns) -> None:
+        if not len(columns):
+            return
+        rows = zip([symbol] * len(columns), [interval] * len(columns), *(getattr(columns, name).tolist() for name in COLUMN_NAMES))
+        placeholders = ", ".join("?" * (len(COLUMN_NAMES) + 2))
+        with self.lock, self.connection:
+            self.connection.executemany(f"INSERT OR REPLACE INTO bars (symbol, interval, {COLUMN_LIST}) VALUES ({placeholders})", rows)
+
+    def prune(self, symbol: str, interval: int, before: int) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM bars WHERE symbol = ? AND interval = ? AND timestamp < ?", (symbol, interval, before))
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,199 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from server.models import FinancialDataPoint
+
+COLUMN_NAMES = ("timestamp", "close", "high", "low", "open", "tradeCount", "volume", "fivePeriodMovingAverage", "tenPeriodMovingAverage", "sixPeriodRsi")
+PRICE_COLUMNS = ("close", "high", "low", "open", "volume", "fivePeriodMovingAverage", "tenPeriodMovingAverage", "sixPeriodRsi")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+def to_epoch_micros(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_epoch_micros(value: int) -> datetime:
+    return EPOCH + value * MICROSECOND
+
+
+@dataclass
+class BarColumns:
+    timestamp: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    open: np.ndarray
+    tradeCount: np.ndarray
+    volume: np.ndarray
+    fivePeriodMovingAverage: np.ndarray
+    tenPeriodMovingAverage: np.ndarray
+    sixPeriodRsi: np.ndarray
+    # Configured indicators beyond the built-in three: one row per bar, one column per name.
+    indicator_names: Tuple[str, ...] = ()
+    indicators: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)))
+
+    @classmethod
+    def empty(cls, size: int = 0, indicator_names: Tuple[str, ...] = ()) -> "BarColumns":
+        return cls(
+            timestamp=np.zeros(size, dtype=np.int64),
+            tradeCount=np.zeros(size, dtype=np.int64),
+            indicator_names=indicator_names,
+            indicators=np.zeros((size, len(indicator_names))),
+            **{name: np.zeros(size, dtype=np.float64) for name in PRICE_COLUMNS},
+        )
+
+    @classmethod
+    def from_points(cls, data: List[FinancialDataPoint]) -> "BarColumns":
+        columns = cls.empty(len(data), tuple(data[0].indicators) if data else ())
+        for name in COLUMN_NAMES:
+            if name == "timestamp":
+                columns.timestamp[:] = [to_epoch_micros(data_point.timestamp) for data_point in data]
+            else:
+                getattr(columns, name)[:] = [getattr(data_point, name) for data_point in data]
+        if columns.indicator_names:
+            columns.indicators[:] = [[data_point.indicators.get(name, np.nan) for name in columns.indicator_names] for data_point in data]
+        return columns
+
+    @classmethod
+    def from_bars(cls, bars: Iterable[Any]) -> "BarColumns":
+        bars = list(bars)
+        columns = cls.empty(len(bars))
+        columns.timestamp[:] = [to_epoch_micros(bar.timestamp) for bar in bars]
+        columns.close[:] = [bar.close for bar in bars]
+        columns.high[:] = [bar.high for bar in bars]
+        columns.low[:] = [bar.low for bar in bars]
+        columns.open[:] = [bar.open for bar in bars]
+        columns.tradeCount[:] = [int(bar.trade_count or 0) for bar in bars]
+        columns.volume[:] = [bar.volume for bar in bars]
+        return columns
+
+    @classmethod
+    def concat(cls, parts: List["BarColumns"]) -> "BarColumns":
+        # Parts computed with different indicator sets (e.g. cached and fetched bars) lose the extra table.
+        names = parts[0].indicator_names if parts and all(part.indicator_names == parts[0].indicator_names for part in parts) else ()
+        table = np.concatenate([part.indicators for part in parts]) if names else np.zeros((sum(len(part) for part in parts), 0))
+        return cls(**{name: np.concatenate([getattr(part, name) for part in parts]) for name in COLUMN_NAMES}, indicator_names=names, indicators=table)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def slice(self, start: int, end: Optional[int] = None) -> "BarColumns":
+        return BarColumns(**{name: getattr(self, name)[start:end] for name in COLUMN_NAMES}, indicator_names=self.indicator_names, indicators=self.indicators[start:end])
+
+    def tail(self, count: int) -> "BarColumns":
+        return self.slice(max(len(self) - count, 0))
+
+    def to_points(self) -> List[FinancialDataPoint]:
+        rows = zip(
+            self.timestamp.tolist(),
+            self.close.tolist(),
+            self.high.tolist(),
+            self.low.tolist(),
+            self.open.tolist(),
+            self.tradeCount.tolist(),
+            self.volume.tolist(),
+            self.fivePeriodMovingAverage.tolist(),
+            self.tenPeriodMovingAverage.tolist(),
+            self.sixPeriodRsi.tolist(),
+            self.indicators.tolist() if self.indicator_names else [()] * len(self),
+        )
+        return [
+            FinancialDataPoint(
+                close=close,
+                high=high,
+                low=low,
+                open=open_,
+                timestamp=from_epoch_micros(timestamp),
+                tradeCount=trade_count,
+                volume=volume,
+                fivePeriodMovingAverage=five,
+                tenPeriodMovingAverage=ten,
+                sixPeriodRsi=rsi,
+                indicators=dict(zip(self.indicator_names, extra)),
+            )
+            for timestamp, close, high, low, open_, trade_count, volume, five, ten, rsi, extra in rows
+        ]
+
+
+class BarSeries:
+    # Every column is stored twice back to back, so the newest `n` bars are always one contiguous slice.
+    def __init__(self, capacity: int, indicator_names: Tuple[str, ...] = ()) -> None:
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("capacity must be a positive integer")
+        self.capacity: int = capacity
+        self.indicator_names: Tuple[str, ...] = indicator_names
+        self.buffer: BarColumns = BarColumns.empty(2 * capacity, indicator_names)
+        self.head: int = 0
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, data_point: FinancialDataPoint) -> None:
+        for name in COLUMN_NAMES:
+            value = to_epoch_micros(data_point.timestamp) if name == "timestamp" else getattr(data_point, name)
+            column = getattr(self.buffer, name)
+            column[self.head] = value
+            column[self.head + self.capacity] = value
+        if self.indicator_names:
+            row = [data_point.indicators.get(name, np.nan) for name in self.indicator_names]
+            self.buffer.indicators[self.head] = row
+            self.buffer.indicators[self.head + self.capacity] = row
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, columns: BarColumns) -> None:
+        columns = columns.tail(self.capacity)
+        count = len(columns)
+        if count == 0:
+            return
+        positions = (self.head + np.arange(count)) % self.capacity
+        for name in COLUMN_NAMES:
+            values = getattr(columns, name)
+            column = getattr(self.buffer, name)
+            column[positions] = values
+            column[positions + self.capacity] = values
+        if self.indicator_names:
+            table = columns.indicators if columns.indicator_names == self.indicator_names else np.nan
+            self.buffer.indicators[positions] = table
+            self.buffer.indicators[positions + self.capacity] = table
+        self.head = (self.head + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def window(self, count: int) -> BarColumns:
+        # Views into the buffer: they change as new bars arrive, so copy them before releasing the lock.
+        count = min(count, self.size)
+        end = self.head + self.capacity
+        return self.buffer.slice(end - count, end)
+
+    def update_last(self, data_point: FinancialDataPoint) -> None:
+        if self.size == 0:
+            raise ValueError("cannot update an empty series")
+        self.head = (self.head - 1) % self.capacity
+        self.size -= 1
+        self.append(data_point)
+
+    def last_point(self) -> Optional[FinancialDataPoint]:
+        if self.size == 0:
+            return None
+        return self.window(1).to_points()[0]
+
+    def to_points(self, count: int) -> List[FinancialDataPoint]:
+        return self.window(count).to_points()
+
+    def last_timestamp(self) -> Optional[datetime]:
+        if self.size == 0:
+            return None
+        return from_epoch_micros(int(self.buffer.timestamp[self.head + self.capacity - 1]))
+
+    def clear(self) -> None:
+        self.head = 0
+        self.size = 0
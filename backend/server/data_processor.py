@@ -1,32 +1,40 @@
-from typing import List
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+from .bars import BarColumns
+from .indicators import Indicator, IndicatorEngine, indicator_table, moving_average_series, parse_indicators, relative_strength_index_series
 from .models import FinancialDataPoint
 
 
 class DataProcessor:
-    def calculate_moving_average(self, data: List[FinancialDataPoint], periods: int) -> float:
-        if len(data) >= periods:
-            relevant_data = data[-periods:]
-            sum_of_data = sum(data_point.close for data_point in relevant_data)
-            return sum_of_data / periods
-        return data[-1].close if data else 0.0
+    def __init__(self, indicators: Sequence[str] = ()) -> None:
+        self.factories: List[Callable[[], Indicator]] = parse_indicators(indicators)
+        self.indicator_names: Tuple[str, ...] = tuple(name for indicator in self.build_indicators() for name in indicator.outputs)
 
-    def calculate_relative_strength_index(self, data: List[FinancialDataPoint], periods: int) -> float:
-        relevant_data = data[-periods:]
-        gains = []
-        losses = []
-        for i in range(1, len(relevant_data)):
-            change = relevant_data[i].close - relevant_data[i - 1].close
-            if change > 0:
-                gains.append(change)
-            else:
-                losses.append(abs(change))
-        num_periods = len(relevant_data) - 1
-        if num_periods == 0:
-            return 50.0
-        avg_gain = sum(gains) / num_periods
-        avg_loss = sum(losses) / num_periods
-        if avg_loss == 0:
-            return 100.0
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    def build_indicators(self) -> List[Indicator]:
+        return [factory() for factory in self.factories]
+
+    def create_engine(self, history: Optional[Union[Sequence[float], BarColumns]] = None) -> IndicatorEngine:
+        # Full bars are needed to seed range and volume based indicators; bare closes only suit the built-in ones.
+        engine = IndicatorEngine(extras=self.build_indicators())
+        if isinstance(history, BarColumns):
+            engine.seed_columns(history)
+        elif history is not None:
+            engine.seed([float(close) for close in history[-engine.warmup :]])
+        return engine
+
+    def apply_kpi(self, data_point: FinancialDataPoint, engine: IndicatorEngine) -> FinancialDataPoint:
+        (data_point.fivePeriodMovingAverage, data_point.tenPeriodMovingAverage, data_point.sixPeriodRsi), row = engine.update_point(data_point)
+        data_point.indicators = dict(zip(engine.names, row))
+        return data_point
+
+    def compute_indicators(self, columns: BarColumns) -> BarColumns:
+        columns.fivePeriodMovingAverage = moving_average_series(columns.close, 5)
+        columns.tenPeriodMovingAverage = moving_average_series(columns.close, 10)
+        columns.sixPeriodRsi = relative_strength_index_series(columns.close, 6)
+        columns.indicator_names = self.indicator_names
+        columns.indicators = indicator_table(self.build_indicators(), columns)
+        return columns
+
+    def preview_kpi(self, data_point: FinancialDataPoint, engine: IndicatorEngine) -> FinancialDataPoint:
+        (data_point.fivePeriodMovingAverage, data_point.tenPeriodMovingAverage, data_point.sixPeriodRsi), row = engine.peek_point(data_point)
+        data_point.indicators = dict(zip(engine.names, row))
+        return data_point
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Set
+
+from server.logger import get_logger
+from server.metrics import metrics
+from server.models import FinancialDataPoint
+from server.tracing import Trace
+
+logger = get_logger(__name__)
+
+queue_wait = metrics.histogram("decision_queue_wait_seconds", "Time a decision waited for a free worker")
+decision_latency = metrics.histogram("decision_latency_seconds", "Time from starting a decision until it finished")
+replaced_decisions = metrics.counter("decisions_replaced_total", "Queued decisions replaced by a newer bar before they started")
+expired_decisions = metrics.counter("decisions_expired_total", "Decisions skipped or discarded because their deadline passed")
+pending_decisions = metrics.gauge("decisions_pending", "Decisions waiting for a worker")
+
+
+@dataclass
+class DecisionRequest:
+    symbol: str
+    data_point: FinancialDataPoint
+    deadline: float
+    context: Optional[List[FinancialDataPoint]] = None
+    trace: Optional[Trace] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    def expired(self) -> bool:
+        return time.monotonic() > self.deadline
+
+
+class DecisionScheduler:
+    def __init__(self, handler: Callable[[DecisionRequest], Awaitable[None]], workers: int = 2) -> None:
+        if workers <= 0:
+            raise ValueError("workers must be a positive integer")
+        self.handler: Callable[[DecisionRequest], Awaitable[None]] = handler
+        self.workers: int = workers
+        self.pending: "OrderedDict[str, DecisionRequest]" = OrderedDict()
+        self.in_flight: Set[str] = set()
+        self.condition = asyncio.Condition()
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, request: DecisionRequest) -> None:
+        async with self.condition:
+            replaced = self.pending.pop(request.symbol, None)
+            if replaced is not None:
+                replaced_decisions.inc()
+                if replaced.trace is not None:
+                    replaced.trace.finish("replaced")
+                logger.info(f"Replaced queued decision for {request.symbol} with a newer bar")
+            self.pending[request.symbol] = request
+            pending_decisions.set(len(self.pending))
+            self.condition.notify_all()
+
+    async def join(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.pending and not self.in_flight)
+
+    def next_request(self) -> Optional[DecisionRequest]:
+        for symbol in self.pending:
+            if symbol not in self.in_flight:
+                return self.pending.pop(symbol)
+        return None
+
+    async def worker(self) -> None:
+        while True:
+            async with self.condition:
+                request = self.next_request()
+                while request is None:
+                    await self.condition.wait()
+                    request = self.next_request()
+                self.in_flight.add(request.symbol)
+                pending_decisions.set(len(self.pending))
+            await self.run(request)
+
+    async def run(self, request: DecisionRequest) -> None:
+        started = time.monotonic()
+        queue_wait.observe(started - request.enqueued_at)
+        if request.trace is not None:
+            request.trace.add_span("queue", request.enqueued_at, started)
+        if request.expired():
+            expired_decisions.inc()
+            if request.trace is not None:
+                request.trace.finish("expired")
+            logger.warning(f"Skipping decision for {request.symbol}: deadline passed while queued")
+            await self.release(request.symbol)
+            return
+
+        task = asyncio.create_task(self.handler(request))
+        done, _ = await asyncio.wait({task}, timeout=max(request.deadline - started, 0))
+        if not done:
+            # The blocking model call cannot be interrupted; it refuses to place orders past the deadline. The worker
+            # and the symbol stay busy until it returns, so `workers` bounds the model calls actually running and two
+            # decisions never act on the same symbol at once.
+            expired_decisions.inc()
+            if request.trace is not None:
+                request.trace.attributes["missedDeadline"] = True
+            logger.warning(f"Decision for {request.symbol} missed its deadline, discarding its result")
+            await asyncio.wait({task})
+        self.log_failure(request.symbol, task)
+        await self.release(request.symbol, started)
+
+    @staticmethod
+    def log_failure(symbol: str, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Decision for {symbol} failed: {task.exception()}")
+
+    async def release(self, symbol: str, started: Optional[float] = None) -> None:
+        if started is not None:
+            decision_latency.observe(time.monotonic() - started)
+        async with self.condition:
+            self.in_flight.discard(symbol)
+            self.condition.notify_all()
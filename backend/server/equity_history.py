@@ -0,0 +1,29 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+
+class EquityHistory:
+    def __init__(self, timeframe: str, period: str, capacity: int = 60) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive integer")
+        self.timeframe: str = timeframe
+        self.period: str = period
+        self.points: Deque[Tuple[int, Optional[float]]] = deque(maxlen=capacity)
+        # Held across a whole incremental update, so a second load after a trade starts from what the first merged.
+        self.lock = threading.Lock()
+
+    def last_timestamp(self) -> Optional[int]:
+        return self.points[-1][0] if self.points else None
+
+    def merge(self, timestamps: Sequence[int], equity: Sequence[Optional[float]]) -> None:
+        # The newest held point may still have been moving when it was fetched, so overlapping points are replaced.
+        if not timestamps:
+            return
+        while self.points and self.points[-1][0] >= timestamps[0]:
+            self.points.pop()
+        self.points.extend(zip(timestamps, equity))
+
+    def to_points(self) -> List[Dict[str, Any]]:
+        return [{"timestamp": datetime.fromtimestamp(timestamp).isoformat(), "equity": equity} for timestamp, equity in self.points]
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+from server.logger import get_logger
+from server.metrics import FAST_BUCKETS, metrics
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.serialization import encode_message
+from server.symbol_state import DISPLAY_WINDOW
+
+logger = get_logger(__name__)
+
+connected_clients = metrics.gauge("ws_clients", "Connected dashboard WebSocket clients")
+coalesced_messages = metrics.counter("ws_messages_coalesced_total", "Deltas merged into a pending delta for a slow client")
+dropped_clients = metrics.counter("ws_clients_dropped_total", "Dashboard clients disconnected for falling behind")
+broadcast_encode = metrics.histogram("ws_broadcast_encode_seconds", "Encoding one delta for all clients of a symbol", FAST_BUCKETS)
+send_latency = metrics.histogram("ws_send_seconds", "Writing one message to a dashboard socket", FAST_BUCKETS)
+
+
+@dataclass
+class OutgoingMessage:
+    payload: Union[str, bytes]
+    update: Optional[SeriesUpdate] = None
+    prev: Optional[int] = None
+    snapshot: bool = False
+
+
+def merge_bars(pending: List[FinancialDataPoint], incoming: List[FinancialDataPoint]) -> List[FinancialDataPoint]:
+    merged = {bar.timestamp: bar for bar in pending}
+    for bar in incoming:
+        merged[bar.timestamp] = bar
+    return sorted(merged.values(), key=lambda bar: bar.timestamp)
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, symbol: str, max_pending: int, stall_timeout: float, encoding: str = "json") -> None:
+        self.websocket: WebSocket = websocket
+        self.symbol: str = symbol
+        self.encoding: str = encoding
+        self.max_pending: int = max_pending
+        self.stall_timeout: float = stall_timeout
+        self.outbox: Deque[OutgoingMessage] = deque()
+        self.ready = asyncio.Event()
+        self.closed: bool = False
+        self.writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.writer = asyncio.create_task(self.write_loop())
+
+    def send(self, payload: Union[str, bytes]) -> None:
+        self.enqueue(OutgoingMessage(payload))
+
+    def send_snapshot(self, snapshot: SeriesUpdate, payload: Union[str, bytes]) -> None:
+        self.enqueue(OutgoingMessage(payload, snapshot, snapshot=True))
+
+    def send_update(self, update: SeriesUpdate, payload: Union[str, bytes]) -> None:
+        last = self.outbox[-1] if self.outbox else None
+        if len(self.outbox) >= self.max_pending and last is not None and last.update is not None:
+            if last.snapshot and update.version <= last.update.version:
+                # The queued snapshot already contains this delta.
+                return
+            if last.update.version + 1 == update.version:
+                # The client is behind: fold the new delta into the last queued message, keeping only the newest version
+                # of each bar. A queued snapshot becomes the snapshot of the new version.
+                data = {key: merge_bars(last.update.data.get(key, []), update.data.get(key, [])) for key in {**last.update.data, **update.data}}
+                if last.snapshot:
+                    merged = SeriesUpdate(update.symbol, update.version, {key: bars[-DISPLAY_WINDOW:] for key, bars in data.items()})
+                    self.outbox[-1] = OutgoingMessage(encode_message("snapshot", merged, self.encoding), merged, snapshot=True)
+                else:
+                    merged = SeriesUpdate(update.symbol, update.version, data)
+                    self.outbox[-1] = OutgoingMessage(encode_message("delta", merged, self.encoding, last.prev), merged, last.prev)
+                coalesced_messages.inc()
+                return
+        self.enqueue(OutgoingMessage(payload, update, update.version - 1))
+
+    def enqueue(self, message: OutgoingMessage) -> None:
+        if self.closed:
+            return
+        if len(self.outbox) >= self.max_pending:
+            logger.warning(f"Dropping WebSocket client for {self.symbol}: outbox is full")
+            self.close()
+            return
+        self.outbox.append(message)
+        self.ready.set()
+
+    async def write_loop(self) -> None:
+        try:
+            while True:
+                while not self.outbox:
+                    self.ready.clear()
+                    await self.ready.wait()
+                message = self.outbox.popleft()
+                started = time.perf_counter()
+                if isinstance(message.payload, str):
+                    await asyncio.wait_for(self.websocket.send_text(message.payload), self.stall_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_bytes(message.payload), self.stall_timeout)
+                send_latency.observe(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping WebSocket client for {self.symbol}: send stalled for {self.stall_timeout}s")
+            dropped_clients.inc()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket send failed: {e}")
+        finally:
+            self.closed = True
+            asyncio.create_task(self.close_socket())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        dropped_clients.inc()
+        if self.writer is not None:
+            self.writer.cancel()
+
+    async def close_socket(self) -> None:
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+
+class ClientRegistry:
+    def __init__(self, max_pending: int = 32, stall_timeout: float = 10.0) -> None:
+        self.max_pending: int = max_pending
+        self.stall_timeout: float = stall_timeout
+        self.clients: Dict[str, Set[ClientConnection]] = defaultdict(set)
+
+    def add(self, websocket: WebSocket, symbol: str, encoding: str = "json") -> ClientConnection:
+        client = ClientConnection(websocket, symbol, self.max_pending, self.stall_timeout, encoding)
+        client.start()
+        self.clients[symbol].add(client)
+        connected_clients.set(sum(len(clients) for clients in self.clients.values()))
+        return client
+
+    def remove(self, client: ClientConnection) -> None:
+        self.clients[client.symbol].discard(client)
+        if client.writer is not None:
+            client.writer.cancel()
+        connected_clients.set(sum(len(clients) for clients in self.clients.values()))
+
+    def broadcast(self, update: SeriesUpdate) -> None:
+        # Encoded once per wire format in use and handed to every writer without awaiting, so a slow socket
+        # never delays the others.
+        payloads: Dict[str, Union[str, bytes]] = {}
+        for client in list(self.clients[update.symbol]):
+            if client.closed:
+                self.remove(client)
+                continue
+            if client.encoding not in payloads:
+                with broadcast_encode.time():
+                    payloads[client.encoding] = encode_message("delta", update, client.encoding)
+            client.send_update(update, payloads[client.encoding])
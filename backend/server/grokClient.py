@@ -1,19 +1,39 @@
 import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Dict, Any, TypedDict, List
-from xai_sdk import Client
-from xai_sdk.chat import system, user, tool, tool_result
+from server.tracing import Trace, maybe_span
 from server.tradingClient import TradingDataClient
 from server.logger import get_logger
+from server.metrics import metrics
 
 logger = get_logger(__name__)
 
+# Tools that submit orders run one at a time in the order the model asked for them; everything else is a read.
+ORDER_TOOLS = {"buy_option", "close_option"}
+
+sample_latency = metrics.histogram("grok_sample_seconds", "One chat.sample round-trip to Grok")
+request_latency = metrics.histogram("grok_request_seconds", "A whole Grok decision including tool calls")
+tool_rounds = metrics.histogram("grok_tool_rounds", "Tool-call rounds per Grok decision", (0, 1, 2, 3, 4, 5, 8, 13))
+tool_latency = metrics.histogram("grok_tool_round_seconds", "Running the tool calls of one model turn")
+request_errors = metrics.counter("grok_request_errors_total", "Grok decisions that failed")
+
 
 class ChatResponse(TypedDict):
     role: str
     content: str
 
 
+def create_client(api_key: str) -> Any:
+    # xai_sdk takes about half a second to import, so it is only loaded when Grok is enabled.
+    from xai_sdk import Client
+
+    return Client(api_key=api_key)
+
+
 def getTools():
+    from xai_sdk.chat import tool
+
     return [
         tool(
             name="get_options",
@@ -21,12 +41,13 @@ def getTools():
             parameters={
                 "type": "object",
                 "properties": {
+                    "underlying_symbol": {"type": "string", "description": "The stock symbol the options are written on e.g. TSLA."},
                     "strike_price_gte": {"type": "string", "description": "The strike price that should be filtered (greater then equal)."},
                     "strike_price_lte": {"type": "string", "description": "The strike price that should be filtered (less then equal)."},
                     "option_type": {"type": "string", "description": "If it should be a PUT or CALL (only PUT or CALL are valid)"},
                     "expiration_date_gte": {"type": "string", "description": "The value which the expiration date should start e.g. 2025-09-01."},
                 },
-                "required": ["strike_price_gte", "strike_price_lte", "option_type", "expiration_date_gte"],
+                "required": ["underlying_symbol", "strike_price_gte", "strike_price_lte", "option_type", "expiration_date_gte"],
             },
         ),
         tool(
@@ -68,12 +89,15 @@ def getTools():
 
 
 class GrokAPIClient:
-    def __init__(self, api_key: str, trading_client: TradingDataClient, disable: bool, model: str = "grok-4-fast-reasoning") -> None:
+    def __init__(self, api_key: str, trading_client: TradingDataClient, disable: bool, model: str = "grok-4-fast-reasoning", tool_workers: int = 4) -> None:
+        if tool_workers <= 0:
+            raise ValueError("tool_workers must be a positive integer")
         try:
-            self.client: Client = Client(api_key=api_key)
+            self.client: Any = None if disable else create_client(api_key)
             self.model: str = model
             self.trading_client: TradingDataClient = trading_client
             self.disable: bool = disable
+            self.tool_executor = ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix="grok-tools")
             logger.info(f"Grok API client initialized with model: {model}")
         except Exception as e:
             logger.error(f"Failed to initialize Grok API client: {e}")
@@ -82,39 +106,45 @@ class GrokAPIClient:
     def get_settings(self) -> Dict[str, Any]:
         return {"model": self.model, "disabled_grok": self.disable}
 
-    def send_request(self, query: str, interval: int) -> Optional[Dict[str, Any]]:
+    def close(self) -> None:
+        self.tool_executor.shutdown(wait=False, cancel_futures=True)
+
+    def send_request(self, query: str, interval: int, symbol: str, deadline: Optional[float] = None, trace: Optional[Trace] = None) -> Optional[Dict[str, Any]]:
         if self.disable:
             return
+        from xai_sdk.chat import system, tool_result, user
+
         try:
             logger.info(f"Sending query to Grok API")
-            chat = self.client.chat.create(model=self.model, tools=getTools())
+            # Both lookups are independent REST calls, so they overlap instead of adding up.
+            with maybe_span(trace, "account_prefetch"):
+                account_info = self.tool_executor.submit(self.trading_client.get_account_info)
+                open_positions = self.tool_executor.submit(self.trading_client.get_open_positions)
+                chat = self.client.chat.create(model=self.model, tools=getTools())
+                account, positions = account_info.result(), open_positions.result()
 
             chat.append(
                 system(
-                    f"You are a professional day trader. You will receive stock data information of TSLA now. Each data point is of a {interval} minute interval. You need to buy/sell options when you feel like it is the correct time. You can only buy and / or sell every {interval} minutes. Make tool calls to buy or sell options. You can use positive or negative quantity when you buy options. If you encounter errors while executing tools, analyze them and take them into consideration. If you want to buy the same option in mass, buy it directly and do not make 10x tool-calls to get 10 options every time. These are your account values {json.dumps(self.trading_client.get_account_info())}. These are your open positions {json.dumps(self.trading_client.get_open_positions())}. Analyze it and tell me your decision in 5 words maximum."
+                    f"You are a professional day trader. You will receive stock data information of {symbol} now. Each data point is of a {interval} minute interval. You need to buy/sell options when you feel like it is the correct time. You can only buy and / or sell every {interval} minutes. Make tool calls to buy or sell options. You can use positive or negative quantity when you buy options. If you encounter errors while executing tools, analyze them and take them into consideration. If you want to buy the same option in mass, buy it directly and do not make 10x tool-calls to get 10 options every time. These are your account values {json.dumps(account)}. These are your open positions {json.dumps(positions)}. Analyze it and tell me your decision in 5 words maximum."
                 )
             )
             chat.append(user(query))
-            response = chat.sample()
+            response = self.sample(chat, trace, 0)
 
+            rounds = 0
             while response.tool_calls:
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
-                    if tool_name == "get_options":
-                        result = self.trading_client.get_options(tool_args["strike_price_gte"], tool_args["strike_price_lte"], tool_args["option_type"], tool_args["expiration_date_gte"])
-                    elif tool_name == "buy_option":
-                        result = self.trading_client.buy_option(tool_args["symbol"], tool_args["quantity"], tool_args["stop_price"], tool_args["profit_price"])
-                    elif tool_name == "close_option":
-                        result = self.trading_client.sell_option(tool_args["symbol"], tool_args["quantity"])
-                    elif tool_name == "get_account_info":
-                        result = self.trading_client.get_account_info()
-                    else:
-                        result = f"Unknown tool: {tool_name}"
-                    tool_result_msg = tool_result(str(result))
-                    chat.append(tool_result_msg)
-
-                response = chat.sample()
+                if deadline is not None and time.monotonic() > deadline:
+                    # The bar this decision was made for is stale now, so no further tools (and no orders) run.
+                    logger.warning(f"Decision deadline passed for {symbol}, discarding the remaining tool calls")
+                    return None
+                rounds += 1
+                with tool_latency.time():
+                    results = self.run_tools(response.tool_calls, symbol, deadline, trace)
+                for result in results:
+                    chat.append(tool_result(result))
+
+                response = self.sample(chat, trace, rounds)
+            tool_rounds.observe(rounds)
 
             if response and hasattr(response, "content"):
                 response_content = {"role": "assistant", "content": response.content}
@@ -125,9 +155,59 @@ class GrokAPIClient:
                 return None
 
         except Exception as e:
+            request_errors.inc()
             logger.error(f"Error sending request to Grok API: {e}")
             return None
 
-    def get_signal(self, stock_data: str, interval: int) -> Optional[Dict[str, Any]]:
-        response = self.send_request(stock_data, interval)
+    def sample(self, chat: Any, trace: Optional[Trace] = None, round_: int = 0) -> Any:
+        with sample_latency.time(), maybe_span(trace, "sample", round=round_):
+            return chat.sample()
+
+    def run_tools(self, tool_calls: List[Any], symbol: str, deadline: Optional[float] = None, trace: Optional[Trace] = None) -> List[str]:
+        calls = [(tool_call.function.name, json.loads(tool_call.function.arguments)) for tool_call in tool_calls]
+        # Reads between two orders run in parallel; an order waits for the reads issued before it and the reads
+        # after it wait for the order, so every call sees the account as the model expects.
+        results: Dict[int, str] = {}
+        reads: Dict[int, Future] = {}
+        for index, (name, args) in enumerate(calls):
+            if name not in ORDER_TOOLS:
+                reads[index] = self.tool_executor.submit(self.execute_tool, name, args, trace)
+                continue
+            results.update((read, future.result()) for read, future in reads.items())
+            reads.clear()
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning(f"Decision deadline passed for {symbol}, not running {name}")
+                results[index] = "Order was not placed because the decision took too long."
+            else:
+                results[index] = self.execute_tool(name, args, trace)
+        results.update((read, future.result()) for read, future in reads.items())
+        return [results[index] for index in range(len(calls))]
+
+    def execute_tool(self, tool_name: str, tool_args: Dict[str, Any], trace: Optional[Trace] = None) -> str:
+        with maybe_span(trace, "tool", tool=tool_name, arguments=tool_args) as span:
+            result = self.call_tool(tool_name, tool_args, trace)
+            if span is not None:
+                span.attributes["result"] = result[:500]
+        return result
+
+    def call_tool(self, tool_name: str, tool_args: Dict[str, Any], trace: Optional[Trace] = None) -> str:
+        try:
+            if tool_name == "get_options":
+                result = self.trading_client.get_options(tool_args["underlying_symbol"], tool_args["strike_price_gte"], tool_args["strike_price_lte"], tool_args["option_type"], tool_args["expiration_date_gte"])
+            elif tool_name == "buy_option":
+                result = self.trading_client.buy_option(tool_args["symbol"], tool_args["quantity"], tool_args["stop_price"], tool_args["profit_price"], trace)
+            elif tool_name == "close_option":
+                result = self.trading_client.sell_option(tool_args["symbol"], tool_args["quantity"], trace)
+            elif tool_name == "get_account_info":
+                result = self.trading_client.get_account_info()
+            else:
+                result = f"Unknown tool: {tool_name}"
+        except Exception as e:
+            logger.error(f"Tool {tool_name} failed: {e}")
+            result = str(e)
+        return str(result)
+
+    def get_signal(self, stock_data: str, interval: int, symbol: str, deadline: Optional[float] = None, trace: Optional[Trace] = None) -> Optional[Dict[str, Any]]:
+        with request_latency.time():
+            response = self.send_request(stock_data, interval, symbol, deadline, trace)
         return response
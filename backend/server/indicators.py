@@ -0,0 +1,543 @@
+import functools
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from server.bars import MARKET_TIMEZONE, MICROSECOND, BarColumns, from_epoch_micros, to_epoch_micros
+from server.models import FinancialDataPoint
+
+HOUR_MICROS = 3600 * 10**6
+DAY_MICROS = 24 * HOUR_MICROS
+# Older bars weigh less than (1 - alpha) ** (4 * periods), about e**-8, in an exponential average.
+EMA_MEMORY = 4
+# A session has at most one bar per minute, so this much history always covers the current one.
+SESSION_BARS = 24 * 60
+
+
+class Tick(NamedTuple):
+    close: float
+    high: float
+    low: float
+    volume: float
+    session: int
+
+
+def market_offset(timestamp: int) -> int:
+    return from_epoch_micros(timestamp).astimezone(MARKET_TIMEZONE).utcoffset() // MICROSECOND
+
+
+def session_key(timestamp: int) -> int:
+    # The exchange's calendar day of a bar, as days since the epoch.
+    return (timestamp + market_offset(timestamp)) // DAY_MICROS
+
+
+def session_keys(timestamps: np.ndarray) -> np.ndarray:
+    # The New York offset only changes on the hour, so it is looked up once per distinct hour rather than per bar.
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    hours, inverse = np.unique(timestamps // HOUR_MICROS, return_inverse=True)
+    offsets = np.array([market_offset(int(hour) * HOUR_MICROS) for hour in hours], dtype=np.int64)
+    return (timestamps + offsets[inverse.reshape(-1)]) // DAY_MICROS
+
+
+def positive_int(value: int, name: str = "periods") -> int:
+    if not isinstance(value, int) or value <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return value
+
+
+class RollingMean:
+    def __init__(self, periods: int) -> None:
+        if periods <= 0:
+            raise ValueError("periods must be a positive integer")
+        self.periods: int = periods
+        self.window: Deque[float] = deque()
+        self.total: float = 0.0
+
+    def _value(self, total: float, count: int, latest: float) -> float:
+        # Until the window is full the average falls back to the latest close, like DataProcessor does.
+        if count >= self.periods:
+            return total / self.periods
+        return latest
+
+    def update(self, value: float) -> float:
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.periods:
+            self.total -= self.window.popleft()
+        return self._value(self.total, len(self.window), value)
+
+    def peek(self, value: float) -> float:
+        total = self.total + value
+        count = len(self.window) + 1
+        if count > self.periods:
+            total -= self.window[0]
+            count -= 1
+        return self._value(total, count, value)
+
+
+class RollingRsi:
+    def __init__(self, periods: int) -> None:
+        if periods <= 0:
+            raise ValueError("periods must be a positive integer")
+        self.periods: int = periods
+        self.changes: Deque[float] = deque()
+        self.previous: Optional[float] = None
+        self.gain_sum: float = 0.0
+        self.loss_sum: float = 0.0
+        self.loss_count: int = 0
+
+    @staticmethod
+    def _value(gain_sum: float, loss_sum: float, loss_count: int, count: int) -> float:
+        if count == 0:
+            return 50.0
+        # Tracking the number of losses keeps "no losses" exact despite float drift in the running sum.
+        if loss_count == 0 or loss_sum <= 0:
+            return 100.0
+        rs = gain_sum / loss_sum
+        return 100 - (100 / (1 + rs))
+
+    def update(self, value: float) -> float:
+        if self.previous is None:
+            self.previous = value
+            return self._value(0.0, 0.0, 0, 0)
+        change = value - self.previous
+        self.previous = value
+        if self.periods > 1:
+            self.changes.append(change)
+            self._add(change, 1)
+            if len(self.changes) > self.periods - 1:
+                self._add(self.changes.popleft(), -1)
+        return self._value(self.gain_sum, self.loss_sum, self.loss_count, len(self.changes))
+
+    def peek(self, value: float) -> float:
+        if self.previous is None or self.periods == 1:
+            return 50.0
+        change = value - self.previous
+        gain_sum, loss_sum, loss_count = self.gain_sum, self.loss_sum, self.loss_count
+        count = len(self.changes) + 1
+        if change > 0:
+            gain_sum += change
+        elif change < 0:
+            loss_sum -= change
+            loss_count += 1
+        if count > self.periods - 1:
+            dropped = self.changes[0]
+            count -= 1
+            if dropped > 0:
+                gain_sum -= dropped
+            elif dropped < 0:
+                loss_sum += dropped
+                loss_count -= 1
+        if loss_count == 0:
+            loss_sum = 0.0
+        return self._value(gain_sum, loss_sum, loss_count, count)
+
+    def _add(self, change: float, sign: int) -> None:
+        if change > 0:
+            self.gain_sum += sign * change
+        elif change < 0:
+            self.loss_sum -= sign * change
+            self.loss_count += sign
+        if self.loss_count == 0:
+            self.loss_sum = 0.0
+
+
+class RollingEma:
+    def __init__(self, periods: int) -> None:
+        self.periods: int = positive_int(periods)
+        self.alpha: float = 2 / (periods + 1)
+        self.value: Optional[float] = None
+
+    def peek(self, value: float) -> float:
+        # The first value seeds the average.
+        if self.value is None:
+            return value
+        return self.value + self.alpha * (value - self.value)
+
+    def update(self, value: float) -> float:
+        self.value = self.peek(value)
+        return self.value
+
+
+class Indicator(ABC):
+    # A registry entry. `update` commits a bar, `peek` previews the open bar without changing any state and
+    # `series` computes the same values over a whole history; each returns one value per name in `outputs`.
+    outputs: Tuple[str, ...] = ()
+    warmup: int = 1
+    uses_session: bool = False
+
+    @abstractmethod
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        ...
+
+    @abstractmethod
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        ...
+
+    @abstractmethod
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        ...
+
+
+class SimpleMovingAverage(Indicator):
+    def __init__(self, periods: int) -> None:
+        self.mean = RollingMean(positive_int(periods))
+        self.outputs = (f"sma{periods}",)
+        self.warmup = periods
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.mean.update(tick.close),)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.mean.peek(tick.close),)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        return [moving_average_series(columns.close, self.mean.periods)]
+
+
+class RelativeStrengthIndex(Indicator):
+    def __init__(self, periods: int) -> None:
+        self.rsi = RollingRsi(positive_int(periods))
+        self.outputs = (f"rsi{periods}",)
+        self.warmup = periods
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.rsi.update(tick.close),)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.rsi.peek(tick.close),)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        return [relative_strength_index_series(columns.close, self.rsi.periods)]
+
+
+class ExponentialMovingAverage(Indicator):
+    def __init__(self, periods: int) -> None:
+        self.average = RollingEma(periods)
+        self.outputs = (f"ema{periods}",)
+        self.warmup = EMA_MEMORY * periods
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.average.update(tick.close),)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        return (self.average.peek(tick.close),)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        return [exponential_average_series(columns.close, self.average.periods)]
+
+
+class MovingAverageConvergenceDivergence(Indicator):
+    def __init__(self, fast_periods: int = 12, slow_periods: int = 26, signal_periods: int = 9) -> None:
+        self.fast = RollingEma(fast_periods)
+        self.slow = RollingEma(slow_periods)
+        self.signal = RollingEma(signal_periods)
+        if fast_periods >= slow_periods:
+            raise ValueError("the fast MACD average must be shorter than the slow one")
+        suffix = f"{fast_periods}_{slow_periods}_{signal_periods}"
+        self.outputs = (f"macd{suffix}", f"macdSignal{suffix}", f"macdHistogram{suffix}")
+        self.warmup = EMA_MEMORY * (slow_periods + signal_periods)
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        macd = self.fast.update(tick.close) - self.slow.update(tick.close)
+        signal = self.signal.update(macd)
+        return macd, signal, macd - signal
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        macd = self.fast.peek(tick.close) - self.slow.peek(tick.close)
+        signal = self.signal.peek(macd)
+        return macd, signal, macd - signal
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        macd = exponential_average_series(columns.close, self.fast.periods) - exponential_average_series(columns.close, self.slow.periods)
+        signal = exponential_average_series(macd, self.signal.periods)
+        return [macd, signal, macd - signal]
+
+
+class BollingerBands(Indicator):
+    def __init__(self, periods: int = 20, width: float = 2.0) -> None:
+        self.periods: int = positive_int(periods)
+        if width <= 0:
+            raise ValueError("width must be a positive number")
+        self.width: float = width
+        self.window: Deque[float] = deque()
+        self.total: float = 0.0
+        self.squares: float = 0.0
+        self.outputs = (f"bollingerUpper{periods}", f"bollingerLower{periods}")
+        self.warmup = periods
+
+    def _value(self, total: float, squares: float, count: int, latest: float) -> Tuple[float, ...]:
+        # Like the moving averages, the bands collapse onto the latest close until the window is full.
+        if count < self.periods:
+            return latest, latest
+        mean = total / count
+        deviation = math.sqrt(max(squares / count - mean * mean, 0.0))
+        return mean + self.width * deviation, mean - self.width * deviation
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        self.window.append(tick.close)
+        self.total += tick.close
+        self.squares += tick.close * tick.close
+        if len(self.window) > self.periods:
+            dropped = self.window.popleft()
+            self.total -= dropped
+            self.squares -= dropped * dropped
+        return self._value(self.total, self.squares, len(self.window), tick.close)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        total = self.total + tick.close
+        squares = self.squares + tick.close * tick.close
+        count = len(self.window) + 1
+        if count > self.periods:
+            total -= self.window[0]
+            squares -= self.window[0] * self.window[0]
+            count -= 1
+        return self._value(total, squares, count, tick.close)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        upper = np.array(columns.close, dtype=np.float64)
+        lower = upper.copy()
+        if len(columns) >= self.periods:
+            windows = sliding_window_view(columns.close, self.periods)
+            mean, deviation = windows.mean(axis=1), windows.std(axis=1)
+            upper[self.periods - 1 :] = mean + self.width * deviation
+            lower[self.periods - 1 :] = mean - self.width * deviation
+        return [upper, lower]
+
+
+class AverageTrueRange(Indicator):
+    def __init__(self, periods: int = 14) -> None:
+        self.periods: int = positive_int(periods)
+        self.ranges: Deque[float] = deque()
+        self.total: float = 0.0
+        self.previous: Optional[float] = None
+        self.outputs = (f"atr{periods}",)
+        self.warmup = periods + 1
+
+    def _true_range(self, tick: Tick) -> float:
+        if self.previous is None:
+            return tick.high - tick.low
+        return max(tick.high - tick.low, abs(tick.high - self.previous), abs(tick.low - self.previous))
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        true_range = self._true_range(tick)
+        self.previous = tick.close
+        self.ranges.append(true_range)
+        self.total += true_range
+        if len(self.ranges) > self.periods:
+            self.total -= self.ranges.popleft()
+        return (self.total / len(self.ranges),)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        total = self.total + self._true_range(tick)
+        count = len(self.ranges) + 1
+        if count > self.periods:
+            total -= self.ranges[0]
+            count -= 1
+        return (total / count,)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        true_range = columns.high - columns.low
+        if len(columns) > 1:
+            previous = columns.close[:-1]
+            true_range[1:] = np.maximum(true_range[1:], np.maximum(np.abs(columns.high[1:] - previous), np.abs(columns.low[1:] - previous)))
+        totals = np.concatenate(([0.0], np.cumsum(true_range)))
+        end = np.arange(1, len(columns) + 1)
+        start = np.maximum(end - self.periods, 0)
+        return [(totals[end] - totals[start]) / (end - start)]
+
+
+class VolumeWeightedAveragePrice(Indicator):
+    # Anchored to the exchange day, like the VWAP on most charts. Falls back to the typical price without volume.
+    uses_session = True
+
+    def __init__(self) -> None:
+        self.session: Optional[int] = None
+        self.weighted: float = 0.0
+        self.volume: float = 0.0
+        self.outputs = ("vwap",)
+        self.warmup = SESSION_BARS
+
+    def _value(self, tick: Tick) -> Tuple[float, float, float]:
+        weighted, volume = (self.weighted, self.volume) if tick.session == self.session else (0.0, 0.0)
+        typical = (tick.high + tick.low + tick.close) / 3
+        weighted += typical * tick.volume
+        volume += tick.volume
+        return (weighted / volume if volume > 0 else typical), weighted, volume
+
+    def update(self, tick: Tick) -> Tuple[float, ...]:
+        value, self.weighted, self.volume = self._value(tick)
+        self.session = tick.session
+        return (value,)
+
+    def peek(self, tick: Tick) -> Tuple[float, ...]:
+        return (self._value(tick)[0],)
+
+    def series(self, columns: BarColumns, sessions: Optional[np.ndarray]) -> List[np.ndarray]:
+        typical = (columns.high + columns.low + columns.close) / 3
+        weighted = np.cumsum(typical * columns.volume)
+        volume = np.cumsum(columns.volume)
+        if sessions is None:
+            sessions = session_keys(columns.timestamp)
+        # Running totals restart at the first bar of every session.
+        starts = np.zeros(len(columns), dtype=np.int64)
+        boundaries = np.flatnonzero(np.diff(sessions) != 0) + 1
+        starts[boundaries] = boundaries
+        starts = np.maximum.accumulate(starts)
+        before = starts - 1
+        weighted = weighted - np.where(before >= 0, weighted[before], 0.0)
+        volume = volume - np.where(before >= 0, volume[before], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return [np.where(volume > 0, weighted / volume, typical)]
+
+
+INDICATORS: Dict[str, Callable[..., Indicator]] = {
+    "sma": SimpleMovingAverage,
+    "ema": ExponentialMovingAverage,
+    "rsi": RelativeStrengthIndex,
+    "macd": MovingAverageConvergenceDivergence,
+    "bollinger": BollingerBands,
+    "atr": AverageTrueRange,
+    "vwap": VolumeWeightedAveragePrice,
+}
+BUILT_IN_OUTPUTS = ("sma5", "sma10", "rsi6")
+
+
+def register_indicator(name: str, factory: Callable[..., Indicator]) -> None:
+    INDICATORS[name.lower()] = factory
+
+
+def parse_parameter(value: str) -> float:
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def parse_indicators(specs: Sequence[str]) -> List[Callable[[], Indicator]]:
+    # Specs look like "ema:12" or "macd:12:26:9"; every engine builds its own instances from the returned factories.
+    factories: List[Callable[[], Indicator]] = []
+    outputs = set(BUILT_IN_OUTPUTS)
+    for spec in specs:
+        name, *parameters = spec.strip().lower().split(":")
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator {name!r}, expected one of {', '.join(sorted(INDICATORS))}")
+        try:
+            factory = functools.partial(INDICATORS[name], *(parse_parameter(parameter) for parameter in parameters))
+            indicator = factory()
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid indicator {spec!r}: {e}") from e
+        if outputs & set(indicator.outputs):
+            raise ValueError(f"Indicator {spec!r} is already computed")
+        outputs.update(indicator.outputs)
+        factories.append(factory)
+    return factories
+
+
+class IndicatorEngine:
+    # The built-in averages and RSI feed the chart and the bar cache, so they stay in their own fields; configured
+    # indicators are evaluated in the same pass over each bar and returned as one row.
+    def __init__(self, fast_periods: int = 5, slow_periods: int = 10, rsi_periods: int = 6, extras: Sequence[Indicator] = ()) -> None:
+        self.fast = RollingMean(fast_periods)
+        self.slow = RollingMean(slow_periods)
+        self.rsi = RollingRsi(rsi_periods)
+        self.extras: List[Indicator] = list(extras)
+        self.names: Tuple[str, ...] = tuple(name for indicator in self.extras for name in indicator.outputs)
+        self.uses_session: bool = any(indicator.uses_session for indicator in self.extras)
+        self.warmup: int = max(fast_periods, slow_periods, rsi_periods, *(indicator.warmup for indicator in self.extras))
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        return self.update_tick(Tick(close, close, close, 0.0, 0))[0]
+
+    def peek(self, close: float) -> Tuple[float, float, float]:
+        return self.peek_tick(Tick(close, close, close, 0.0, 0))[0]
+
+    def update_tick(self, tick: Tick) -> Tuple[Tuple[float, float, float], List[float]]:
+        close = tick.close
+        built_in = self.fast.update(close), self.slow.update(close), self.rsi.update(close)
+        row: List[float] = []
+        for indicator in self.extras:
+            row.extend(indicator.update(tick))
+        return built_in, row
+
+    def peek_tick(self, tick: Tick) -> Tuple[Tuple[float, float, float], List[float]]:
+        close = tick.close
+        built_in = self.fast.peek(close), self.slow.peek(close), self.rsi.peek(close)
+        row: List[float] = []
+        for indicator in self.extras:
+            row.extend(indicator.peek(tick))
+        return built_in, row
+
+    def tick(self, data_point: FinancialDataPoint) -> Tick:
+        session = session_key(to_epoch_micros(data_point.timestamp)) if self.uses_session else 0
+        return Tick(data_point.close, data_point.high, data_point.low, data_point.volume, session)
+
+    def update_point(self, data_point: FinancialDataPoint) -> Tuple[Tuple[float, float, float], List[float]]:
+        return self.update_tick(self.tick(data_point))
+
+    def peek_point(self, data_point: FinancialDataPoint) -> Tuple[Tuple[float, float, float], List[float]]:
+        return self.peek_tick(self.tick(data_point))
+
+    def seed(self, closes: Sequence[float]) -> "IndicatorEngine":
+        # Only the last `warmup` closes influence any window, so seeding from a long history stays O(1).
+        for close in closes[-self.warmup:]:
+            self.update(close)
+        return self
+
+    def seed_columns(self, columns: BarColumns) -> "IndicatorEngine":
+        columns = columns.tail(self.warmup)
+        sessions = session_keys(columns.timestamp).tolist() if self.uses_session else [0] * len(columns)
+        for values in zip(columns.close.tolist(), columns.high.tolist(), columns.low.tolist(), columns.volume.tolist(), sessions):
+            self.update_tick(Tick(*values))
+        return self
+
+
+def moving_average_series(closes: np.ndarray, periods: int) -> np.ndarray:
+    result = np.array(closes, dtype=np.float64)
+    if len(closes) >= periods:
+        result[periods - 1 :] = sliding_window_view(closes, periods).sum(axis=1) / periods
+    return result
+
+
+def relative_strength_index_series(closes: np.ndarray, periods: int) -> np.ndarray:
+    result = np.full(len(closes), 50.0)
+    if len(closes) < 2 or periods < 2:
+        return result
+    changes = np.diff(np.asarray(closes, dtype=np.float64))
+    gains = np.concatenate(([0.0], np.cumsum(np.where(changes > 0, changes, 0.0))))
+    losses = np.concatenate(([0.0], np.cumsum(np.where(changes < 0, -changes, 0.0))))
+    loss_counts = np.concatenate(([0], np.cumsum(changes < 0)))
+    end = np.arange(1, len(closes))
+    start = np.maximum(end - (periods - 1), 0)
+    gain_sum = gains[end] - gains[start]
+    loss_sum = losses[end] - losses[start]
+    has_losses = (loss_counts[end] - loss_counts[start] > 0) & (loss_sum > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + gain_sum / loss_sum))
+    result[1:] = np.where(has_losses, rsi, 100.0)
+    return result
+
+
+def exponential_average_series(values: np.ndarray, periods: int) -> np.ndarray:
+    # The recursion has no numerically stable closed form in NumPy, so this is one scalar loop over the history.
+    alpha = 2 / (periods + 1)
+    result: List[float] = []
+    average: Optional[float] = None
+    for value in np.asarray(values, dtype=np.float64).tolist():
+        average = value if average is None else average + alpha * (value - average)
+        result.append(average)
+    return np.array(result, dtype=np.float64)
+
+
+def indicator_table(indicators: Sequence[Indicator], columns: BarColumns) -> np.ndarray:
+    # Every indicator writes its columns into one preallocated table; session keys are shared between them.
+    sessions = session_keys(columns.timestamp) if any(indicator.uses_session for indicator in indicators) else None
+    table = np.empty((len(columns), sum(len(indicator.outputs) for indicator in indicators)))
+    index = 0
+    for indicator in indicators:
+        for values in indicator.series(columns, sessions):
+            table[:, index] = values
+            index += 1
+    return table
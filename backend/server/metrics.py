@@ -0,0 +1,169 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, cast
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# For in-process stages that normally take microseconds.
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+T = TypeVar("T")
+
+
+def label_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name: str = name
+        self.description: str = description
+        self.labels: Labels = labels
+        self.value: float = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name: str = name
+        self.description: str = description
+        self.labels: Labels = labels
+        self.value: float = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labels: Labels = ()) -> None:
+        self.name: str = name
+        self.description: str = description
+        self.labels: Labels = labels
+        self.buckets: List[float] = sorted(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], Counter] = {}
+        self.gauges: Dict[Tuple[str, Labels], Gauge] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        key = (name, label_key(labels))
+        with self.lock:
+            if key not in self.counters:
+                self.counters[key] = Counter(name, description, key[1])
+            return self.counters[key]
+
+    def gauge(self, name: str, description: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+        key = (name, label_key(labels))
+        with self.lock:
+            if key not in self.gauges:
+                self.gauges[key] = Gauge(name, description, key[1])
+            return self.gauges[key]
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS, labels: Optional[Dict[str, str]] = None) -> Histogram:
+        key = (name, label_key(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(name, description, buckets, key[1])
+            return self.histograms[key]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            return {**{name + format_labels(labels): counter.value for (name, labels), counter in self.counters.items()}, **{name + format_labels(labels): gauge.value for (name, labels), gauge in self.gauges.items()}}
+
+    def render(self) -> str:
+        # Prometheus text exposition format, version 0.0.4.
+        with self.lock:
+            families = [("counter", sorted(self.counters.items())), ("gauge", sorted(self.gauges.items())), ("histogram", sorted(self.histograms.items()))]
+        lines: List[str] = []
+        for kind, items in families:
+            described = set()
+            for (name, labels), metric in items:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {metric.description}")
+                    lines.append(f"# TYPE {name} {kind}")
+                if isinstance(metric, Histogram):
+                    with metric.lock:
+                        counts, total, count = list(metric.counts), metric.sum, metric.count
+                    cumulative = 0
+                    for bound, bucket_count in zip([*metric.buckets, float("inf")], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class InstrumentedClient:
+    # Wraps a blocking SDK client and times every method call, labelled by method, so slow REST endpoints show up.
+    def __init__(self, client: Any, name: str) -> None:
+        self._client = client
+        self._name = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._client, attribute)
+        if not callable(value):
+            return value
+        labels = {"client": self._name, "method": attribute}
+        latency = metrics.histogram("rest_request_seconds", "Blocking REST calls to Alpaca", labels=labels)
+        errors = metrics.counter("rest_request_errors_total", "REST calls to Alpaca that raised", labels=labels)
+
+        @functools.wraps(value)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            with latency.time():
+                try:
+                    return value(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+
+        return timed
+
+
+def instrument(client: T, name: str) -> T:
+    return cast(T, InstrumentedClient(client, name))
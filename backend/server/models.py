@@ -1,6 +1,13 @@
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+from server.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 @dataclass
@@ -15,19 +22,109 @@ class FinancialDataPoint:
     fivePeriodMovingAverage: float = 0.0
     tenPeriodMovingAverage: float = 0.0
     sixPeriodRsi: float = 0.0
+    indicators: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class SeriesUpdate:
+    symbol: str
+    version: int
+    data: Dict[str, List[FinancialDataPoint]]
 
 
 class Cache:
-    def __init__(self, ttl_seconds: float) -> None:
+    # Thread-safe TTL cache. Only one load runs at a time; other callers wait for it instead of hitting the API too.
+    # Past the TTL the old value is still served for `stale_seconds` while a single background load replaces it.
+    def __init__(self, ttl_seconds: float, stale_seconds: Optional[float] = None, submit: Optional[Callable[..., Any]] = None, wait_seconds: float = 30.0) -> None:
+        self.ttl_seconds: float = ttl_seconds
+        self.stale_seconds: float = ttl_seconds if stale_seconds is None else stale_seconds
         self.value: Optional[Any] = None
-        self.last_updated: Optional[datetime] = None
-        self.ttl_seconds = ttl_seconds
+        self.has_value: bool = False
+        self.last_updated: float = 0.0
+        self.generation: int = 0
+        self.loading: Optional[Future] = None
+        # How long a caller waits for another caller's load before giving up on it.
+        self.wait_seconds: float = wait_seconds
+        self.lock = threading.Lock()
+        self.submit: Callable[..., Any] = submit or (lambda func, *args: threading.Thread(target=func, args=args, daemon=True).start())
+
+    def age(self) -> float:
+        return time.monotonic() - self.last_updated
 
     def get(self) -> Optional[Any]:
-        if self.last_updated and (datetime.now() - self.last_updated).total_seconds() < self.ttl_seconds:
-            return self.value
-        return None
+        with self.lock:
+            if self.has_value and self.age() < self.ttl_seconds:
+                return self.value
+            return None
 
     def set(self, value: Any) -> None:
+        with self.lock:
+            self.store(value)
+
+    def store(self, value: Any) -> None:
         self.value = value
-        self.last_updated = datetime.now()
\ No newline at end of file
+        self.has_value = True
+        self.last_updated = time.monotonic()
+
+    def invalidate(self) -> None:
+        # Loads that started before this call may carry the old state, so their results are not kept.
+        with self.lock:
+            self.value = None
+            self.has_value = False
+            self.generation += 1
+            self.loading = None
+
+    def get_or_load(self, loader: Callable[[], Any]) -> Any:
+        refresh: Optional[Future] = None
+        with self.lock:
+            if self.has_value:
+                age = self.age()
+                if age < self.ttl_seconds:
+                    return self.value
+                if age < self.ttl_seconds + self.stale_seconds:
+                    if self.loading is not None:
+                        return self.value
+                    refresh = self.loading = Future()
+                    stale, generation = self.value, self.generation
+            if refresh is None:
+                future = self.loading
+                owner = future is None
+                if owner:
+                    future = self.loading = Future()
+                generation = self.generation
+        if refresh is not None:
+            try:
+                self.submit(self.load, loader, refresh, generation)
+            except Exception as e:
+                logger.warning(f"Cache refresh could not start: {e}")
+                self.release(refresh)
+                refresh.set_exception(e)
+            return stale
+        if owner:
+            self.load(loader, future, generation)
+            return future.result()
+        try:
+            return future.result(timeout=self.wait_seconds)
+        except TimeoutError:
+            # The load is hung; the next caller starts a new one instead of joining it.
+            self.release(future)
+            raise
+
+    def release(self, future: Future) -> None:
+        with self.lock:
+            if self.loading is future:
+                self.loading = None
+
+    def load(self, loader: Callable[[], Any], future: Future, generation: int) -> None:
+        try:
+            value = loader()
+            with self.lock:
+                if generation == self.generation:
+                    self.store(value)
+        except Exception as e:
+            logger.warning(f"Cache load failed: {e}")
+            future.set_exception(e)
+            return
+        finally:
+            self.release(future)
+        future.set_result(value)
@@ -0,0 +1,138 @@
+import asyncio
+import bisect
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from server.async_executor import AsyncExecutor
+from server.logger import get_logger
+from server.metrics import metrics
+
+logger = get_logger(__name__)
+
+OCC_SYMBOL = re.compile(r"^([A-Z.]+?)\d?(\d{6})([CP])(\d{8})$")
+
+index_hits = metrics.counter("option_chain_hits_total", "get_options lookups answered from the option chain index")
+index_misses = metrics.counter("option_chain_misses_total", "get_options lookups that fell back to Alpaca")
+index_refreshes = metrics.counter("option_chain_refreshes_total", "Option chains fetched from Alpaca")
+
+
+def underlying_of(option_symbol: str) -> Optional[str]:
+    match = OCC_SYMBOL.match(option_symbol.strip().upper())
+    return match.group(1) if match else None
+
+
+def contract_type(contract: Any) -> str:
+    return str(getattr(contract.type, "value", contract.type)).upper()
+
+
+@dataclass
+class ExpirySlice:
+    strikes: List[float] = field(default_factory=list)
+    contracts: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class OptionChain:
+    underlying: str
+    horizon: date
+    fetched_at: float
+    # type ("CALL"/"PUT") -> sorted expirations, with the strike-sorted contracts of each expiration alongside.
+    expirations: Dict[str, List[date]] = field(default_factory=dict)
+    slices: Dict[str, List[ExpirySlice]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, underlying: str, horizon: date, contracts: Iterable[Any]) -> "OptionChain":
+        chain = cls(underlying, horizon, time.monotonic())
+        ordered = sorted(contracts, key=lambda contract: (contract_type(contract), contract.expiration_date, float(contract.strike_price)))
+        for contract in ordered:
+            option_type = contract_type(contract)
+            expirations = chain.expirations.setdefault(option_type, [])
+            slices = chain.slices.setdefault(option_type, [])
+            if not expirations or expirations[-1] != contract.expiration_date:
+                expirations.append(contract.expiration_date)
+                slices.append(ExpirySlice())
+            slices[-1].strikes.append(float(contract.strike_price))
+            slices[-1].contracts.append(contract)
+        return chain
+
+    def query(self, option_type: str, strike_gte: float, strike_lte: float, expiration_gte: date, limit: int) -> List[Any]:
+        expirations = self.expirations.get(option_type, [])
+        slices = self.slices.get(option_type, [])
+        found: List[Any] = []
+        for expiry in slices[bisect.bisect_left(expirations, expiration_gte):]:
+            start = bisect.bisect_left(expiry.strikes, strike_gte)
+            end = bisect.bisect_right(expiry.strikes, strike_lte)
+            found.extend(expiry.contracts[start:end][: limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
+
+
+class OptionChainIndex:
+    def __init__(self, fetch: Callable[[str, date], List[Any]], executor: AsyncExecutor, max_age: float = 300.0, horizon_days: int = 45) -> None:
+        if max_age <= 0:
+            raise ValueError("max_age must be a positive number")
+        if horizon_days <= 0:
+            raise ValueError("horizon_days must be a positive integer")
+        self.fetch: Callable[[str, date], List[Any]] = fetch
+        self.executor: AsyncExecutor = executor
+        self.max_age: float = max_age
+        self.horizon_days: int = horizon_days
+        self.chains: Dict[str, OptionChain] = {}
+        self.refreshing: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def query(self, underlying: str, option_type: str, strike_gte: float, strike_lte: float, expiration_gte: date, limit: int = 15) -> Optional[List[Any]]:
+        # None means the index cannot answer (missing, stale or out of range) and the caller should ask Alpaca.
+        chain = self.chains.get(underlying)
+        if chain is None or time.monotonic() - chain.fetched_at > self.max_age:
+            index_misses.inc()
+            self.refresh_in_background(underlying)
+            return None
+        if expiration_gte > chain.horizon:
+            index_misses.inc()
+            return None
+        index_hits.inc()
+        return chain.query(option_type, strike_gte, strike_lte, expiration_gte, limit)
+
+    def refresh(self, underlying: str) -> None:
+        with self.lock:
+            if underlying in self.refreshing:
+                return
+            self.refreshing.add(underlying)
+        try:
+            horizon = date.fromordinal(date.today().toordinal() + self.horizon_days)
+            chain = OptionChain.build(underlying, horizon, self.fetch(underlying, horizon))
+            self.chains[underlying] = chain
+            index_refreshes.inc()
+            logger.info(f"Indexed {sum(len(expiry.contracts) for slices in chain.slices.values() for expiry in slices)} option contracts for {underlying}")
+        except Exception as e:
+            logger.error(f"Could not refresh the option chain for {underlying}: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(underlying)
+
+    def refresh_in_background(self, underlying: str) -> None:
+        if underlying not in self.refreshing:
+            self.executor.submit(self.refresh, underlying)
+
+    def invalidate(self, option_symbol: str) -> None:
+        # A rejected order usually means the index no longer matches the exchange, so it is dropped and rebuilt.
+        underlying = underlying_of(option_symbol)
+        if underlying is None or self.chains.pop(underlying, None) is None:
+            return
+        logger.info(f"Option chain for {underlying} invalidated after a rejected order")
+        self.refresh_in_background(underlying)
+
+    async def run_refresh(self, underlyings: List[str], interval: float) -> None:
+        while True:
+            for underlying in set(underlyings) | set(self.chains):
+                try:
+                    await self.executor.run(self.refresh, underlying, timeout=max(interval, self.executor.timeout))
+                except asyncio.TimeoutError:
+                    pass
+            await asyncio.sleep(interval)
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import struct
+from collections import deque
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+import orjson
+
+from server.logger import get_logger
+from server.metrics import metrics
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.serialization import dumps, encode_update
+from server.snapshot_cache import BOOT_ID
+from server.symbol_state import DISPLAY_WINDOW
+
+logger = get_logger(__name__)
+
+# Every frame is a 4 byte big-endian length followed by one JSON message: the same delta and snapshot
+# messages the dashboard receives, plus a "settings" message when a subscriber connects.
+HEADER = struct.Struct(">I")
+
+subscriber_count = metrics.gauge("pubsub_subscribers", "API workers subscribed to the ingestion process")
+dropped_subscribers = metrics.counter("pubsub_subscribers_dropped_total", "API workers disconnected for falling behind")
+subscriber_reconnects = metrics.counter("pubsub_reconnects_total", "Reconnects of this API worker to the ingestion process")
+
+
+def frame(message: bytes) -> bytes:
+    return HEADER.pack(len(message)) + message
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return orjson.loads(await reader.readexactly(size))
+
+
+def parse_point(bar: Dict[str, Any]) -> FinancialDataPoint:
+    return FinancialDataPoint(**{**bar, "timestamp": datetime.fromisoformat(bar["timestamp"])})
+
+
+class Subscription:
+    def __init__(self, writer: asyncio.StreamWriter, max_pending: int) -> None:
+        self.writer: asyncio.StreamWriter = writer
+        self.max_pending: int = max_pending
+        self.outbox: Deque[bytes] = deque()
+        self.ready = asyncio.Event()
+        self.closed: bool = False
+
+    def send(self, message: bytes) -> None:
+        # A worker that cannot keep up is cut off; it reconnects and starts again from fresh snapshots.
+        if self.closed:
+            return
+        if len(self.outbox) >= self.max_pending:
+            logger.warning("Dropping API worker subscription: outbox is full")
+            dropped_subscribers.inc()
+            self.closed = True
+            # The write loop may be stuck in drain() on a worker that stopped reading; aborting wakes it up.
+            self.writer.transport.abort()
+        else:
+            self.outbox.append(frame(message))
+        self.ready.set()
+
+    async def write_loop(self) -> None:
+        while not self.closed:
+            while not self.outbox and not self.closed:
+                self.ready.clear()
+                await self.ready.wait()
+            while self.outbox and not self.closed:
+                self.writer.write(self.outbox.popleft())
+            await self.writer.drain()
+
+
+class Publisher:
+    # Runs in the ingestion process and hands every series update to the API workers over a Unix socket.
+    def __init__(self, path: str, source: Any, max_pending: int = 1024) -> None:
+        if max_pending <= 0:
+            raise ValueError("max_pending must be a positive integer")
+        self.path: str = path
+        self.source: Any = source
+        self.max_pending: int = max_pending
+        self.subscriptions: Set[Subscription] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+        logger.info(f"Publishing series updates on {self.path}")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for subscription in list(self.subscriptions):
+            subscription.closed = True
+            subscription.ready.set()
+
+    def publish(self, update: SeriesUpdate) -> None:
+        if not self.subscriptions:
+            return
+        message = encode_update("delta", update)
+        for subscription in list(self.subscriptions):
+            subscription.send(message)
+            if subscription.closed:
+                self.subscriptions.discard(subscription)
+                subscriber_count.set(len(self.subscriptions))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Subscribed before the snapshots are taken, so no update falls in between; the worker skips deltas
+        # that a snapshot already contains.
+        subscription = Subscription(writer, self.max_pending)
+        self.subscriptions.add(subscription)
+        subscriber_count.set(len(self.subscriptions))
+        logger.info("API worker subscribed")
+        try:
+            await self.source.ready.wait()
+            writer.write(frame(dumps({"type": "settings", "bootId": BOOT_ID, "data": self.source.get_settings()})))
+            for symbol in self.source.symbols:
+                snapshot = await self.source.get_current_data(symbol)
+                if snapshot is not None:
+                    writer.write(frame(encode_update("snapshot", snapshot)))
+            await subscription.write_loop()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(f"API worker subscription failed: {e}")
+        finally:
+            self.subscriptions.discard(subscription)
+            subscriber_count.set(len(self.subscriptions))
+            writer.close()
+            logger.info("API worker unsubscribed")
+
+
+class SeriesMirror:
+    # An API worker's copy of the dashboard window of every symbol, kept current by the published deltas.
+    # It answers the same calls app.py makes on StockDataClient.
+    def __init__(self, window: int = DISPLAY_WINDOW) -> None:
+        self.window: int = window
+        self.series: Dict[str, SeriesUpdate] = {}
+        self.settings: Dict[str, Any] = {}
+        self.boot_id: Optional[str] = None
+        self.ready = asyncio.Event()
+
+    def apply(self, message: Dict[str, Any]) -> Optional[SeriesUpdate]:
+        # Returns the delta to forward to this worker's WebSocket clients, if there is one.
+        if message["type"] == "settings":
+            if self.boot_id is not None and message["bootId"] != self.boot_id:
+                # A restarted ingestion process counts versions from zero again, so nothing of the old run is
+                # served until its snapshots arrive.
+                self.series.clear()
+                self.ready.clear()
+            self.settings = message["data"]
+            self.boot_id = message["bootId"]
+            return None
+        symbol, version = message["symbol"], message["seq"]
+        data = {key: [parse_point(bar) for bar in bars] for key, bars in message["data"].items()}
+        if message["type"] == "snapshot":
+            self.series[symbol] = SeriesUpdate(symbol, version, data)
+            if set(self.settings.get("symbols", ())) <= set(self.series):
+                self.ready.set()
+            return None
+        current = self.series.get(symbol)
+        if current is None or version <= current.version:
+            return None
+        for key, bars in data.items():
+            merged = {bar.timestamp: bar for bar in current.data.get(key, [])}
+            merged.update((bar.timestamp, bar) for bar in bars)
+            current.data[key] = sorted(merged.values(), key=lambda bar: bar.timestamp)[-self.window :]
+        current.version = version
+        return SeriesUpdate(symbol, version, data)
+
+    @property
+    def status(self) -> str:
+        return "ready" if self.ready.is_set() else "warming"
+
+    def get_version(self, symbol: str) -> Optional[int]:
+        current = self.series.get(symbol)
+        return current.version if current is not None else None
+
+    async def get_current_data(self, symbol: str) -> Optional[SeriesUpdate]:
+        current = self.series.get(symbol)
+        if current is None:
+            return None
+        return replace(current, data={key: list(bars) for key, bars in current.data.items()})
+
+    def get_settings(self) -> Dict[str, Any]:
+        return self.settings
+
+
+class Subscriber:
+    # Runs in each API worker: follows the ingestion process and passes every new delta on.
+    def __init__(self, path: str, mirror: SeriesMirror, on_update: Callable[[SeriesUpdate], Awaitable[None]], on_restart: Optional[Callable[[str], None]] = None, retry_delay: float = 1.0, on_snapshot: Optional[Callable[[str], None]] = None) -> None:
+        self.path: str = path
+        self.mirror: SeriesMirror = mirror
+        self.on_update: Callable[[SeriesUpdate], Awaitable[None]] = on_update
+        # Called with the new boot id when the ingestion process restarted and its versions began again.
+        self.on_restart: Optional[Callable[[str], None]] = on_restart
+        self.retry_delay: float = retry_delay
+        # Called with the symbol of every snapshot frame, whose version may be lower than one seen before.
+        self.on_snapshot: Optional[Callable[[str], None]] = on_snapshot
+        self.connected = asyncio.Event()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning(f"Ingestion process not reachable on {self.path}: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            self.connected.set()
+            try:
+                while True:
+                    boot_id = self.mirror.boot_id
+                    message = await read_frame(reader)
+                    update = self.mirror.apply(message)
+                    if self.mirror.boot_id != boot_id and self.on_restart is not None:
+                        self.on_restart(self.mirror.boot_id)
+                    if message["type"] == "snapshot" and self.on_snapshot is not None:
+                        self.on_snapshot(message["symbol"])
+                    if update is not None:
+                        await self.on_update(update)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logger.warning(f"Lost the ingestion process: {e}")
+            except Exception:
+                # A bad frame or a failing client update must not end this worker's feed; it resubscribes for snapshots.
+                logger.exception("Series feed from the ingestion process failed")
+            finally:
+                self.connected.clear()
+                writer.close()
+            subscriber_reconnects.inc()
+            await asyncio.sleep(self.retry_delay)
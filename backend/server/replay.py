@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from server.decision_scheduler import DecisionRequest
+from server.logger import get_logger
+from server.models import FinancialDataPoint
+from server.simulation import SimulatedBroker, SimulatedGrokClient
+from server.stockClient import StockDataClient
+
+logger = get_logger(__name__)
+
+
+def read_bars(path: str) -> List[Dict[str, Any]]:
+    # Recordings are JSON lines in the same shape as the Alpaca stream's bar messages.
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def write_bars(path: str, messages: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    with open(path, "w") as file:
+        for message in messages:
+            file.write(json.dumps(message) + "\n")
+            count += 1
+    return count
+
+
+def percentile_ms(samples: List[float], percentile: float) -> float:
+    return float(np.percentile(samples, percentile) * 1000) if samples else 0.0
+
+
+@dataclass
+class ReplayReport:
+    bars: int
+    seconds: float
+    bars_per_second: float
+    handler_p50_ms: float
+    handler_p99_ms: float
+    decisions: int
+    decision_p50_ms: float
+    decision_p99_ms: float
+    trades: int
+    starting_equity: float
+    final_equity: float
+    pnl: float
+
+
+class ReplayStockDataClient(StockDataClient):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.decision_latencies: List[float] = []
+
+    async def run_decision(self, request: DecisionRequest) -> None:
+        await super().run_decision(request)
+        self.decision_latencies.append(time.monotonic() - request.enqueued_at)
+
+    async def fetch_decision_context(self, request: DecisionRequest) -> Optional[List[FinancialDataPoint]]:
+        # A replay never reaches for REST; decisions before the in-memory series has warmed up are skipped.
+        return None
+
+
+async def discard_update(update: Any) -> None:
+    pass
+
+
+async def run_replay(messages: List[Dict[str, Any]], interval: int, speed: float = 0.0, broker: Optional[SimulatedBroker] = None, grok_client: Optional[Any] = None, history_depth: int = 1000, wait_for_decisions: bool = True) -> ReplayReport:
+    broker = broker or SimulatedBroker()
+    grok_client = grok_client or SimulatedGrokClient(broker)
+    symbols = list(dict.fromkeys(message["S"] for message in messages))
+    client = ReplayStockDataClient("replay", "replay", discard_update, grok_client, interval, history_depth, symbols, decision_deadline=3600.0)
+    client.scheduler.start()
+    handler_latencies: List[float] = []
+    previous: Optional[datetime] = None
+    started = time.perf_counter()
+    try:
+        for message in messages:
+            timestamp = datetime.fromisoformat(message["t"])
+            if speed > 0 and previous is not None and timestamp > previous:
+                await asyncio.sleep((timestamp - previous).total_seconds() / speed)
+            previous = timestamp
+            broker.on_bar(message["S"], message["c"], timestamp)
+            handled = time.perf_counter()
+            await client.quote_data_handler(message)
+            handler_latencies.append(time.perf_counter() - handled)
+            if wait_for_decisions:
+                # Every decision sees the bar it was made for, however fast the machine replays.
+                await client.scheduler.join()
+        await client.scheduler.join()
+    finally:
+        await client.scheduler.stop()
+        client.executor.shutdown()
+    seconds = time.perf_counter() - started
+    final_equity = broker.equity()
+    return ReplayReport(
+        bars=len(messages),
+        seconds=seconds,
+        bars_per_second=len(messages) / seconds if seconds > 0 else 0.0,
+        handler_p50_ms=percentile_ms(handler_latencies, 50),
+        handler_p99_ms=percentile_ms(handler_latencies, 99),
+        decisions=getattr(grok_client, "decisions", len(client.decision_latencies)),
+        decision_p50_ms=percentile_ms(client.decision_latencies, 50),
+        decision_p99_ms=percentile_ms(client.decision_latencies, 99),
+        trades=broker.trades,
+        starting_equity=broker.starting_cash,
+        final_equity=final_equity,
+        pnl=final_equity - broker.starting_cash,
+    )
@@ -0,0 +1,75 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from server.bars import MARKET_TIMEZONE, BarColumns, BarSeries
+from server.data_processor import DataProcessor
+from server.indicators import IndicatorEngine
+from server.logger import get_logger
+from server.models import FinancialDataPoint
+
+logger = get_logger(__name__)
+
+MINUTES_PER_DAY = 60 * 24
+
+
+def bucket_start(timestamp: datetime, minutes: int) -> datetime:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    if minutes == MINUTES_PER_DAY:
+        # Daily bars are keyed by the exchange's calendar day, matching Alpaca's day bars.
+        local = timestamp.astimezone(MARKET_TIMEZONE)
+        return local.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    size = timedelta(minutes=minutes)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return epoch + ((timestamp - epoch) // size) * size
+
+
+class Resampler:
+    def __init__(self, minutes: int, processor: DataProcessor, capacity: int) -> None:
+        if minutes <= 0 or (minutes > 60 and minutes != MINUTES_PER_DAY):
+            raise ValueError("minutes must be between 1 and 60 or a full day")
+        self.minutes: int = minutes
+        self.processor: DataProcessor = processor
+        self.series: BarSeries = BarSeries(capacity, processor.indicator_names)
+        self.engine: IndicatorEngine = processor.create_engine()
+        self.current: Optional[FinancialDataPoint] = None
+        self.watermark: Optional[datetime] = None
+
+    def load(self, columns: BarColumns, watermark: Optional[datetime] = None) -> None:
+        # The newest backfilled bar stays open, so only the bars before it are committed to the engine.
+        self.series.clear()
+        self.series.extend(columns)
+        self.engine = self.processor.create_engine(columns.slice(0, -1))
+        self.current = self.series.last_point()
+        self.watermark = watermark
+
+    def add(self, data_point: FinancialDataPoint) -> Optional[FinancialDataPoint]:
+        if self.watermark is not None and data_point.timestamp <= self.watermark:
+            return None
+        self.watermark = data_point.timestamp
+        bucket = bucket_start(data_point.timestamp, self.minutes)
+
+        if self.current is not None and bucket < self.current.timestamp:
+            logger.warning(f"Dropping late bar {data_point.timestamp} for the {self.minutes} minute series")
+            return None
+
+        if self.current is not None and bucket == self.current.timestamp:
+            bar = replace(
+                self.current,
+                high=max(self.current.high, data_point.high),
+                low=min(self.current.low, data_point.low),
+                close=data_point.close,
+                tradeCount=self.current.tradeCount + data_point.tradeCount,
+                volume=self.current.volume + data_point.volume,
+            )
+            self.current = self.processor.preview_kpi(bar, self.engine)
+            self.series.update_last(self.current)
+            return self.current
+
+        if self.current is not None:
+            self.engine.update_point(self.current)
+        bar = replace(data_point, timestamp=bucket)
+        self.current = self.processor.preview_kpi(bar, self.engine)
+        self.series.append(self.current)
+        return self.current
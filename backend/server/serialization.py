@@ -0,0 +1,90 @@
+import math
+import operator
+import struct
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import msgpack
+import numpy as np
+import orjson
+
+from server.bars import to_epoch_micros
+from server.models import FinancialDataPoint, SeriesUpdate
+
+# Wire formats a /ws client can ask for. "json" is what the dashboard reads; the other two send each
+# timeframe as columns with epoch-millisecond timestamps instead of one object per bar.
+ENCODINGS = ("json", "msgpack", "columns")
+POINT_FIELDS = ("timestamp", "open", "high", "low", "close", "volume", "tradeCount", "fivePeriodMovingAverage", "tenPeriodMovingAverage", "sixPeriodRsi")
+HEADER_LENGTH = struct.Struct("<I")
+point_values = operator.attrgetter(*POINT_FIELDS[1:])
+
+
+def dumps(obj: Any) -> bytes:
+    # orjson encodes dataclasses and datetimes natively, with the same ISO format as datetime.isoformat().
+    return orjson.dumps(obj)
+
+
+def encode_series(update: SeriesUpdate) -> bytes:
+    return dumps(update.data)
+
+
+def encode_update(message_type: str, update: SeriesUpdate, data: Optional[bytes] = None, prev: Optional[int] = None) -> bytes:
+    # Deltas are upserts keyed by bar timestamp; `prev` lets clients spot a missed message and ask for a resync.
+    # The already encoded series can be passed in, so a cached snapshot body is spliced rather than re-encoded.
+    header = message_header(message_type, update, prev)
+    return dumps(header)[:-1] + b',"data":' + (data if data is not None else encode_series(update)) + b"}"
+
+
+def message_header(message_type: str, update: SeriesUpdate, prev: Optional[int] = None) -> Dict[str, Any]:
+    header: Dict[str, Any] = {"type": message_type, "symbol": update.symbol, "seq": update.version}
+    if message_type == "delta":
+        header["prev"] = update.version - 1 if prev is None else prev
+    return header
+
+
+def field_names(update: SeriesUpdate) -> List[str]:
+    # Every series of a symbol carries the same configured indicators, so the first bar names them.
+    first = next((bars[0] for bars in update.data.values() if bars), None)
+    return [*POINT_FIELDS, *(first.indicators if first is not None else ())]
+
+
+def point_columns(points: List[FinancialDataPoint], fields: List[str]) -> List[Tuple[Any, ...]]:
+    # Built row by row and transposed, which is far cheaper than one comprehension per field for small deltas.
+    extra = fields[len(POINT_FIELDS) :]
+    rows = [(to_epoch_micros(point.timestamp) // 1000, *point_values(point), *(point.indicators.get(name, math.nan) for name in extra)) for point in points]
+    return list(zip(*rows)) if rows else [() for _ in fields]
+
+
+def encode_msgpack(message_type: str, update: SeriesUpdate, prev: Optional[int] = None) -> bytes:
+    fields = field_names(update)
+    data = {key: dict(zip(fields, point_columns(points, fields))) for key, points in update.data.items()}
+    return msgpack.packb({**message_header(message_type, update, prev), "data": data})
+
+
+def encode_columns(message_type: str, update: SeriesUpdate, prev: Optional[int] = None) -> bytes:
+    # A little-endian u32 header length, a JSON header naming the fields and the bar count of each series,
+    # then for every series in header order its columns back to back as little-endian float64.
+    fields = field_names(update)
+    values = [value for points in update.data.values() for column in point_columns(points, fields) for value in column]
+    header = dumps({**message_header(message_type, update, prev), "fields": fields, "series": {key: len(points) for key, points in update.data.items()}})
+    return HEADER_LENGTH.pack(len(header)) + header + struct.pack(f"<{len(values)}d", *values)
+
+
+def decode_columns(payload: bytes) -> Tuple[Dict[str, Any], Dict[str, Dict[str, np.ndarray]]]:
+    (length,) = HEADER_LENGTH.unpack_from(payload)
+    header = orjson.loads(payload[HEADER_LENGTH.size : HEADER_LENGTH.size + length])
+    values = np.frombuffer(payload, dtype="<f8", offset=HEADER_LENGTH.size + length)
+    series, offset = {}, 0
+    for key, count in header["series"].items():
+        block = values[offset : offset + count * len(header["fields"])].reshape(len(header["fields"]), count)
+        series[key] = dict(zip(header["fields"], block))
+        offset += block.size
+    return header, series
+
+
+def encode_message(message_type: str, update: SeriesUpdate, encoding: str = "json", prev: Optional[int] = None) -> Union[str, bytes]:
+    # JSON goes out as a text frame, the compact encodings as binary frames.
+    if encoding == "msgpack":
+        return encode_msgpack(message_type, update, prev)
+    if encoding == "columns":
+        return encode_columns(message_type, update, prev)
+    return encode_update(message_type, update, prev=prev).decode()
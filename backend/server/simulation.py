@@ -0,0 +1,181 @@
+import json
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from server.option_chain import OCC_SYMBOL
+from server.utils import ValidationUtils
+
+CONTRACT_SIZE = 100
+
+
+def option_symbol(underlying: str, expiration: date, option_type: str, strike: float) -> str:
+    return f"{underlying}{expiration:%y%m%d}{option_type[0]}{int(round(strike * 1000)):08d}"
+
+
+@dataclass
+class SimulatedPosition:
+    symbol: str
+    quantity: float
+    cost_basis: float
+    stop_price: Optional[float] = None
+    profit_price: Optional[float] = None
+
+
+class SimulatedBroker:
+    # Stands in for TradingDataClient during a replay. Options are valued at their intrinsic value against the
+    # last replayed close of the underlying, which is crude but needs nothing beyond the recorded bars.
+    def __init__(self, cash: float = 100000.0, strike_step: float = 5.0) -> None:
+        self.starting_cash: float = cash
+        self.cash: float = cash
+        self.strike_step: float = strike_step
+        self.prices: Dict[str, float] = {}
+        self.now: Optional[datetime] = None
+        self.positions: Dict[str, SimulatedPosition] = {}
+        self.trades: int = 0
+        self.lock = threading.Lock()
+
+    def mark(self, symbol: str) -> Optional[float]:
+        match = OCC_SYMBOL.match(symbol)
+        if match is None:
+            return self.prices.get(symbol)
+        option_type, strike = match.group(3), int(match.group(4)) / 1000
+        price = self.prices.get(match.group(1))
+        if price is None:
+            return None
+        return max(price - strike, 0.0) if option_type == "C" else max(strike - price, 0.0)
+
+    def expiration(self, symbol: str) -> Optional[date]:
+        match = OCC_SYMBOL.match(symbol)
+        return datetime.strptime(match.group(2), "%y%m%d").date() if match else None
+
+    def multiplier(self, symbol: str) -> int:
+        return CONTRACT_SIZE if OCC_SYMBOL.match(symbol) else 1
+
+    def on_bar(self, symbol: str, close: float, timestamp: datetime) -> None:
+        with self.lock:
+            self.prices[symbol] = close
+            self.now = timestamp
+            for position in list(self.positions.values()):
+                price = self.mark(position.symbol)
+                expiration = self.expiration(position.symbol)
+                if price is None:
+                    continue
+                if expiration is not None and timestamp.date() > expiration:
+                    self.fill(position.symbol, -position.quantity, price)
+                elif position.stop_price is not None and price <= position.stop_price:
+                    self.fill(position.symbol, -position.quantity, price)
+                elif position.profit_price is not None and price >= position.profit_price:
+                    self.fill(position.symbol, -position.quantity, price)
+
+    def fill(self, symbol: str, quantity: float, price: float) -> None:
+        self.cash -= quantity * price * self.multiplier(symbol)
+        self.trades += 1
+        position = self.positions.get(symbol)
+        if position is None:
+            self.positions[symbol] = SimulatedPosition(symbol, quantity, quantity * price * self.multiplier(symbol))
+            return
+        position.quantity += quantity
+        position.cost_basis += quantity * price * self.multiplier(symbol)
+        if position.quantity == 0:
+            del self.positions[symbol]
+
+    def market_value(self) -> float:
+        return sum(position.quantity * (self.mark(position.symbol) or 0.0) * self.multiplier(position.symbol) for position in self.positions.values())
+
+    def equity(self) -> float:
+        with self.lock:
+            return self.cash + self.market_value()
+
+    def get_settings(self) -> Dict[str, Any]:
+        return {"paper": True, "simulated": True}
+
+    def get_account_info(self) -> Dict[str, float]:
+        with self.lock:
+            long_value = sum(position.quantity * (self.mark(position.symbol) or 0.0) * self.multiplier(position.symbol) for position in self.positions.values() if position.quantity > 0)
+            short_value = self.market_value() - long_value
+            return {"portfolio_value": self.cash + long_value + short_value, "cash": self.cash, "buying_power": self.cash, "long_market_value": long_value, "short_market_value": short_value}
+
+    def get_open_positions(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            positions = []
+            for position in self.positions.values():
+                market_value = position.quantity * (self.mark(position.symbol) or 0.0) * self.multiplier(position.symbol)
+                positions.append({"symbol": position.symbol, "quantity": position.quantity, "market_value": market_value, "original_cost": position.cost_basis, "unrealized_profit_loss": market_value - position.cost_basis})
+            return positions
+
+    def get_options(self, underlying_symbol: str, strike_price_gte: str, strike_price_lte: str, option_type: str, expiration_date_gte: str) -> Any:
+        # A synthetic chain: Friday expirations for the next four weeks and strikes every `strike_step` dollars.
+        underlying_symbol = underlying_symbol.strip().upper()
+        low, high = float(strike_price_gte), float(strike_price_lte)
+        start = datetime.fromisoformat(expiration_date_gte).date()
+        first_friday = start + timedelta(days=(4 - start.weekday()) % 7)
+        strike = (low // self.strike_step + (low % self.strike_step > 0)) * self.strike_step
+        contracts = []
+        for week in range(4):
+            expiration = first_friday + timedelta(weeks=week)
+            current = strike
+            while current <= high and len(contracts) < 15:
+                contracts.append({"symbol": option_symbol(underlying_symbol, expiration, option_type.upper(), current), "type": option_type.upper(), "expiration_date": expiration.isoformat(), "strike_price": current})
+                current += self.strike_step
+        return contracts[:15]
+
+    def buy_option(self, symbol: str, quantity: float, stop_price: float, profit_price: float, trace: Optional[Any] = None) -> str:
+        if error := ValidationUtils.validate_option_params(symbol, quantity, stop_price, profit_price):
+            return error
+        with self.lock:
+            price = self.mark(symbol)
+            if price is None:
+                return f"No price for {symbol}"
+            self.fill(symbol, quantity, price)
+            if symbol in self.positions:
+                self.positions[symbol].stop_price = stop_price
+                self.positions[symbol].profit_price = profit_price
+            return f"Success. Remaining cash: {self.cash}"
+
+    def sell_option(self, symbol: str, quantity: float, trace: Optional[Any] = None) -> str:
+        if error := ValidationUtils.validate_symbol(symbol):
+            return error
+        if error := ValidationUtils.validate_quantity(quantity):
+            return error
+        with self.lock:
+            price = self.mark(symbol)
+            position = self.positions.get(symbol)
+            if price is None or position is None:
+                return f"No open position for {symbol}"
+            self.fill(symbol, -min(quantity, position.quantity) if position.quantity > 0 else -position.quantity, price)
+            return f"Success. New cash: {self.cash}"
+
+
+def moving_average_strategy(bars: List[Dict[str, Any]], symbol: str, broker: SimulatedBroker) -> str:
+    # Buys a near-the-money call while the fast average is above the slow one and closes it when they cross back.
+    last = bars[-1]
+    held = [position for position in broker.get_open_positions() if position["symbol"].startswith(symbol)]
+    if last["fivePeriodMovingAverage"] > last["tenPeriodMovingAverage"] and last["sixPeriodRsi"] < 70 and not held:
+        today = datetime.fromisoformat(last["timestamp"]).date()
+        contracts = broker.get_options(symbol, str(last["close"] - broker.strike_step), str(last["close"]), "CALL", (today + timedelta(days=7)).isoformat())
+        if contracts:
+            broker.buy_option(contracts[0]["symbol"], 1, 0.01, last["close"])
+            return "bought call"
+    if last["fivePeriodMovingAverage"] < last["tenPeriodMovingAverage"] and held:
+        for position in held:
+            broker.sell_option(position["symbol"], position["quantity"])
+        return "closed calls"
+    return "hold"
+
+
+class SimulatedGrokClient:
+    # Drop-in for GrokAPIClient: the strategy sees the same bar JSON the model would and trades on the broker.
+    def __init__(self, broker: SimulatedBroker, strategy: Callable[[List[Dict[str, Any]], str, SimulatedBroker], str] = moving_average_strategy) -> None:
+        self.broker: SimulatedBroker = broker
+        self.strategy: Callable[[List[Dict[str, Any]], str, SimulatedBroker], str] = strategy
+        self.decisions: int = 0
+
+    def get_settings(self) -> Dict[str, Any]:
+        return {"model": getattr(self.strategy, "__name__", "strategy"), "disabled_grok": False}
+
+    def get_signal(self, stock_data: str, interval: int, symbol: str, deadline: Optional[float] = None, trace: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        self.decisions += 1
+        decision = self.strategy(json.loads(stock_data), symbol, self.broker)
+        return {"role": "assistant", "content": decision}
@@ -0,0 +1,62 @@
+import secrets
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Union
+
+from server.models import SeriesUpdate
+from server.serialization import encode_message, encode_series, encode_update
+
+# Versions restart at zero with the process, so the boot id keeps ETags from an earlier run from matching.
+BOOT_ID = secrets.token_hex(4)
+
+
+@dataclass
+class EncodedSnapshot:
+    version: int
+    etag: str
+    body: bytes
+    message: str
+    snapshot: Optional[SeriesUpdate] = None
+    # Compact /ws encodings of the same snapshot, made on first use.
+    messages: Dict[str, bytes] = field(default_factory=dict)
+
+    def message_for(self, encoding: str) -> Union[str, bytes]:
+        if encoding == "json" or self.snapshot is None:
+            return self.message
+        if encoding not in self.messages:
+            self.messages[encoding] = encode_message("snapshot", self.snapshot, encoding)
+        return self.messages[encoding]
+
+
+class SnapshotCache:
+    def __init__(self, boot_id: str = BOOT_ID) -> None:
+        self.entries: Dict[str, EncodedSnapshot] = {}
+        self.boot_id: str = boot_id
+
+    def reset(self, boot_id: str) -> None:
+        # API workers serve the ingestion process's versions, so they take over its boot id and drop older entries.
+        self.entries.clear()
+        self.boot_id = boot_id
+
+    def discard(self, symbol: str) -> None:
+        self.entries.pop(symbol, None)
+
+    def get(self, symbol: str, version: int) -> Optional[EncodedSnapshot]:
+        entry = self.entries.get(symbol)
+        if entry is not None and entry.version == version:
+            return entry
+        return None
+
+    def store(self, snapshot: SeriesUpdate) -> EncodedSnapshot:
+        entry = self.entries.get(snapshot.symbol)
+        if entry is not None and entry.version >= snapshot.version:
+            return entry
+        body = encode_series(snapshot)
+        entry = EncodedSnapshot(
+            version=snapshot.version,
+            etag=f'"{snapshot.symbol}-{self.boot_id}-{snapshot.version}"',
+            body=body,
+            message=encode_update("snapshot", snapshot, body).decode(),
+            snapshot=snapshot,
+        )
+        self.entries[snapshot.symbol] = entry
+        return entry
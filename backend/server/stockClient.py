@@ -1,103 +1,146 @@
-import json
 import asyncio
-import threading
-from dataclasses import asdict
+import time
+from dataclasses import replace
+from server.async_executor import AsyncExecutor
 from server.grokClient import GrokAPIClient
+from server.bar_cache import BarCache
+from server.bars import BarColumns, from_epoch_micros, to_epoch_micros
 from server.data_processor import DataProcessor
-from server.models import FinancialDataPoint
+from server.decision_scheduler import DecisionRequest, DecisionScheduler
+from server.indicators import IndicatorEngine
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.serialization import dumps
 from server.stream_manager import StreamManager
+from server.tracing import Trace, maybe_span
+from server.symbol_state import SymbolState, TIMEFRAMES
 from server.logger import get_logger
-from typing import List, Tuple, Dict, Callable, Any
+from server.metrics import FAST_BUCKETS, instrument, metrics
+from typing import List, Dict, Callable, Any, Optional, Sequence
 
 from alpaca.data import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest
 from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
 from alpaca.data.enums import DataFeed
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 
 logger = get_logger(__name__)
 
+LOOKBACK = timedelta(days=10)
+DECISION_CONTEXT = 15
+
+bar_parse = metrics.histogram("bar_parse_seconds", "Turning a bar message into a data point", FAST_BUCKETS)
+lock_wait = metrics.histogram("symbol_lock_wait_seconds", "Time a bar waited for its symbol's state lock", FAST_BUCKETS)
+bar_update = metrics.histogram("bar_update_seconds", "Resampling and indicator update for one bar", FAST_BUCKETS)
+
 
-def serialize_financial_data_point(obj: FinancialDataPoint) -> dict:
-    d = asdict(obj)
-    for k, v in d.items():
-        if isinstance(v, datetime):
-            d[k] = v.isoformat()
-    return d
+def to_bar_message(symbol: str, point: FinancialDataPoint) -> Dict[str, Any]:
+    return {"T": "b", "S": symbol, "o": point.open, "h": point.high, "l": point.low, "c": point.close, "v": point.volume, "n": point.tradeCount, "t": point.timestamp.isoformat()}
 
 
 class StockDataClient:
-    def __init__(self, api_key: str, secret_key: str, send_func: Callable, grok_client: GrokAPIClient, interval: int) -> None:
+    def __init__(self, api_key: str, secret_key: str, send_func: Callable, grok_client: GrokAPIClient, interval: int, history_depth: int = 1000, symbols: Optional[List[str]] = None, executor: Optional[AsyncExecutor] = None, stream_manager: Optional[StreamManager] = None, bar_cache: Optional[BarCache] = None, decision_workers: int = 2, decision_deadline: Optional[float] = None, indicators: Sequence[str] = ()) -> None:
         if not isinstance(interval, int) or interval <= 0:
             raise ValueError("interval must be a positive integer")
+        symbols = symbols or ["TSLA"]
         self.api_key = api_key
         self.secret_key = secret_key
         self.send_func: Callable = send_func
-        self.stock_client = StockHistoricalDataClient(api_key, secret_key)
+        self.stock_client = instrument(StockHistoricalDataClient(api_key, secret_key), "market_data")
+        self.executor: AsyncExecutor = executor or AsyncExecutor()
+        self.bar_cache: Optional[BarCache] = bar_cache
         self.grok_client: GrokAPIClient = grok_client
-        self.data_1min: List[FinancialDataPoint] = []
-        self.data_15min: List[FinancialDataPoint] = []
-        self.data_1hour: List[FinancialDataPoint] = []
-        self.data_1day: List[FinancialDataPoint] = []
         self.interval: int = interval
-        self.data_lock = asyncio.Lock()
-        self.processor = DataProcessor()
-        self.stream_manager = StreamManager(send_func)
+        self.processor = DataProcessor(indicators)
+        self.symbols: List[str] = [symbol.upper() for symbol in symbols]
+        self.states: Dict[str, SymbolState] = {symbol: SymbolState(symbol, self.processor, history_depth, interval) for symbol in self.symbols}
+        self.stream_manager = stream_manager or StreamManager(send_func)
+        # A decision is stale once the next one is due, unless a tighter deadline is configured.
+        self.decision_deadline: float = decision_deadline or interval * 60
+        self.scheduler = DecisionScheduler(self.run_decision, decision_workers)
+        # Set once every symbol is backfilled; until then the API reports "warming" instead of empty series.
+        self.ready = asyncio.Event()
         logger.info("StockDataClient initialized")
 
-    def calculate_kpi(self, data_point: FinancialDataPoint, data) -> FinancialDataPoint:
-        last_nine_intervals = data[-9:]
-        data_point.fivePeriodMovingAverage = self.processor.calculate_moving_average(last_nine_intervals, 5)
-        data_point.tenPeriodMovingAverage = self.processor.calculate_moving_average(last_nine_intervals, 10)
-        data_point.sixPeriodRsi = self.processor.calculate_relative_strength_index(last_nine_intervals, 6)
-        return data_point
-
-    async def quote_data_handler(self, data: dict) -> None:
-        data_point = FinancialDataPoint(
-            close=data["c"],
-            high=data["h"],
-            low=data["l"],
-            open=data["o"],
-            timestamp=datetime.fromisoformat(data["t"]),
-            tradeCount=int(data.get("n", 0)),
-            volume=data["v"],
-        )
-
-        async with self.data_lock:
-            if len(self.data_1min) > 60:
-                self.data_1min = self.data_1min[-60:]
-            if len(self.data_15min) > 60:
-                self.data_15min = self.data_15min[-60:]
-            if len(self.data_1hour) > 60:
-                self.data_1hour = self.data_1hour[-60:]
-            if len(self.data_1day) > 60:
-                self.data_1day = self.data_1day[-60:]
-
-            if not self.data_1min or (data_point.timestamp - self.data_1min[-1].timestamp).total_seconds() / 60 >= 1:
-                self.data_1min.append(self.calculate_kpi(data_point, self.data_1min))
+    @property
+    def status(self) -> str:
+        return "ready" if self.ready.is_set() else "warming"
 
-            if not self.data_15min or (data_point.timestamp - self.data_15min[-1].timestamp).total_seconds() / 60 >= 15:
-                self.data_15min.append(self.calculate_kpi(data_point, self.data_15min))
+    def calculate_kpi(self, data_point: FinancialDataPoint, engine: IndicatorEngine) -> FinancialDataPoint:
+        # Each series gets its own copy so the indicators of one timeframe never overwrite another's.
+        return self.processor.apply_kpi(replace(data_point), engine)
 
-            if not self.data_1hour or (data_point.timestamp - self.data_1hour[-1].timestamp).total_seconds() / 60 >= 60:
-                self.data_1hour.append(self.calculate_kpi(data_point, self.data_1hour))
-
-            if not self.data_1day or (data_point.timestamp - self.data_1day[-1].timestamp).total_seconds() / 60 >= 60 * 24:
-                self.data_1day.append(self.calculate_kpi(data_point, self.data_1day))
+    async def quote_data_handler(self, data: dict) -> None:
+        received = time.monotonic()
+        state = self.states.get(data.get("S", self.symbols[0]))
+        if state is None:
+            logger.warning(f"Received bar for unsubscribed symbol {data.get('S')}")
+            return
+        with bar_parse.time():
+            data_point = FinancialDataPoint(
+                close=data["c"],
+                high=data["h"],
+                low=data["l"],
+                open=data["o"],
+                timestamp=datetime.fromisoformat(data["t"]),
+                tradeCount=int(data.get("n", 0)),
+                volume=data["v"],
+            )
 
-        logger.info(f"Received data from websocket (timestamp: {data_point.timestamp})")
-        if data_point.timestamp.minute % self.interval == 0:
+        decision_due = data_point.timestamp.minute % self.interval == 0
+        waiting = time.perf_counter()
+        async with state.lock:
+            lock_wait.observe(time.perf_counter() - waiting)
+            with bar_update.time():
+                update = state.add(data_point)
+            # Taken under the lock, so the context matches this bar even if the decision waits for a worker.
+            context = state.decision_context(DECISION_CONTEXT) if decision_due else None
+
+        logger.info(f"Received data from websocket (symbol: {state.symbol}, timestamp: {data_point.timestamp})")
+        if decision_due:
             logger.info("This timestamp will be added to the data")
-            short_list = self.fetch_data("TSLA", datetime.now(), self.interval)[-15:]
-            short_list.append(self.calculate_kpi(data_point, short_list))
-
-            grok_thread = threading.Thread(target=self.run_grok_in_thread, args=(short_list, self.interval))
-            grok_thread.daemon = True
-            grok_thread.start()
+            trace = Trace(state.symbol, data_point.timestamp, received)
+            trace.add_span("bar", received, time.monotonic())
+            await self.scheduler.submit(DecisionRequest(state.symbol, data_point, time.monotonic() + self.decision_deadline, context, trace))
 
-        await self.send_func({"one": self.data_1min, "fifteen": self.data_15min, "hour": self.data_1hour, "day": self.data_1day})
+        if update is not None:
+            await self.send_func(update)
 
-    def fetch_data(self, symbol: str, now: datetime, interval: int) -> List[FinancialDataPoint]:
+    async def run_decision(self, request: DecisionRequest) -> None:
+        status = "error"
+        try:
+            status = await self.decide(request)
+        finally:
+            if request.trace is not None:
+                request.trace.finish(status)
+
+    async def decide(self, request: DecisionRequest) -> str:
+        short_list = request.context
+        if short_list is None:
+            logger.info(f"Not enough live history for {request.symbol}, fetching the decision context")
+            try:
+                with maybe_span(request.trace, "context_fetch"):
+                    short_list = await self.fetch_decision_context(request)
+            except Exception as e:
+                logger.error(f"Could not fetch decision data for {request.symbol}: {e}")
+                return "error"
+        if not short_list:
+            return "no_context"
+        if request.expired():
+            logger.warning(f"Decision context for {request.symbol} arrived after the deadline")
+            return "expired"
+
+        await asyncio.to_thread(self.run_grok_in_thread, short_list, self.interval, request.symbol, request.deadline, request.trace)
+        return "done"
+
+    async def fetch_decision_context(self, request: DecisionRequest) -> Optional[List[FinancialDataPoint]]:
+        columns = await self.load_bars_async(request.symbol, datetime.now(timezone.utc), self.interval)
+        short_list = columns.tail(DECISION_CONTEXT).to_points()
+        short_list.append(self.calculate_kpi(request.data_point, self.processor.create_engine(columns)))
+        return short_list
+
+    def fetch_raw_bars(self, symbol: str, now: datetime, interval: int, start: Optional[datetime] = None) -> BarColumns:
         timeframe = None
         if interval < 60:
             timeframe = TimeFrame(interval, TimeFrameUnit("Min"))
@@ -106,58 +149,106 @@ class StockDataClient:
         else:
             timeframe = TimeFrame(1, TimeFrameUnit("Day"))
         request_params = StockBarsRequest(
-            feed=DataFeed("iex"), symbol_or_symbols=[symbol], timeframe=timeframe, start=now - timedelta(days=10), end=now
+            feed=DataFeed("iex"), symbol_or_symbols=[symbol], timeframe=timeframe, start=start or now - LOOKBACK, end=now
         )
         symbol_quotes = self.stock_client.get_stock_bars(request_params)
 
-        data = symbol_quotes.data.get(symbol, [])
-
-        processed_data: list[FinancialDataPoint] = [
-            FinancialDataPoint(
-                close=entry.close,
-                high=entry.high,
-                low=entry.low,
-                open=entry.open,
-                timestamp=entry.timestamp,
-                tradeCount=int(entry.trade_count or 0),
-                volume=entry.volume,
-            )
-            for entry in data
-        ]
-
-        for i in range(len(processed_data)):
-            processed_data[i].fivePeriodMovingAverage = self.processor.calculate_moving_average(processed_data[: i + 1], 5)
-            processed_data[i].tenPeriodMovingAverage = self.processor.calculate_moving_average(processed_data[: i + 1], 10)
-            processed_data[i].sixPeriodRsi = self.processor.calculate_relative_strength_index(processed_data[: i + 1], 6)
-
-        return processed_data
-
-    async def get_current_data(self) -> Dict[str, List[FinancialDataPoint]]:
-        async with self.data_lock:
-            return {
-                "one": self.data_1min[-60:],
-                "fifteen": self.data_15min[-60:],
-                "hour": self.data_1hour[-60:],
-                "day": self.data_1day[-60:],
-            }
+        return BarColumns.from_bars(symbol_quotes.data.get(symbol, []))
+
+    def fetch_bars(self, symbol: str, now: datetime, interval: int, start: Optional[datetime] = None) -> BarColumns:
+        return self.processor.compute_indicators(self.fetch_raw_bars(symbol, now, interval, start))
+
+    async def fetch_bars_async(self, symbol: str, now: datetime, interval: int, start: Optional[datetime] = None) -> BarColumns:
+        return await self.executor.run(self.fetch_bars, symbol, now, interval, start)
+
+    def load_bars(self, symbol: str, now: datetime, interval: int) -> BarColumns:
+        if self.bar_cache is None:
+            return self.fetch_bars(symbol, now, interval)
+        window_start = to_epoch_micros(now - LOOKBACK)
+        cached = self.bar_cache.load(symbol, interval, window_start)
+        if not len(cached):
+            fresh = self.fetch_bars(symbol, now, interval)
+            self.bar_cache.store(symbol, interval, fresh)
+            return fresh
+
+        # The newest cached bar may have been incomplete when it was stored, so it is fetched again.
+        last_cached = int(cached.timestamp[-1])
+        raw = self.fetch_raw_bars(symbol, now, interval, start=from_epoch_micros(last_cached))
+        kept = cached.slice(0, int(np.searchsorted(cached.timestamp, raw.timestamp[0]))) if len(raw) else cached
+        if self.processor.indicator_names:
+            # The cache only keeps the built-in indicators, so configured ones are computed over the whole window.
+            columns = self.processor.compute_indicators(BarColumns.concat([kept, raw]))
+            fresh = columns.slice(len(kept))
+        else:
+            # Indicators of the new bars only need the last few cached closes to warm up.
+            warmup = kept.tail(self.processor.create_engine().warmup)
+            fresh = self.processor.compute_indicators(BarColumns.concat([warmup, raw])).slice(len(warmup))
+            columns = BarColumns.concat([kept, fresh])
+        if len(fresh):
+            self.bar_cache.store(symbol, interval, fresh)
+        self.bar_cache.prune(symbol, interval, window_start)
+        logger.info(f"Loaded {len(kept)} cached and {len(fresh)} fetched bars for {symbol} ({interval} min)")
+        return columns
+
+    async def load_bars_async(self, symbol: str, now: datetime, interval: int) -> BarColumns:
+        return await self.executor.run(self.load_bars, symbol, now, interval)
+
+    async def fetch_missed_bars(self, since: Dict[str, datetime]) -> List[dict]:
+        # Symbols without a bar since startup are caught up from the oldest watermark.
+        now = datetime.now(timezone.utc)
+        starts = {symbol: since.get(symbol, min(since.values())) for symbol in self.symbols}
+        fetched = await asyncio.gather(*(self.fetch_bars_async(symbol, now, 1, starts[symbol]) for symbol in self.symbols))
+        messages = []
+        for symbol, columns in zip(self.symbols, fetched):
+            watermark = to_epoch_micros(starts[symbol])
+            for point in columns.to_points():
+                if to_epoch_micros(point.timestamp) <= watermark:
+                    continue
+                messages.append(to_bar_message(symbol, point))
+        return messages
+
+    def get_version(self, symbol: str) -> Optional[int]:
+        state = self.states.get(symbol)
+        return state.version if state is not None else None
+
+    async def get_current_data(self, symbol: str) -> Optional[SeriesUpdate]:
+        state = self.states.get(symbol)
+        if state is None:
+            return None
+        async with state.lock:
+            return state.snapshot()
 
     def get_settings(self) -> Dict[str, Any]:
-        return {**self.grok_client.get_settings(), "interval": self.interval, "paper": True}
+        return {**self.grok_client.get_settings(), "interval": self.interval, "paper": True, "symbols": self.symbols}
 
-    def run_grok_in_thread(self, short_list: List[FinancialDataPoint], interval: int) -> None:
+    def run_grok_in_thread(self, short_list: List[FinancialDataPoint], interval: int, symbol: str, deadline: Optional[float] = None, trace: Optional[Trace] = None) -> None:
         try:
-            stock_data_str = json.dumps([serialize_financial_data_point(item) for item in short_list])
-            signal = self.grok_client.get_signal(stock_data_str, interval)
+            stock_data_str = dumps(short_list).decode()
+            if trace is not None:
+                trace.attributes["context"] = short_list
+            signal = self.grok_client.get_signal(stock_data_str, interval, symbol, deadline, trace)
+            if trace is not None:
+                trace.attributes["signal"] = signal
             logger.info(f"Grok signal processed in thread: {signal}")
         except Exception as e:
             logger.error(f"Error in grok thread: {e}")
 
+    async def backfill(self, state: SymbolState) -> None:
+        timeframes = dict(TIMEFRAMES)
+        if state.decision is not None and not state.shares_decision_series():
+            timeframes["decision"] = state.decision_minutes
+        now = datetime.now(timezone.utc)
+        async with state.lock:
+            loaded = await asyncio.gather(*(self.load_bars_async(state.symbol, now, minutes) for minutes in timeframes.values()))
+            state.load(dict(zip(timeframes, loaded)))
+
     async def start_streaming(self) -> None:
-        async with self.data_lock:
-            self.data_1min = self.fetch_data("TSLA", datetime.now(), 1)
-            self.data_15min = self.fetch_data("TSLA", datetime.now(), 15)
-            self.data_1hour = self.fetch_data("TSLA", datetime.now(), 60)
-            self.data_1day = self.fetch_data("TSLA", datetime.now(), 60 * 24)
-
-        await self.stream_manager.run_stream(self.api_key, self.secret_key, ["TSLA"])
-        asyncio.create_task(self.stream_manager.start_streaming(self.quote_data_handler))
+        # Every symbol and timeframe loads at once; the executor's concurrency limit keeps Alpaca from being flooded.
+        started = time.monotonic()
+        await asyncio.gather(*(self.backfill(state) for state in self.states.values()))
+        self.ready.set()
+        logger.info(f"Backfilled {len(self.states)} symbols in {time.monotonic() - started:.2f}s")
+
+        self.scheduler.start()
+        await self.stream_manager.run_stream(self.api_key, self.secret_key, self.symbols)
+        asyncio.create_task(self.stream_manager.start_streaming(self.quote_data_handler, self.fetch_missed_bars))
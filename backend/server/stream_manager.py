@@ -1,44 +1,179 @@
 import json
 import asyncio
+import time
+import zlib
 import websockets
-from typing import Callable, Optional, Awaitable
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Awaitable, List
 from server.logger import get_logger
+from server.metrics import FAST_BUCKETS, metrics
 
 logger = get_logger(__name__)
 
+STREAM_URL = "wss://stream.data.alpaca.markets/v2/iex"
+INITIAL_BACKOFF = 1.0
+
+GapHandler = Callable[[Dict[str, datetime]], Awaitable[List[dict]]]
+
+messages_received = metrics.counter("stream_messages_received_total", "Bar messages received from the Alpaca stream")
+messages_dropped = metrics.counter("stream_messages_dropped_total", "Bar messages dropped because a handler queue was full")
+handler_errors = metrics.counter("stream_handler_errors_total", "Bar messages whose handler raised")
+reconnects = metrics.counter("stream_reconnects_total", "Reconnects to the Alpaca stream")
+backfilled_bars = metrics.counter("stream_backfilled_bars_total", "Bars fetched over REST to fill a disconnect gap")
+queue_depth = metrics.gauge("stream_queue_depth", "Bar messages waiting for a handler")
+frame_decode = metrics.histogram("stream_frame_decode_seconds", "Decoding one Alpaca stream frame", FAST_BUCKETS)
+bar_lag = metrics.histogram("stream_bar_lag_seconds", "Time between a minute bar closing and its frame arriving")
+queue_wait = metrics.histogram("stream_queue_wait_seconds", "Time a bar waited in a handler queue", FAST_BUCKETS)
+handler_latency = metrics.histogram("stream_handler_seconds", "Time the bar handler took per bar", FAST_BUCKETS)
+
 
 class StreamManager:
-    def __init__(self, send_func: Callable) -> None:
+    def __init__(self, send_func: Callable, queue_size: int = 1000, workers: int = 4, max_backoff: float = 60.0) -> None:
+        if queue_size <= 0:
+            raise ValueError("queue_size must be a positive integer")
+        if workers <= 0:
+            raise ValueError("workers must be a positive integer")
         self.send_func: Callable = send_func
         self.ws: Optional[websockets.WebSocketClientProtocol] = None
+        self.api_key: str = ""
+        self.secret_key: str = ""
+        self.symbols: List[str] = []
+        self.max_backoff: float = max_backoff
+        # Each symbol always lands on the same queue, so bars of one symbol are handled in order while
+        # different symbols are handled concurrently.
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        # The newest bar seen per symbol; after a reconnect each symbol is backfilled from its own.
+        self.last_bar_times: Dict[str, datetime] = {}
+        self.backoff: float = INITIAL_BACKOFF
+        # Whether the current connection has delivered anything; only then does the backoff start over.
+        self.received: bool = False
+        self.ping_task: Optional[asyncio.Task] = None
 
     async def ping(self) -> None:
         while True:
             if self.ws and self.ws.state == websockets.State.OPEN:
-                await self.ws.ping()
+                try:
+                    await self.ws.ping()
+                except Exception as e:
+                    logger.warning(f"Ping failed: {e}")
             await asyncio.sleep(30)
 
     async def run_stream(self, api_key: str, secret_key: str, symbols: list[str]) -> None:
-        data = {"action": "auth", "key": api_key, "secret": secret_key}
-        self.ws = await websockets.connect("wss://stream.data.alpaca.markets/v2/iex")
-        asyncio.create_task(self.ping())
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.symbols = symbols
+        await self.connect()
+        if self.ping_task is None:
+            self.ping_task = asyncio.create_task(self.ping())
+
+    async def connect(self) -> None:
+        data = {"action": "auth", "key": self.api_key, "secret": self.secret_key}
+        self.ws = await websockets.connect(STREAM_URL)
         await self.ws.send(json.dumps(data))
         result = await self.ws.recv()
         logger.info(result)
         result = await self.ws.recv()
         logger.info(result)
 
-        await self.ws.send(json.dumps({"action": "subscribe", "bars": symbols}))
+        await self.ws.send(json.dumps({"action": "subscribe", "bars": self.symbols}))
         result = await self.ws.recv()
         logger.info(result)
 
-    async def receive_data(self) -> dict:
+    async def receive_data(self) -> List[dict]:
         result = await self.ws.recv()
-        parsed_result = json.loads(result)
-        data = parsed_result[0]
-        return data
+        with frame_decode.time():
+            parsed_result = json.loads(result)
+            # A single frame can carry bars for several symbols as well as control messages.
+            bars = [message for message in parsed_result if message.get("T") == "b"]
+        now = datetime.now(timezone.utc)
+        for message in bars:
+            bar_lag.observe((now - datetime.fromisoformat(message["t"]) - timedelta(minutes=1)).total_seconds())
+        return bars
+
+    def enqueue(self, message: dict) -> None:
+        queue = self.queues[zlib.crc32(message.get("S", "").encode()) % len(self.queues)]
+        if queue.full():
+            queue.get_nowait()
+            queue.task_done()
+            messages_dropped.inc()
+            logger.warning(f"Handler queue full, dropped the oldest bar for {message.get('S')}")
+        queue.put_nowait((time.perf_counter(), message))
+        symbol, timestamp = message.get("S", ""), datetime.fromisoformat(message["t"])
+        if symbol not in self.last_bar_times or timestamp > self.last_bar_times[symbol]:
+            self.last_bar_times[symbol] = timestamp
+        self.update_queue_depth()
 
-    async def start_streaming(self, data_handler: Callable[[dict], Awaitable[None]]) -> None:
+    def update_queue_depth(self) -> None:
+        queue_depth.set(sum(queue.qsize() for queue in self.queues))
+
+    async def worker(self, queue: asyncio.Queue, data_handler: Callable[[dict], Awaitable[None]]) -> None:
+        while True:
+            enqueued_at, message = await queue.get()
+            queue_wait.observe(time.perf_counter() - enqueued_at)
+            self.update_queue_depth()
+            try:
+                with handler_latency.time():
+                    await data_handler(message)
+            except Exception as e:
+                handler_errors.inc()
+                logger.error(f"Error handling bar for {message.get('S')}: {e}")
+            finally:
+                queue.task_done()
+
+    async def reconnect(self, gap_handler: Optional[GapHandler]) -> None:
+        if self.ws is not None:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+        if self.received:
+            self.backoff = INITIAL_BACKOFF
+        else:
+            # The last connection dropped before delivering anything; reconnecting at once would spin.
+            logger.warning(f"Alpaca stream dropped right after connecting, reconnecting in {self.backoff:.0f}s")
+            await asyncio.sleep(self.backoff)
+            self.backoff = min(self.backoff * 2, self.max_backoff)
         while True:
-            data = await self.receive_data()
-            await data_handler(data)
\ No newline at end of file
+            try:
+                await self.connect()
+                break
+            except Exception as e:
+                logger.error(f"Reconnect failed, retrying in {self.backoff:.0f}s: {e}")
+                await asyncio.sleep(self.backoff)
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+        self.received = False
+        reconnects.inc()
+        logger.info("Reconnected to the Alpaca stream")
+        if gap_handler is None or not self.last_bar_times:
+            return
+        since = dict(self.last_bar_times)
+        # Missed bars go through the same queues ahead of any new live bar, so ordering per symbol is kept.
+        try:
+            missed = await gap_handler(since)
+        except Exception as e:
+            logger.error(f"Could not backfill bars missed since {min(since.values())}: {e}")
+            return
+        for message in missed:
+            self.enqueue(message)
+        backfilled_bars.inc(len(missed))
+        logger.info(f"Backfilled {len(missed)} bars missed since {min(since.values())}")
+
+    async def start_streaming(self, data_handler: Callable[[dict], Awaitable[None]], gap_handler: Optional[GapHandler] = None) -> None:
+        workers = [asyncio.create_task(self.worker(queue, data_handler)) for queue in self.queues]
+        try:
+            while True:
+                try:
+                    messages = await self.receive_data()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Alpaca stream interrupted: {e}")
+                    await self.reconnect(gap_handler)
+                    continue
+                self.received = True
+                messages_received.inc(len(messages))
+                for message in messages:
+                    self.enqueue(message)
+        finally:
+            for worker in workers:
+                worker.cancel()
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from server.bars import BarColumns, from_epoch_micros
+from server.data_processor import DataProcessor
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.resampler import MINUTES_PER_DAY, Resampler
+
+TIMEFRAMES: Dict[str, int] = {"one": 1, "fifteen": 15, "hour": 60, "day": 60 * 24}
+DISPLAY_WINDOW = 60
+
+
+class SymbolState:
+    def __init__(self, symbol: str, processor: DataProcessor, history_depth: int, decision_interval: Optional[int] = None) -> None:
+        self.symbol: str = symbol
+        self.lock = asyncio.Lock()
+        self.version: int = 0
+        self.resamplers: Dict[str, Resampler] = {key: Resampler(minutes, processor, history_depth) for key, minutes in TIMEFRAMES.items()}
+        # The decision interval gets its own series unless a displayed timeframe already has that size; it is never broadcast.
+        self.decision_minutes: Optional[int] = None
+        self.decision: Optional[Resampler] = None
+        if decision_interval is not None:
+            self.decision_minutes = decision_interval if decision_interval <= 60 else MINUTES_PER_DAY
+            shared = [key for key, minutes in TIMEFRAMES.items() if minutes == self.decision_minutes]
+            self.decision = self.resamplers[shared[0]] if shared else Resampler(self.decision_minutes, processor, history_depth)
+
+    def load(self, backfill: Dict[str, BarColumns]) -> None:
+        # Live minutes already contained in the backfill must not be rolled up a second time.
+        minutes = backfill.get("one")
+        watermark = from_epoch_micros(int(minutes.timestamp[-1])) if minutes is not None and len(minutes) else None
+        for key, columns in backfill.items():
+            if key in self.resamplers:
+                self.resamplers[key].load(columns, watermark)
+        if self.decision is not None and not self.shares_decision_series() and "decision" in backfill:
+            self.decision.load(backfill["decision"], watermark)
+        self.version += 1
+
+    def shares_decision_series(self) -> bool:
+        return any(resampler is self.decision for resampler in self.resamplers.values())
+
+    def add(self, data_point: FinancialDataPoint) -> Optional[SeriesUpdate]:
+        changed = {}
+        for key, resampler in self.resamplers.items():
+            bar = resampler.add(data_point)
+            if bar is not None:
+                changed[key] = [bar]
+        if self.decision is not None and not self.shares_decision_series():
+            self.decision.add(data_point)
+        if not changed:
+            return None
+        self.version += 1
+        return SeriesUpdate(self.symbol, self.version, changed)
+
+    def decision_context(self, count: int) -> Optional[List[FinancialDataPoint]]:
+        # The sealed bars plus the open one, whose indicators are previewed on top of the sealed closes.
+        if self.decision is None or len(self.decision.series) <= count:
+            return None
+        return self.decision.series.to_points(count + 1)
+
+    def snapshot(self) -> SeriesUpdate:
+        return SeriesUpdate(self.symbol, self.version, {key: resampler.series.to_points(DISPLAY_WINDOW) for key, resampler in self.resamplers.items()})
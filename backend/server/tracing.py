@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    start_ms: float
+    duration_ms: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    # Follows one decision from the bar that triggered it to the orders it placed; times are relative to the bar.
+    def __init__(self, symbol: str, bar_timestamp: datetime, started: Optional[float] = None) -> None:
+        self.trace_id: str = uuid.uuid4().hex[:16]
+        self.symbol: str = symbol
+        self.bar_timestamp: datetime = bar_timestamp
+        self.received_at: datetime = datetime.now(timezone.utc)
+        self.started: float = time.monotonic() if started is None else started
+        self.spans: List[Span] = []
+        self.attributes: Dict[str, Any] = {}
+        self.status: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def elapsed_ms(self, since: Optional[float] = None) -> float:
+        return ((since if since is not None else time.monotonic()) - self.started) * 1000
+
+    def add_span(self, name: str, started: float, ended: float, **attributes: Any) -> Span:
+        span = Span(name, self.elapsed_ms(started), (ended - started) * 1000, attributes)
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        span = Span(name, self.elapsed_ms(), attributes=attributes)
+        started = time.monotonic()
+        try:
+            yield span
+        except Exception as e:
+            span.attributes["error"] = str(e)
+            raise
+        finally:
+            span.duration_ms = (time.monotonic() - started) * 1000
+            with self.lock:
+                self.spans.append(span)
+
+    def finish(self, status: str) -> None:
+        if self.status is not None:
+            return
+        self.status = status
+        self.duration_ms = self.elapsed_ms()
+        traces.add(self)
+
+    def tick_to_trade_ms(self) -> Optional[float]:
+        orders = [span.start_ms + span.duration_ms for span in self.spans if span.name == "submit_order"]
+        return min(orders) if orders else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "symbol": self.symbol,
+            "barTimestamp": self.bar_timestamp.isoformat(),
+            "receivedAt": self.received_at.isoformat(),
+            "status": self.status,
+            "durationMs": self.duration_ms,
+            "tickToTradeMs": self.tick_to_trade_ms(),
+            "spans": len(self.spans),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ms)
+        return {
+            **self.summary(),
+            "attributes": self.attributes,
+            "spans": [{"name": span.name, "startMs": span.start_ms, "durationMs": span.duration_ms, **span.attributes} for span in spans],
+        }
+
+
+class TraceStore:
+    def __init__(self, capacity: int = 256) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive integer")
+        self.traces: Deque[Trace] = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self.lock:
+            self.traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self.lock:
+            return next((trace for trace in self.traces if trace.trace_id == trace_id), None)
+
+    def recent(self, limit: int = 50, symbol: Optional[str] = None) -> List[Trace]:
+        with self.lock:
+            found = [trace for trace in reversed(self.traces) if symbol is None or trace.symbol == symbol]
+        return found[:limit]
+
+
+traces = TraceStore()
+
+
+@contextmanager
+def maybe_span(trace: Optional[Trace], name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attributes) as span:
+        yield span
@@ -1,79 +1,82 @@
-from datetime import datetime
+import asyncio
+from datetime import date, datetime, timezone
 from typing import Optional, Dict, List, Any, Tuple
 from alpaca.trading.client import TradingClient
-from alpaca.trading.models import PortfolioHistory
+from alpaca.trading.models import OptionContractsResponse, PortfolioHistory
 from alpaca.trading.requests import GetOptionContractsRequest, MarketOrderRequest, GetPortfolioHistoryRequest
 from alpaca.trading.enums import ContractType, AssetStatus, OrderSide, TimeInForce
+from server.async_executor import AsyncExecutor
 from server.logger import get_logger
+from server.metrics import instrument
+from server.equity_history import EquityHistory
 from server.models import Cache
+from server.option_chain import OptionChainIndex
+from server.tracing import Trace, maybe_span
 from server.utils import ValidationUtils
 
 logger = get_logger(__name__)
 
+# Portfolio history per dashboard timeframe: Alpaca timeframe, initial period and how long a fetched series stays fresh.
+PORTFOLIO_TIMEFRAMES: Dict[str, Tuple[str, str, int]] = {
+    "one": ("1Min", "1D", 60),
+    "fifteen": ("15Min", "5D", 15 * 60),
+    "hour": ("1H", "5D", 60 * 60),
+    "day": ("1D", "30D", 24 * 60 * 60),
+}
+
 
 class TradingDataClient:
-    def __init__(self, api_key: str, secret_key: str) -> None:
-        self.trading_client: TradingClient = TradingClient(api_key=api_key, secret_key=secret_key, paper=True)
-        self.account_cache = Cache(60)
-        self.positions_cache = Cache(60)
-        self.account_value_1min_cache = Cache(60)
-        self.account_value_15min_cache = Cache(15 * 60)
-        self.account_value_1hour_cache = Cache(60 * 60)
-        self.account_value_1day_cache = Cache(24 * 60 * 60)
+    def __init__(self, api_key: str, secret_key: str, executor: Optional[AsyncExecutor] = None, option_chain_max_age: float = 300.0, option_chain_days: int = 45) -> None:
+        self.trading_client: TradingClient = instrument(TradingClient(api_key=api_key, secret_key=secret_key, paper=True), "trading")
+        self.executor: AsyncExecutor = executor or AsyncExecutor()
+        self.option_chains = OptionChainIndex(self.fetch_option_chain, self.executor, option_chain_max_age, option_chain_days)
+        self.option_refresh_task: Optional[asyncio.Task] = None
+        self.account_cache = Cache(60, submit=self.executor.submit)
+        self.positions_cache = Cache(60, submit=self.executor.submit)
+        self.equity_histories: Dict[str, EquityHistory] = {key: EquityHistory(timeframe, period) for key, (timeframe, period, _) in PORTFOLIO_TIMEFRAMES.items()}
+        self.account_value_caches: Dict[str, Cache] = {key: Cache(ttl, submit=self.executor.submit) for key, (_, _, ttl) in PORTFOLIO_TIMEFRAMES.items()}
         logger.info("TradingClient initialized")
 
     def get_account_info(self) -> Dict[str, float]:
-        cached = self.account_cache.get()
-        if cached:
-            return cached
+        return self.account_cache.get_or_load(self.fetch_account_info)
+
+    def fetch_account_info(self) -> Dict[str, float]:
         account = self.trading_client.get_account()
         portfolio_value = float(account.portfolio_value)
         cash = float(account.cash)
         buying_power = float(account.buying_power)
         long_market_value = float(account.long_market_value)
         short_market_value = float(account.short_market_value)
-        account_info = {"portfolio_value": portfolio_value, "cash": cash, "buying_power": buying_power, "long_market_value": long_market_value, "short_market_value": short_market_value}
-        self.account_cache.set(account_info)
-        return account_info
-
-    def get_account_value(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
-        one = self.account_value_1min_cache.get()
-        if not one:
-            one = self.get_account_value_for_interval("1Min", "1D")
-            self.account_value_1min_cache.set(one)
-
-        fifteen = self.account_value_15min_cache.get()
-        if not fifteen:
-            fifteen = self.get_account_value_for_interval("15Min", "5D")
-            self.account_value_15min_cache.set(fifteen)
-
-        hour = self.account_value_1hour_cache.get()
-        if not hour:
-            hour = self.get_account_value_for_interval("1H", "5D")
-            self.account_value_1hour_cache.set(hour)
-
-        day = self.account_value_1day_cache.get()
-        if not day:
-            day = self.get_account_value_for_interval("1D", "30D")
-            self.account_value_1day_cache.set(day)
-
-        return one[-60:], fifteen[-60:], hour[-60:], day[-60:]
-
-    def get_account_value_for_interval(self, timeframe: str, period: str) -> List[Dict[str, Any]]:
-        request = GetPortfolioHistoryRequest(period=period, timeframe=timeframe)
-        portfolio_history = self.trading_client.get_portfolio_history(request)
-        values: List[Dict[str, Any]] = []
-        if isinstance(portfolio_history, PortfolioHistory):
-            for i in range(len(portfolio_history.timestamp)):
-                timestamp = datetime.fromtimestamp(portfolio_history.timestamp[i]).isoformat()
-                equity = portfolio_history.equity[i]
-                values.append({"timestamp": timestamp, "equity": equity})
-        return values
+        return {"portfolio_value": portfolio_value, "cash": cash, "buying_power": buying_power, "long_market_value": long_market_value, "short_market_value": short_market_value}
+
+    async def get_account_info_async(self) -> Dict[str, float]:
+        return await self.executor.run(self.get_account_info)
+
+    async def get_account_value_async(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        # The four histories are independent calls, so the route waits for the slowest one rather than their sum.
+        one, fifteen, hour, day = await asyncio.gather(*(self.executor.run(self.get_account_value_for, key) for key in PORTFOLIO_TIMEFRAMES))
+        return one, fifteen, hour, day
+
+    def get_account_value_for(self, key: str) -> List[Dict[str, Any]]:
+        return self.account_value_caches[key].get_or_load(lambda: self.update_equity_history(self.equity_histories[key]))
+
+    def update_equity_history(self, history: EquityHistory) -> List[Dict[str, Any]]:
+        # After the first download only the points from the newest one held onwards are requested.
+        with history.lock:
+            last = history.last_timestamp()
+            if last is None:
+                request = GetPortfolioHistoryRequest(period=history.period, timeframe=history.timeframe)
+            else:
+                request = GetPortfolioHistoryRequest(start=datetime.fromtimestamp(last, timezone.utc), timeframe=history.timeframe)
+            portfolio_history = self.trading_client.get_portfolio_history(request)
+            if isinstance(portfolio_history, PortfolioHistory):
+                history.merge(portfolio_history.timestamp, portfolio_history.equity)
+            return history.to_points()
 
     def get_open_positions(self) -> List[Dict[str, Any]]:
-        cached = self.positions_cache.get()
-        if cached:
-            return cached
+        return self.positions_cache.get_or_load(self.fetch_open_positions)
+
+    def fetch_open_positions(self) -> List[Dict[str, Any]]:
         open_positions: List[Dict[str, Any]] = []
         positions = self.trading_client.get_all_positions()
         for position in positions:
@@ -83,10 +86,14 @@ class TradingDataClient:
             cost_basis = float(position.cost_basis)
             unrealized_pl = float(position.unrealized_pl)
             open_positions.append({"symbol": symbol, "quantity": qty, "market_value": market_value, "original_cost": cost_basis, "unrealized_profit_loss": unrealized_pl})
-        self.positions_cache.set(open_positions)
         return open_positions
 
-    def get_options(self, strike_price_gte: str, strike_price_lte: str, option_type: str, expiration_date_gte: str) -> Any:
+    async def get_open_positions_async(self) -> List[Dict[str, Any]]:
+        return await self.executor.run(self.get_open_positions)
+
+    def get_options(self, underlying_symbol: str, strike_price_gte: str, strike_price_lte: str, option_type: str, expiration_date_gte: str) -> Any:
+        if error := ValidationUtils.validate_symbol(underlying_symbol):
+            return error
         try:
             strike_price_gte = float(strike_price_gte)
             strike_price_lte = float(strike_price_lte)
@@ -95,11 +102,15 @@ class TradingDataClient:
             option_type = option_type.upper()
             if option_type not in ["CALL", "PUT"]:
                 raise ValueError("option_type must be 'CALL' or 'PUT'")
-            datetime.fromisoformat(expiration_date_gte)  # validate date format
+            expiration_date = datetime.fromisoformat(expiration_date_gte).date()
         except ValueError as e:
             return str(e)
+        underlying_symbol = underlying_symbol.strip().upper()
+        indexed = self.option_chains.query(underlying_symbol, option_type, strike_price_gte, strike_price_lte, expiration_date)
+        if indexed is not None:
+            return OptionContractsResponse(option_contracts=indexed, next_page_token=None)
         request = GetOptionContractsRequest(
-            underlying_symbols=["TSLA"],
+            underlying_symbols=[underlying_symbol],
             expiration_date_gte=expiration_date_gte,
             strike_price_gte=str(strike_price_gte),
             strike_price_lte=str(strike_price_lte),
@@ -110,22 +121,55 @@ class TradingDataClient:
         contracts = self.trading_client.get_option_contracts(request)
         return contracts
 
-    def buy_option(self, symbol: str, quantity: float, stop_price: float, profit_price: float) -> str:
+    def fetch_option_chain(self, underlying_symbol: str, expiration_date_lte: date) -> List[Any]:
+        contracts: List[Any] = []
+        page_token: Optional[str] = None
+        while True:
+            request = GetOptionContractsRequest(
+                underlying_symbols=[underlying_symbol],
+                expiration_date_gte=date.today(),
+                expiration_date_lte=expiration_date_lte,
+                status=AssetStatus.ACTIVE,
+                limit=10000,
+                page_token=page_token,
+            )
+            response = self.trading_client.get_option_contracts(request)
+            contracts.extend(response.option_contracts or [])
+            page_token = response.next_page_token
+            if not page_token:
+                return contracts
+
+    def start_option_refresh(self, underlying_symbols: List[str], interval: float) -> None:
+        if self.option_refresh_task is None:
+            self.option_refresh_task = asyncio.create_task(self.option_chains.run_refresh(underlying_symbols, interval))
+
+    def invalidate_account_state(self) -> None:
+        # Cash and positions change with every fill, so the next reader fetches them instead of seeing the pre-trade state.
+        self.account_cache.invalidate()
+        self.positions_cache.invalidate()
+        self.account_value_caches["one"].invalidate()
+
+    def buy_option(self, symbol: str, quantity: float, stop_price: float, profit_price: float, trace: Optional[Trace] = None) -> str:
         if error := ValidationUtils.validate_option_params(symbol, quantity, stop_price, profit_price):
             return error
         try:
             market_order_data = MarketOrderRequest(symbol=symbol, qty=quantity, side=OrderSide.BUY, time_in_force=TimeInForce.DAY, stop_loss={"stop_price": stop_price}, take_profit={"limit_price": profit_price})
 
-            market_order = self.trading_client.submit_order(market_order_data)
+            with maybe_span(trace, "submit_order", side="buy", symbol=symbol, quantity=quantity) as span:
+                market_order = self.trading_client.submit_order(market_order_data)
+                if span is not None:
+                    span.attributes["orderId"] = str(market_order.id)
             logger.info(f"Bought option {market_order.id}")
+            self.invalidate_account_state()
         except Exception as e:
+            self.option_chains.invalidate(symbol)
             if "40310000" in str(e):
                 return "Order was rejected due to the option not being covered. Try a different option."
             else:
                 return str(e)
         return f"Success. Remaining cash: {self.get_account_info()['cash']}"
 
-    def sell_option(self, symbol: str, quantity: float) -> str:
+    def sell_option(self, symbol: str, quantity: float, trace: Optional[Trace] = None) -> str:
         if error := ValidationUtils.validate_symbol(symbol):
             return error
         if error := ValidationUtils.validate_quantity(quantity):
@@ -138,8 +182,13 @@ class TradingDataClient:
                 time_in_force=TimeInForce.DAY,
             )
 
-            market_order = self.trading_client.submit_order(market_order_data)
+            with maybe_span(trace, "submit_order", side="sell", symbol=symbol, quantity=quantity) as span:
+                market_order = self.trading_client.submit_order(market_order_data)
+                if span is not None:
+                    span.attributes["orderId"] = str(market_order.id)
             logger.info(f"Sold option {market_order.id}")
+            self.invalidate_account_state()
         except Exception as e:
+            self.option_chains.invalidate(symbol)
             return str(e)
         return f"Success. New cash: {self.get_account_info()['cash']}"
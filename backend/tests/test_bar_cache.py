@@ -0,0 +1,60 @@
+import pytest
+from server.bar_cache import BarCache
+from server.bars import BarColumns, from_epoch_micros, to_epoch_micros
+from server.data_processor import DataProcessor
+from server.stockClient import StockDataClient
+from datetime import datetime, timedelta
+
+NOW = datetime(2025, 1, 10, 15, 0)
+CLOSES = [100 + (i % 7) - (i % 3) for i in range(40)]
+
+
+def make_columns(start, end):
+    columns = BarColumns.empty(end - start)
+    columns.timestamp[:] = [to_epoch_micros(NOW - timedelta(minutes=40 - i)) for i in range(start, end)]
+    for name in ("close", "high", "low", "open"):
+        getattr(columns, name)[:] = CLOSES[start:end]
+    return DataProcessor().compute_indicators(columns)
+
+
+@pytest.fixture
+def client(mocker, tmp_path):
+    mocker.patch('server.stockClient.StockHistoricalDataClient')
+    return StockDataClient("key", "secret", mocker.MagicMock(), mocker.MagicMock(), 5, bar_cache=BarCache(str(tmp_path / "bars.sqlite3")))
+
+
+def test_round_trip(tmp_path):
+    cache = BarCache(str(tmp_path / "bars.sqlite3"))
+    columns = make_columns(0, 10)
+    cache.store("TSLA", 1, columns)
+
+    loaded = cache.load("TSLA", 1, int(columns.timestamp[5]))
+    assert loaded.to_points() == columns.slice(5).to_points()
+
+
+def test_warm_start_fetches_only_the_gap(client, mocker):
+    client.fetch_bars = mocker.MagicMock(return_value=make_columns(0, 30))
+    client.load_bars("TSLA", NOW, 1)
+
+    # The newest cached bar is fetched again together with the bars after it.
+    client.fetch_raw_bars = mocker.MagicMock(return_value=make_columns(29, 40))
+    compute = mocker.spy(client.processor, "compute_indicators")
+    bars = client.load_bars("TSLA", NOW, 1)
+
+    assert compute.call_count == 1
+    assert client.fetch_raw_bars.call_args.kwargs["start"] == from_epoch_micros(int(make_columns(29, 30).timestamp[0]))
+    assert bars.to_points() == make_columns(0, 40).to_points()
+
+
+def test_warm_start_with_configured_indicators(mocker, tmp_path):
+    mocker.patch('server.stockClient.StockHistoricalDataClient')
+    client = StockDataClient("key", "secret", mocker.MagicMock(), mocker.MagicMock(), 5, bar_cache=BarCache(str(tmp_path / "bars.sqlite3")), indicators=["ema:4"])
+    client.fetch_bars = mocker.MagicMock(return_value=make_columns(0, 30))
+    client.load_bars("TSLA", NOW, 1)
+
+    client.fetch_raw_bars = mocker.MagicMock(return_value=make_columns(29, 40))
+    compute = mocker.spy(client.processor, "compute_indicators")
+    bars = client.load_bars("TSLA", NOW, 1)
+
+    assert compute.call_count == 1
+    assert bars.to_points() == DataProcessor(["ema:4"]).compute_indicators(make_columns(0, 40)).to_points()
@@ -0,0 +1,61 @@
+import pytest
+from server.bars import BarColumns, BarSeries
+from server.models import FinancialDataPoint
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def make_point(i):
+    return FinancialDataPoint(close=100 + i, high=101 + i, low=99 + i, open=100 + i, timestamp=START + timedelta(minutes=i), tradeCount=i, volume=10 * i)
+
+
+def test_series_keeps_newest_bars_in_order():
+    series = BarSeries(4)
+    for i in range(10):
+        series.append(make_point(i))
+
+    assert len(series) == 4
+    assert series.window(10).close.tolist() == [106, 107, 108, 109]
+    assert series.window(2).close.tolist() == [108, 109]
+    assert series.last_timestamp() == START + timedelta(minutes=9)
+
+
+def test_window_is_a_view():
+    series = BarSeries(4)
+    for i in range(6):
+        series.append(make_point(i))
+
+    assert series.window(3).close.base is not None
+
+
+def test_extend_matches_append():
+    appended = BarSeries(5)
+    extended = BarSeries(5)
+    points = [make_point(i) for i in range(8)]
+    for point in points[:3]:
+        appended.append(point)
+        extended.append(point)
+    for point in points[3:]:
+        appended.append(point)
+    extended.extend(BarColumns.from_points(points[3:]))
+
+    assert extended.to_points(5) == appended.to_points(5)
+    assert extended.to_points(5)[-1] == points[-1]
+
+
+def test_series_keeps_indicator_table():
+    series = BarSeries(3, ("ema4",))
+    points = [replace(make_point(i), indicators={"ema4": 50.0 + i}) for i in range(5)]
+    series.append(points[0])
+    series.extend(BarColumns.from_points(points[1:]))
+
+    assert series.window(3).indicators[:, 0].tolist() == [52.0, 53.0, 54.0]
+    assert series.to_points(3) == points[2:]
+    assert BarColumns.concat([BarColumns.from_points(points[:2]), BarColumns.empty(1)]).indicator_names == ()
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError, match="capacity must be a positive integer"):
+        BarSeries(0)
@@ -0,0 +1,13 @@
+from benchmarks.run import compare, fanout_broadcast, handler_tick, measure
+
+
+def test_compare_flags_only_slowdowns_beyond_the_threshold():
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    results = {"a": 1.2, "b": 1.3, "c": 0.5, "d": 9.0}
+
+    assert compare(results, baseline, 0.25) == ["b"]
+
+
+def test_hot_path_benchmarks_run():
+    assert measure(lambda: handler_tick(2, 100, ticks=10), rounds=1, min_time=0) > 0
+    assert measure(lambda: fanout_broadcast(3, messages=5), rounds=1, min_time=0) > 0
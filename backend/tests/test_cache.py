@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from server.models import Cache
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return []
+
+    cache = Cache(60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_load(loader), range(8)))
+
+    assert results == [[]] * 8
+    assert len(calls) == 1
+    # An empty list is a cached value, not a miss.
+    assert cache.get_or_load(loader) == []
+    assert len(calls) == 1
+
+
+def test_stale_value_is_served_while_revalidating():
+    release = threading.Event()
+    cache = Cache(1, stale_seconds=60)
+    cache.set("old")
+    cache.last_updated -= 2
+
+    def loader():
+        release.wait(1)
+        return "new"
+
+    assert cache.get_or_load(loader) == "old"
+    assert cache.get_or_load(loader) == "old"
+    release.set()
+    time.sleep(0.05)
+    assert cache.get_or_load(loader) == "new"
+
+
+def test_invalidate_forces_a_fresh_load_and_drops_older_results():
+    release = threading.Event()
+    cache = Cache(60, stale_seconds=0)
+    values = iter(["before", "after"])
+
+    def slow_loader():
+        release.wait(1)
+        return next(values)
+
+    worker = threading.Thread(target=cache.get_or_load, args=(slow_loader,))
+    worker.start()
+    time.sleep(0.02)
+    cache.invalidate()
+    release.set()
+    worker.join()
+
+    assert cache.get() is None
+    assert cache.get_or_load(slow_loader) == "after"
+
+
+def test_waiters_give_up_on_a_hung_load_and_a_failed_refresh_is_cleared():
+    release = threading.Event()
+    cache = Cache(60, wait_seconds=0.05)
+    owner = threading.Thread(target=cache.get_or_load, args=(lambda: release.wait(1) and "hung",))
+    owner.start()
+    time.sleep(0.02)
+
+    with pytest.raises(TimeoutError):
+        cache.get_or_load(lambda: "unused")
+    assert cache.loading is None
+    release.set()
+    owner.join()
+
+    def submit(*args):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    stale = Cache(1, stale_seconds=60, submit=submit)
+    stale.set("old")
+    stale.last_updated -= 2
+    assert stale.get_or_load(lambda: "new") == "old"
+    assert stale.loading is None
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from server.decision_scheduler import DecisionRequest, DecisionScheduler
+from server.models import FinancialDataPoint
+from datetime import datetime, timezone
+
+
+def point(close):
+    return FinancialDataPoint(close=close, high=close, low=close, open=close, timestamp=datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc), tradeCount=1, volume=1)
+
+
+def test_newer_bar_replaces_queued_decision_and_symbol_runs_one_at_a_time():
+    async def run():
+        seen = []
+        running = set()
+        overlapped = []
+
+        async def handler(request):
+            overlapped.append(request.symbol in running)
+            running.add(request.symbol)
+            seen.append((request.symbol, request.data_point.close))
+            await asyncio.sleep(0.05)
+            running.discard(request.symbol)
+
+        scheduler = DecisionScheduler(handler, workers=2)
+        scheduler.start()
+        deadline = time.monotonic() + 5
+        await scheduler.submit(DecisionRequest("TSLA", point(1), deadline))
+        await asyncio.sleep(0.01)
+        await scheduler.submit(DecisionRequest("TSLA", point(2), deadline))
+        await scheduler.submit(DecisionRequest("TSLA", point(3), deadline))
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return seen, overlapped
+
+    seen, overlapped = asyncio.run(run())
+    assert seen == [("TSLA", 1), ("TSLA", 3)]
+    assert not any(overlapped)
+
+
+def test_expired_decision_is_skipped():
+    async def run():
+        seen = []
+
+        async def handler(request):
+            seen.append(request.symbol)
+
+        scheduler = DecisionScheduler(handler, workers=1)
+        await scheduler.submit(DecisionRequest("TSLA", point(1), time.monotonic() - 1))
+        await scheduler.submit(DecisionRequest("AAPL", point(1), time.monotonic() + 5))
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return seen
+
+    assert asyncio.run(run()) == ["AAPL"]
+
+
+def test_missed_deadlines_do_not_exceed_the_worker_limit():
+    async def run():
+        running = []
+        peak = []
+
+        async def handler(request):
+            running.append(request.symbol)
+            peak.append(len(running))
+            await asyncio.sleep(0.1)
+            running.remove(request.symbol)
+
+        scheduler = DecisionScheduler(handler, workers=2)
+        scheduler.start()
+        for index in range(10):
+            await scheduler.submit(DecisionRequest(f"SYM{index}", point(1), time.monotonic() + 0.01 + index * 0.02))
+        await asyncio.wait_for(scheduler.join(), 5)
+        await scheduler.stop()
+        return peak
+
+    peak = asyncio.run(run())
+    assert peak and max(peak) <= 2
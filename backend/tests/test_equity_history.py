@@ -0,0 +1,62 @@
+import threading
+import time
+from alpaca.trading.models import PortfolioHistory
+from server.equity_history import EquityHistory
+from server.tradingClient import TradingDataClient
+
+
+def test_merge_replaces_overlap_and_stays_bounded():
+    history = EquityHistory("1Min", "1D", capacity=3)
+    history.merge([60, 120, 180], [1.0, 2.0, 3.0])
+    history.merge([180, 240], [3.5, 4.0])
+
+    assert list(history.points) == [(120, 2.0), (180, 3.5), (240, 4.0)]
+    assert history.last_timestamp() == 240
+
+
+def test_history_is_extended_from_the_last_point(mocker):
+    mock_trading_client = mocker.patch('server.tradingClient.TradingClient').return_value
+    mock_trading_client.get_portfolio_history.side_effect = [
+        PortfolioHistory(timestamp=[60, 120], equity=[1.0, 2.0], profit_loss=[0, 0], profit_loss_pct=[0, 0], base_value=1.0, timeframe="1Min"),
+        PortfolioHistory(timestamp=[120, 180], equity=[2.5, 3.0], profit_loss=[0, 0], profit_loss_pct=[0, 0], base_value=1.0, timeframe="1Min"),
+    ]
+    client = TradingDataClient("key", "secret")
+    history = client.equity_histories["one"]
+
+    client.update_equity_history(history)
+    points = client.update_equity_history(history)
+
+    first, second = [call.args[0] for call in mock_trading_client.get_portfolio_history.call_args_list]
+    assert first.period == "1D" and first.start is None
+    assert second.period is None and second.start.timestamp() == 120
+    assert [point["equity"] for point in points] == [1.0, 2.5, 3.0]
+
+
+def test_overlapping_loads_after_invalidation_merge_in_turn(mocker):
+    mock_trading_client = mocker.patch('server.tradingClient.TradingClient').return_value
+    responses = iter([([60, 120], [1.0, 2.0]), ([120, 180], [2.5, 3.0])])
+    active = []
+    overlapped = []
+
+    def get_portfolio_history(request):
+        active.append(request)
+        overlapped.append(len(active) > 1)
+        timestamps, equity = next(responses)
+        time.sleep(0.05)
+        active.remove(request)
+        return PortfolioHistory(timestamp=timestamps, equity=equity, profit_loss=[0, 0], profit_loss_pct=[0, 0], base_value=1.0, timeframe="1Min")
+
+    mock_trading_client.get_portfolio_history.side_effect = get_portfolio_history
+    client = TradingDataClient("key", "secret")
+
+    first = threading.Thread(target=client.get_account_value_for, args=("one",))
+    first.start()
+    time.sleep(0.01)
+    client.invalidate_account_state()
+    points = client.get_account_value_for("one")
+    first.join()
+
+    second = mock_trading_client.get_portfolio_history.call_args_list[1].args[0]
+    assert not any(overlapped)
+    assert second.start.timestamp() == 120
+    assert [point["equity"] for point in points] == [1.0, 2.5, 3.0]
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import msgpack
+from server.fanout import ClientRegistry
+from server.models import FinancialDataPoint, SeriesUpdate
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append(msgpack.unpackb(data))
+
+    async def close(self):
+        self.closed = True
+
+
+def update(version, minute, close):
+    point = FinancialDataPoint(close=close, high=close, low=close, open=close, timestamp=START + timedelta(minutes=minute), tradeCount=1, volume=1)
+    return SeriesUpdate("TSLA", version, {"one": [point]})
+
+
+def test_slow_client_gets_coalesced_deltas():
+    async def run():
+        registry = ClientRegistry(max_pending=2, stall_timeout=1)
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        registry.add(fast, "TSLA")
+        registry.add(slow, "TSLA")
+        for version, (minute, close) in enumerate([(0, 1), (0, 2), (1, 3), (1, 4), (2, 5)], start=1):
+            registry.broadcast(update(version, minute, close))
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.3)
+        return fast, slow
+
+    fast, slow = asyncio.run(run())
+
+    assert [message["seq"] for message in fast.sent] == [1, 2, 3, 4, 5]
+    assert len(slow.sent) < 5
+    for previous, message in zip(slow.sent, slow.sent[1:]):
+        assert message["prev"] == previous["seq"]
+    assert slow.sent[-1]["seq"] == 5
+    closes = {bar["timestamp"]: bar["close"] for message in slow.sent for bar in message["data"]["one"]}
+    assert list(closes.values()) == [2, 4, 5]
+
+
+def test_stalled_client_is_dropped():
+    async def run():
+        registry = ClientRegistry(max_pending=4, stall_timeout=0.05)
+        stalled = FakeWebSocket(delay=1)
+        client = registry.add(stalled, "TSLA")
+        registry.broadcast(update(1, 0, 1))
+        await asyncio.sleep(0.2)
+        registry.broadcast(update(2, 0, 2))
+        return client, registry
+
+    client, registry = asyncio.run(run())
+
+    assert client.closed
+    assert not registry.clients["TSLA"]
+
+
+def test_clients_get_their_negotiated_encoding():
+    async def run():
+        registry = ClientRegistry()
+        text, binary = FakeWebSocket(), FakeWebSocket()
+        registry.add(text, "TSLA")
+        registry.add(binary, "TSLA", "msgpack")
+        registry.broadcast(update(1, 0, 7))
+        await asyncio.sleep(0.05)
+        return text, binary
+
+    text, binary = asyncio.run(run())
+
+    assert text.sent[0]["data"]["one"][0]["close"] == 7
+    assert binary.sent[0]["seq"] == 1
+    assert binary.sent[0]["data"]["one"]["close"] == [7]
+    assert binary.sent[0]["data"]["one"]["timestamp"] == [int(START.timestamp() * 1000)]
+
+
+def test_delta_is_folded_into_a_queued_snapshot_when_the_outbox_is_full():
+    async def run():
+        registry = ClientRegistry(max_pending=1, stall_timeout=1)
+        slow = FakeWebSocket(delay=0.05)
+        client = registry.add(slow, "TSLA")
+        registry.broadcast(update(1, 0, 1))
+        await asyncio.sleep(0.01)
+        client.send_snapshot(update(2, 0, 2), json.dumps({"type": "snapshot", "symbol": "TSLA", "seq": 2, "data": {}}))
+        registry.broadcast(update(2, 0, 2))
+        registry.broadcast(update(3, 1, 3))
+        await asyncio.sleep(0.2)
+        return client.closed, slow
+
+    closed, slow = asyncio.run(run())
+
+    assert not closed
+    assert [(message["type"], message["seq"]) for message in slow.sent] == [("delta", 1), ("snapshot", 3)]
+    assert [bar["close"] for bar in slow.sent[-1]["data"]["one"]] == [2, 3]
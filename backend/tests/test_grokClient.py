@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from server.grokClient import GrokAPIClient
+
+
+def call(name, arguments):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_reads_run_in_parallel_and_results_keep_call_order(mocker):
+    mocker.patch('server.grokClient.create_client')
+    trading_client = mocker.MagicMock()
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def get_options(underlying_symbol, *args):
+        with lock:
+            active.append(underlying_symbol)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(underlying_symbol)
+        return f"options {underlying_symbol}"
+
+    trading_client.get_options.side_effect = get_options
+    trading_client.buy_option.return_value = "bought"
+    client = GrokAPIClient("key", trading_client, disable=False)
+
+    options = '{"underlying_symbol": "%s", "strike_price_gte": "1", "strike_price_lte": "2", "option_type": "CALL", "expiration_date_gte": "2025-01-02"}'
+    results = client.run_tools([call("get_options", options % "TSLA"), call("get_options", options % "AAPL"), call("buy_option", '{"symbol": "X", "quantity": 1, "stop_price": 1, "profit_price": 2}')], "TSLA")
+
+    assert results == ["options TSLA", "options AAPL", "bought"]
+    assert max(peak) == 2
+
+
+def test_reads_after_an_order_see_its_effect(mocker):
+    mocker.patch('server.grokClient.create_client')
+    trading_client = mocker.MagicMock()
+    account = {"cash": 100}
+
+    def buy_option(*args):
+        time.sleep(0.05)
+        account["cash"] = 0
+        return "bought"
+
+    trading_client.buy_option.side_effect = buy_option
+    trading_client.get_account_info.side_effect = lambda: dict(account)
+    client = GrokAPIClient("key", trading_client, disable=False)
+
+    results = client.run_tools([call("get_account_info", "{}"), call("buy_option", '{"symbol": "X", "quantity": 1, "stop_price": 1, "profit_price": 2}'), call("get_account_info", "{}")], "TSLA")
+
+    assert results == ["{'cash': 100}", "bought", "{'cash': 0}"]
+
+
+def test_orders_are_refused_after_the_deadline(mocker):
+    mocker.patch('server.grokClient.create_client')
+    trading_client = mocker.MagicMock()
+    client = GrokAPIClient("key", trading_client, disable=False)
+
+    results = client.run_tools([call("close_option", '{"symbol": "X", "quantity": 1}')], "TSLA", deadline=time.monotonic() - 1)
+
+    assert results == ["Order was not placed because the decision took too long."]
+    trading_client.sell_option.assert_not_called()
+
+
+def test_tool_pool_is_sized_from_settings_and_closed(mocker):
+    mocker.patch('server.grokClient.create_client')
+    client = GrokAPIClient("key", mocker.MagicMock(), disable=False, tool_workers=1)
+
+    assert client.tool_executor._max_workers == 1
+    client.close()
+    with pytest.raises(RuntimeError):
+        client.tool_executor.submit(print)
@@ -0,0 +1,144 @@
+import pytest
+from server.models import FinancialDataPoint
+from server.data_processor import DataProcessor
+from server.bars import BarColumns
+from server.indicators import INDICATORS, Indicator, IndicatorEngine, moving_average_series, parse_indicators, register_indicator, relative_strength_index_series, session_keys
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+CLOSES = [300, 350, 350, 400, 370, 365, 365, 380, 390, 385, 360, 355, 370, 372, 371, 390]
+
+
+def make_points(closes):
+    return [FinancialDataPoint(close=c, high=c, low=c, open=c, timestamp=datetime.now(), tradeCount=1, volume=100) for c in closes]
+
+
+def reference_moving_average(closes, periods):
+    return sum(closes[-periods:]) / periods if len(closes) >= periods else closes[-1]
+
+
+def reference_rsi(closes, periods):
+    # The textbook definition over the last `periods` closes, written out plainly.
+    window = closes[-periods:]
+    changes = [b - a for a, b in zip(window, window[1:])]
+    if not changes:
+        return 50.0
+    gains = sum(change for change in changes if change > 0)
+    losses = sum(-change for change in changes if change < 0)
+    return 100.0 if losses == 0 else 100 - 100 / (1 + gains / losses)
+
+
+def apply_engine(processor, data):
+    engine = processor.create_engine()
+    for data_point in data:
+        processor.apply_kpi(data_point, engine)
+    return engine
+
+
+def test_engine_matches_reference_definitions():
+    processor = DataProcessor()
+    data = make_points(CLOSES)
+    apply_engine(processor, data)
+
+    for i, data_point in enumerate(data):
+        window = CLOSES[: i + 1]
+        assert data_point.fivePeriodMovingAverage == pytest.approx(reference_moving_average(window, 5))
+        assert data_point.tenPeriodMovingAverage == pytest.approx(reference_moving_average(window, 10))
+        assert data_point.sixPeriodRsi == pytest.approx(reference_rsi(window, 6))
+
+
+def test_series_match_reference_definitions():
+    assert moving_average_series(CLOSES, 3)[4] == pytest.approx(reference_moving_average(CLOSES[:5], 3))
+    assert relative_strength_index_series(CLOSES, 4).tolist() == pytest.approx([reference_rsi(CLOSES[: i + 1], 4) for i in range(len(CLOSES))])
+
+
+def test_peek_does_not_change_state():
+    engine = IndicatorEngine().seed(CLOSES)
+    peeked = engine.peek(400)
+
+    assert engine.peek(400) == peeked
+    assert engine.update(400) == pytest.approx(peeked)
+
+
+def test_seeded_engine_continues_series():
+    processor = DataProcessor()
+    data = make_points(CLOSES)
+    full = apply_engine(processor, data[:-1])
+    seeded = processor.create_engine(CLOSES[:-1])
+
+    assert seeded.update(CLOSES[-1]) == pytest.approx(full.update(CLOSES[-1]))
+
+
+def test_vectorized_backfill_matches_engine():
+    processor = DataProcessor()
+    data = make_points(CLOSES)
+    apply_engine(processor, data)
+    columns = BarColumns.empty(len(CLOSES))
+    columns.close[:] = CLOSES
+    processor.compute_indicators(columns)
+
+    assert columns.fivePeriodMovingAverage.tolist() == pytest.approx([p.fivePeriodMovingAverage for p in data])
+    assert columns.tenPeriodMovingAverage.tolist() == pytest.approx([p.tenPeriodMovingAverage for p in data])
+    assert columns.sixPeriodRsi.tolist() == pytest.approx([p.sixPeriodRsi for p in data])
+
+
+EXTRAS = ["ema:4", "macd:3:6:4", "bollinger:5:2", "atr:4", "vwap", "sma:3", "rsi:4"]
+
+
+def make_bars(closes):
+    # Starts an hour before the New York midnight, so VWAP has to restart part way through.
+    start = datetime(2025, 1, 3, 4, 0, tzinfo=timezone.utc)
+    return [
+        FinancialDataPoint(close=c, high=c + 4, low=c - 3 - i % 3, open=c - 1, timestamp=start + timedelta(minutes=5 * i), tradeCount=1, volume=100 + 10 * i)
+        for i, c in enumerate(closes)
+    ]
+
+
+def test_configured_indicators_match_vectorized():
+    processor = DataProcessor(EXTRAS)
+    data = make_bars(CLOSES)
+    engine = processor.create_engine()
+    live = [processor.apply_kpi(replace(point), engine) for point in data]
+    columns = processor.compute_indicators(BarColumns.from_points(data))
+
+    assert columns.indicator_names == engine.names == tuple(live[0].indicators)
+    for point, row in zip(live, columns.indicators.tolist()):
+        assert list(point.indicators.values()) == pytest.approx(row)
+    assert len(set(session_keys(columns.timestamp).tolist())) == 2
+
+
+def test_configured_peek_does_not_change_state():
+    processor = DataProcessor(EXTRAS)
+    data = make_bars(CLOSES)
+    engine = processor.create_engine(BarColumns.from_points(data[:-1]))
+    peeked = engine.peek_point(data[-1])
+
+    assert engine.peek_point(data[-1]) == peeked
+    assert engine.update_point(data[-1]) == (pytest.approx(peeked[0]), pytest.approx(peeked[1]))
+
+
+def test_parse_indicators_rejects_bad_specs():
+    with pytest.raises(ValueError, match="Unknown indicator"):
+        parse_indicators(["kama:10"])
+    with pytest.raises(ValueError, match="Invalid indicator"):
+        parse_indicators(["ema:0"])
+    with pytest.raises(ValueError, match="Invalid indicator"):
+        parse_indicators(["macd:26:12:9"])
+    with pytest.raises(ValueError, match="already computed"):
+        parse_indicators(["sma:5"])
+
+
+def test_incomplete_indicator_fails_when_parsed(monkeypatch):
+    class NoSeries(Indicator):
+        outputs = ("half",)
+
+        def update(self, tick):
+            return (tick.close / 2,)
+
+        def peek(self, tick):
+            return (tick.close / 2,)
+
+    monkeypatch.setattr("server.indicators.INDICATORS", dict(INDICATORS))
+    register_indicator("half", NoSeries)
+    with pytest.raises(ValueError, match="Invalid indicator 'half'"):
+        parse_indicators(["half"])
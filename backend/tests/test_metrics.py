@@ -0,0 +1,37 @@
+from server.metrics import MetricsRegistry, instrument, metrics
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", labels={"method": "get"}).inc(2)
+    registry.counter("requests_total", "Requests", labels={"method": "post"}).inc()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert lines.count("# TYPE requests_total counter") == 1
+    assert 'requests_total{method="get"} 2.0' in lines
+    assert 'requests_total{method="post"} 1.0' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_instrumented_client_times_calls_by_method(mocker):
+    client = mocker.MagicMock()
+    client.get_account.return_value = "account"
+    client.submit_order.side_effect = RuntimeError("rejected")
+    wrapped = instrument(client, "test")
+
+    assert wrapped.get_account() == "account"
+    try:
+        wrapped.submit_order()
+    except RuntimeError:
+        pass
+
+    text = metrics.render()
+    assert 'rest_request_seconds_count{client="test",method="get_account"} 1' in text
+    assert 'rest_request_errors_total{client="test",method="submit_order"} 1.0' in text
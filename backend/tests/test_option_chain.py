@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+from server.async_executor import AsyncExecutor
+from server.option_chain import OptionChainIndex, underlying_of
+
+TODAY = date.today()
+
+
+def contract(option_type, days, strike):
+    expiry = TODAY + timedelta(days=days)
+    return SimpleNamespace(symbol=f"TSLA{expiry:%y%m%d}{option_type[0]}{int(strike * 1000):08d}", type=option_type, expiration_date=expiry, strike_price=strike)
+
+
+CONTRACTS = [contract(option_type, days, strike) for option_type in ("CALL", "PUT") for days in (14, 2, 7) for strike in (260, 240, 250, 270)]
+
+
+def build_index(max_age=300):
+    calls = []
+
+    def fetch(underlying, horizon):
+        calls.append(underlying)
+        return CONTRACTS
+
+    index = OptionChainIndex(fetch, AsyncExecutor(max_workers=1), max_age=max_age, horizon_days=30)
+    return index, calls
+
+
+def test_range_query_is_ordered_by_expiration_then_strike():
+    index, calls = build_index()
+    index.refresh("TSLA")
+
+    found = index.query("TSLA", "CALL", 245, 260, TODAY + timedelta(days=3), limit=3)
+
+    assert [(item.expiration_date - TODAY).days for item in found] == [7, 7, 14]
+    assert [item.strike_price for item in found] == [250, 260, 250]
+    assert all(item.type == "CALL" for item in found)
+    assert calls == ["TSLA"]
+
+
+def test_missing_stale_or_out_of_range_chain_falls_back():
+    index, _ = build_index()
+    assert index.query("TSLA", "PUT", 0, 1000, TODAY) is None
+    index.executor.executor.shutdown(wait=True)
+    assert index.query("TSLA", "PUT", 0, 1000, TODAY + timedelta(days=60)) is None
+
+    index, _ = build_index(max_age=1)
+    index.refresh("TSLA")
+    index.chains["TSLA"].fetched_at -= 2
+    assert index.query("TSLA", "PUT", 0, 1000, TODAY) is None
+
+
+def test_rejected_order_invalidates_the_underlying():
+    index, calls = build_index()
+    index.refresh("TSLA")
+    index.invalidate(CONTRACTS[0].symbol)
+    index.executor.executor.shutdown(wait=True)
+
+    assert underlying_of(CONTRACTS[0].symbol) == "TSLA"
+    assert calls == ["TSLA", "TSLA"]
+    assert index.query("TSLA", "PUT", 0, 1000, TODAY) is not None
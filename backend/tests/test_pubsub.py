@@ -0,0 +1,139 @@
+import asyncio
+import orjson
+from datetime import datetime, timedelta, timezone
+
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.pubsub import Publisher, SeriesMirror, Subscriber
+from server.serialization import encode_update
+from server.snapshot_cache import BOOT_ID, SnapshotCache
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def make_point(i, close=100.0):
+    return FinancialDataPoint(close=close, high=close, low=close, open=close, timestamp=START + timedelta(minutes=i), tradeCount=1, volume=10, indicators={"ema4": close})
+
+
+class Source:
+    symbols = ["TSLA"]
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.ready.set()
+
+    def get_settings(self):
+        return {"interval": 5, "symbols": self.symbols}
+
+    async def get_current_data(self, symbol):
+        return SeriesUpdate(symbol, 1, {"one": [make_point(0), make_point(1)]})
+
+
+async def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def test_worker_follows_snapshot_and_deltas(tmp_path):
+    async def run():
+        publisher = Publisher(str(tmp_path / "pubsub.sock"), Source())
+        await publisher.start()
+        mirror, received, restarts, snapshots = SeriesMirror(), [], [], []
+
+        async def on_update(update):
+            received.append(update)
+
+        subscriber = Subscriber(publisher.path, mirror, on_update, restarts.append, retry_delay=0.01, on_snapshot=snapshots.append)
+        task = asyncio.create_task(subscriber.run())
+        await wait_for(lambda: mirror.get_version("TSLA") == 1)
+        publisher.publish(SeriesUpdate("TSLA", 2, {"one": [make_point(1, 101.0), make_point(2, 102.0)]}))
+        await wait_for(lambda: received)
+        task.cancel()
+        await publisher.stop()
+        return mirror, received, restarts, snapshots
+
+    mirror, received, restarts, snapshots = asyncio.run(run())
+    snapshot = asyncio.run(mirror.get_current_data("TSLA"))
+
+    assert mirror.get_settings() == {"interval": 5, "symbols": ["TSLA"]} and restarts == [BOOT_ID]
+    assert mirror.status == "ready" and snapshots == ["TSLA"]
+    assert [update.version for update in received] == [2]
+    assert snapshot.version == 2
+    assert [point.close for point in snapshot.data["one"]] == [100.0, 101.0, 102.0]
+    assert snapshot.data["one"][-1] == make_point(2, 102.0)
+
+
+def test_mirror_skips_old_deltas_and_keeps_the_window():
+    mirror = SeriesMirror(window=2)
+    mirror.apply(orjson.loads(encode_update("snapshot", SeriesUpdate("TSLA", 5, {"one": [make_point(0), make_point(1)]}))))
+
+    assert mirror.apply(orjson.loads(encode_update("delta", SeriesUpdate("TSLA", 5, {"one": [make_point(2)]})))) is None
+    assert mirror.apply(orjson.loads(encode_update("delta", SeriesUpdate("TSLA", 6, {"one": [make_point(2)]})))) is not None
+    assert [point.timestamp for point in mirror.series["TSLA"].data["one"]] == [START + timedelta(minutes=1), START + timedelta(minutes=2)]
+    assert mirror.apply(orjson.loads(encode_update("delta", SeriesUpdate("AAPL", 1, {"one": [make_point(0)]})))) is None
+
+
+def test_restarted_ingestion_replaces_the_old_series():
+    mirror, cache = SeriesMirror(), SnapshotCache()
+    settings = {"interval": 5, "symbols": ["TSLA"]}
+    mirror.apply({"type": "settings", "bootId": "old", "data": settings})
+    mirror.apply(orjson.loads(encode_update("snapshot", SeriesUpdate("TSLA", 5000, {"one": [make_point(0)]}))))
+    cache.reset("old")
+    cache.store(asyncio.run(mirror.get_current_data("TSLA")))
+
+    mirror.apply({"type": "settings", "bootId": "new", "data": settings})
+    cache.reset("new")
+
+    assert mirror.status == "warming" and mirror.get_version("TSLA") is None
+    mirror.apply(orjson.loads(encode_update("snapshot", SeriesUpdate("TSLA", 1, {"one": [make_point(1)]}))))
+    cache.discard("TSLA")
+    assert mirror.status == "ready"
+    assert cache.store(asyncio.run(mirror.get_current_data("TSLA"))).etag == '"TSLA-new-1"'
+
+
+def test_worker_that_stops_reading_is_cut_off(tmp_path):
+    async def run():
+        publisher = Publisher(str(tmp_path / "pubsub.sock"), Source(), max_pending=4)
+        await publisher.start()
+        reader, writer = await asyncio.open_unix_connection(publisher.path)
+        await wait_for(lambda: publisher.subscriptions)
+        (subscription,) = publisher.subscriptions
+        update = SeriesUpdate("TSLA", 2, {"one": [make_point(i) for i in range(2000)]})
+        while publisher.subscriptions:
+            publisher.publish(update)
+            await asyncio.sleep(0)
+        # Its socket is closed even though the write loop was blocked on a full buffer.
+        await wait_for(subscription.writer.is_closing)
+        writer.close()
+        await publisher.stop()
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+
+
+def test_subscriber_reconnects_after_a_failing_update(tmp_path):
+    async def run():
+        publisher = Publisher(str(tmp_path / "pubsub.sock"), Source())
+        await publisher.start()
+        mirror, received = SeriesMirror(), []
+
+        async def on_update(update):
+            received.append(update.version)
+            if len(received) == 1:
+                raise ValueError("cannot encode")
+
+        subscriber = Subscriber(publisher.path, mirror, on_update, retry_delay=0.01)
+        task = asyncio.create_task(subscriber.run())
+        await wait_for(lambda: mirror.get_version("TSLA") == 1)
+        publisher.publish(SeriesUpdate("TSLA", 2, {"one": [make_point(2)]}))
+        await wait_for(lambda: received and not subscriber.connected.is_set())
+        await wait_for(lambda: subscriber.connected.is_set() and publisher.subscriptions)
+        await wait_for(lambda: mirror.get_version("TSLA") == 1)
+        publisher.publish(SeriesUpdate("TSLA", 3, {"one": [make_point(3)]}))
+        await wait_for(lambda: len(received) == 2)
+        task.cancel()
+        await publisher.stop()
+        return received
+
+    assert asyncio.run(run()) == [2, 3]
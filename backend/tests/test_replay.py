@@ -0,0 +1,28 @@
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from server.replay import read_bars, run_replay, write_bars
+from server.simulation import SimulatedBroker
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def recorded_bars(count):
+    for minute in range(count):
+        close = 250 + 10 * math.sin(minute / 40)
+        yield {"T": "b", "S": "TSLA", "o": close, "h": close + 0.5, "l": close - 0.5, "c": close, "v": 100, "n": 5, "t": (START + timedelta(minutes=minute)).isoformat()}
+
+
+def test_replay_drives_the_pipeline_and_reports_pnl(tmp_path):
+    path = str(tmp_path / "bars.jsonl")
+    assert write_bars(path, recorded_bars(600)) == 600
+    broker = SimulatedBroker(cash=10000)
+
+    report = asyncio.run(run_replay(read_bars(path), interval=5, broker=broker))
+
+    assert report.bars == 600
+    assert report.bars_per_second > 0
+    # One decision per 5 minute boundary once 15 sealed bars exist.
+    assert report.decisions == 600 // 5 - 15
+    assert report.trades > 0
+    assert math.isclose(report.pnl, broker.equity() - 10000)
@@ -0,0 +1,58 @@
+import pytest
+from server.data_processor import DataProcessor
+from server.models import FinancialDataPoint
+from server.resampler import Resampler, bucket_start
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+def make_bar(minute, open_, high, low, close, volume=10):
+    return FinancialDataPoint(close=close, high=high, low=low, open=open_, timestamp=START + timedelta(minutes=minute), tradeCount=1, volume=volume)
+
+
+def test_rolls_up_ohlcv_within_bucket():
+    resampler = Resampler(15, DataProcessor(), 10)
+    resampler.add(make_bar(0, 100, 102, 99, 101))
+    resampler.add(make_bar(1, 101, 105, 100, 104))
+    bar = resampler.add(make_bar(2, 104, 104, 97, 98))
+
+    assert len(resampler.series) == 1
+    assert (bar.open, bar.high, bar.low, bar.close, bar.volume, bar.tradeCount) == (100, 105, 97, 98, 30, 3)
+    assert resampler.series.last_point() == bar
+
+
+def test_seals_bar_on_bucket_boundary():
+    resampler = Resampler(15, DataProcessor(), 10)
+    for minute in range(16):
+        resampler.add(make_bar(minute, 100, 101, 99, 100 + minute))
+
+    points = resampler.series.to_points(10)
+    assert [point.timestamp for point in points] == [START, START + timedelta(minutes=15)]
+    assert points[0].close == 114
+    assert points[1].open == 100 and points[1].close == 115
+
+
+def test_in_progress_indicators_match_sealed_values():
+    processor = DataProcessor()
+    resampler = Resampler(1, processor, 10)
+    for minute, close in enumerate([10, 12, 11, 13]):
+        resampler.add(make_bar(minute, close, close, close, close))
+
+    engine = processor.create_engine()
+    expected = [engine.update(close) for close in [10, 12, 11, 13]][-1]
+    last = resampler.series.last_point()
+    assert (last.fivePeriodMovingAverage, last.tenPeriodMovingAverage, last.sixPeriodRsi) == pytest.approx(expected)
+
+
+def test_ignores_bars_behind_watermark():
+    resampler = Resampler(1, DataProcessor(), 10)
+    resampler.watermark = START + timedelta(minutes=1)
+
+    assert resampler.add(make_bar(1, 100, 100, 100, 100)) is None
+    assert resampler.add(make_bar(2, 100, 100, 100, 100)) is not None
+
+
+def test_daily_bucket_uses_exchange_day():
+    assert bucket_start(datetime(2025, 1, 3, 2, 0, tzinfo=timezone.utc), 60 * 24) == datetime(2025, 1, 2, 5, 0, tzinfo=timezone.utc)
+    assert bucket_start(datetime(2025, 1, 2, 14, 44, tzinfo=timezone.utc), 15) == datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc)
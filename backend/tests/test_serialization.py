@@ -0,0 +1,40 @@
+import json
+from server.models import FinancialDataPoint, SeriesUpdate
+from server.serialization import decode_columns, encode_message, encode_update
+from server.snapshot_cache import SnapshotCache
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+POINT = FinancialDataPoint(close=300.5, high=301, low=299, open=300, timestamp=datetime(2025, 1, 2, 14, 31, tzinfo=timezone.utc), tradeCount=3, volume=100)
+
+
+def test_encode_delta_matches_json():
+    message = json.loads(encode_update("delta", SeriesUpdate("TSLA", 7, {"one": [POINT]})))
+
+    assert message["type"] == "delta"
+    assert (message["seq"], message["prev"], message["symbol"]) == (7, 6, "TSLA")
+    assert message["data"]["one"][0]["timestamp"] == POINT.timestamp.isoformat()
+    assert message["data"]["one"][0]["close"] == 300.5
+
+
+def test_snapshot_cache_encodes_once_per_version():
+    cache = SnapshotCache()
+    first = cache.store(SeriesUpdate("TSLA", 3, {"one": [POINT]}))
+
+    assert cache.get("TSLA", 3) is first
+    assert cache.get("TSLA", 4) is None
+    assert json.loads(first.message)["data"] == json.loads(first.body)
+    assert cache.store(SeriesUpdate("TSLA", 4, {"one": []})).etag != first.etag
+
+
+def test_columns_encoding_round_trips_and_is_smaller():
+    points = [replace(POINT, close=300.5 + i, timestamp=POINT.timestamp + timedelta(minutes=i), indicators={"ema4": 1.0 + i}) for i in range(60)]
+    update = SeriesUpdate("TSLA", 7, {"one": points, "day": []})
+    payload = encode_message("delta", update, "columns")
+    header, series = decode_columns(payload)
+
+    assert (header["type"], header["seq"], header["prev"], header["series"]) == ("delta", 7, 6, {"one": 60, "day": 0})
+    assert series["one"]["close"].tolist() == [300.5 + i for i in range(60)]
+    assert series["one"]["ema4"].tolist() == [1.0 + i for i in range(60)]
+    assert series["one"]["timestamp"][0] == POINT.timestamp.timestamp() * 1000
+    assert len(payload) * 2 < len(encode_message("delta", update))
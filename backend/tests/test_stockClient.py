@@ -1,8 +1,13 @@
+import asyncio
+import time
 import pytest
 from server.stockClient import StockDataClient
 from server.models import FinancialDataPoint
 from server.data_processor import DataProcessor
-from datetime import datetime
+from server.indicators import moving_average_series, relative_strength_index_series
+from server.bars import BarColumns
+from server.async_executor import AsyncExecutor
+from datetime import datetime, timedelta, timezone
 
 @pytest.fixture
 def stock_client_setup(mocker):
@@ -39,7 +44,7 @@ def test_calculateMovingAverage(stock_client_setup):
         FinancialDataPoint(close=370, high=370, low=370, open=370, timestamp=datetime.now(), tradeCount=1, volume=100),
     ]
 
-    result = client.processor.calculate_moving_average(mockData, 3)
+    result = moving_average_series([point.close for point in mockData], 3)[-1]
     assert int(result) == 373
 
 def test_calculateRelativeStrengthIndex(stock_client_setup):
@@ -53,7 +58,7 @@ def test_calculateRelativeStrengthIndex(stock_client_setup):
         FinancialDataPoint(close=370, high=370, low=370, open=370, timestamp=datetime.now(), tradeCount=1, volume=100),
     ]
 
-    result = client.processor.calculate_relative_strength_index(mockData, 4)
+    result = relative_strength_index_series([point.close for point in mockData], 4)[-1]
     assert int(result) == 62
 
 def test_invalid_interval(mocker):
@@ -69,3 +74,116 @@ def test_invalid_interval(mocker):
             grok_client=mock_grok_client,
             interval=0
         )
+
+def test_quote_data_handler_sends_delta(stock_client_setup, mocker):
+    client = stock_client_setup['client']
+    client.send_func = mocker.AsyncMock()
+    bar = {"T": "b", "S": "TSLA", "o": 300, "h": 301, "l": 299, "c": 300.5, "v": 100, "n": 3, "t": "2025-01-02T14:31:00Z"}
+
+    async def feed():
+        await client.quote_data_handler(bar)
+        await client.quote_data_handler({**bar, "c": 302, "h": 303, "t": "2025-01-02T14:32:00Z"})
+
+    asyncio.run(feed())
+
+    update = client.send_func.await_args.args[0]
+    assert update.symbol == "TSLA"
+    assert update.version == 2
+    assert set(update.data) == {"one", "fifteen", "hour", "day"}
+    assert [len(bars) for bars in update.data.values()] == [1, 1, 1, 1]
+    assert update.data["fifteen"][0].high == 303
+    assert update.data["fifteen"][0].volume == 200
+
+def test_decision_context_comes_from_live_bars(stock_client_setup, mocker):
+    client = stock_client_setup['client']
+    client.send_func = mocker.AsyncMock()
+    client.scheduler.submit = mocker.AsyncMock()
+    client.load_bars_async = mocker.AsyncMock()
+
+    async def feed():
+        for index in range(17):
+            minute = 30 + index * 5
+            timestamp = f"2025-01-02T{14 + minute // 60:02d}:{minute % 60:02d}:00Z"
+            await client.quote_data_handler({"T": "b", "S": "TSLA", "o": 300, "h": 301, "l": 299, "c": 300 + index, "v": 100, "n": 3, "t": timestamp})
+
+    asyncio.run(feed())
+
+    request = client.scheduler.submit.await_args.args[0]
+    assert len(request.context) == 16
+    assert [bar.close for bar in request.context] == [300 + index for index in range(1, 17)]
+    assert request.context[-1].timestamp == request.data_point.timestamp
+    assert request.context[-1].fivePeriodMovingAverage == sum(range(312, 317)) / 5
+    assert client.scheduler.submit.await_args_list[0].args[0].context is None
+    client.load_bars_async.assert_not_called()
+
+def test_backfill_runs_concurrently_and_marks_ready(stock_client_setup, mocker):
+    client = stock_client_setup['client']
+    client.stream_manager.run_stream = mocker.AsyncMock()
+    client.stream_manager.start_streaming = mocker.AsyncMock()
+    in_flight = []
+    peak = []
+
+    async def load_bars(symbol, now, minutes):
+        in_flight.append(minutes)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(minutes)
+        return BarColumns.empty()
+
+    client.load_bars_async = load_bars
+
+    async def start():
+        assert client.status == "warming"
+        await client.start_streaming()
+        await client.scheduler.stop()
+
+    asyncio.run(start())
+
+    assert client.status == "ready"
+    assert max(peak) == len(peak) == 5
+
+
+def test_backfill_with_more_loads_than_workers(stock_client_setup):
+    client = stock_client_setup['client']
+    client.executor = AsyncExecutor(max_workers=2, timeout=0.3)
+    loads = []
+
+    def load_bars(symbol, now, minutes):
+        loads.append(now.utcoffset())
+        time.sleep(0.2)
+        return BarColumns.empty()
+
+    client.load_bars = load_bars
+
+    async def backfill():
+        await asyncio.gather(*(client.backfill(state) for state in client.states.values()))
+
+    asyncio.run(backfill())
+    client.executor.shutdown()
+
+    assert len(loads) > 4
+    # Bar timestamps are UTC, so a naive local "now" would shift the request window on other hosts.
+    assert set(loads) == {timedelta(0)}
+
+
+def test_catch_up_with_more_symbols_than_workers(mocker):
+    mocker.patch('server.stockClient.StockHistoricalDataClient')
+    symbols = ["TSLA", "AAPL", "NVDA", "MSFT", "AMZN"]
+    client = StockDataClient("key", "secret", mocker.MagicMock(), mocker.MagicMock(), 5, symbols=symbols, executor=AsyncExecutor(max_workers=2, timeout=0.3))
+    fetched = []
+
+    def fetch_bars(symbol, now, interval, start=None):
+        fetched.append((symbol, start))
+        time.sleep(0.2)
+        return BarColumns.empty()
+
+    client.fetch_bars = fetch_bars
+
+    behind = datetime.now(timezone.utc) - timedelta(minutes=5)
+    ahead = behind + timedelta(minutes=3)
+    messages = asyncio.run(client.fetch_missed_bars({"TSLA": ahead, "AAPL": behind}))
+    client.executor.shutdown()
+
+    assert messages == []
+    # Each symbol is caught up from its own last bar, and symbols without one from the oldest.
+    assert sorted(fetched) == sorted([("TSLA", ahead), ("AAPL", behind), ("NVDA", behind), ("MSFT", behind), ("AMZN", behind)])
@@ -0,0 +1,82 @@
+import asyncio
+from server.stream_manager import StreamManager
+
+
+def bar(symbol, minute):
+    return {"T": "b", "S": symbol, "o": 1, "h": 1, "l": 1, "c": 1, "v": 1, "t": f"2025-01-02T14:{minute:02d}:00Z"}
+
+
+def test_full_queue_drops_oldest_message(mocker):
+    manager = StreamManager(mocker.MagicMock(), queue_size=2, workers=1)
+    for minute in range(3):
+        manager.enqueue(bar("TSLA", minute))
+
+    queued = [manager.queues[0].get_nowait()[1]["t"] for _ in range(2)]
+    assert queued == ["2025-01-02T14:01:00Z", "2025-01-02T14:02:00Z"]
+
+
+def test_reconnects_and_backfills_gap_in_order(mocker):
+    manager = StreamManager(mocker.MagicMock(), workers=2)
+    handled = []
+    frames = [[bar("TSLA", 0), bar("AAPL", 0)], ConnectionError("closed"), [bar("TSLA", 3)]]
+
+    async def receive_data():
+        if not frames:
+            await asyncio.sleep(3600)
+        frame = frames.pop(0)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    async def handler(message):
+        handled.append((message["S"], message["t"]))
+
+    async def gap_handler(since):
+        assert since["TSLA"].minute == 0 and since["AAPL"].minute == 0
+        return [bar("TSLA", 1), bar("TSLA", 2)]
+
+    async def run():
+        manager.receive_data = receive_data
+        manager.connect = mocker.AsyncMock()
+        task = asyncio.create_task(manager.start_streaming(handler, gap_handler))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert [t for symbol, t in handled if symbol == "TSLA"] == [f"2025-01-02T14:0{minute}:00Z" for minute in range(4)]
+    assert ("AAPL", "2025-01-02T14:00:00Z") in handled
+    manager.connect.assert_awaited_once()
+
+
+def test_backoff_only_starts_over_after_the_stream_delivered(mocker):
+    manager = StreamManager(mocker.MagicMock(), workers=1)
+    manager.connect = mocker.AsyncMock()
+    sleep = mocker.patch("server.stream_manager.asyncio.sleep", new=mocker.AsyncMock())
+
+    manager.received = True
+    asyncio.run(manager.reconnect(None))
+    asyncio.run(manager.reconnect(None))
+    asyncio.run(manager.reconnect(None))
+    assert [call.args[0] for call in sleep.await_args_list] == [1.0, 2.0]
+
+    manager.received = True
+    asyncio.run(manager.reconnect(None))
+    assert sleep.await_count == 2 and manager.backoff == 1.0
+
+
+def test_gap_backfill_starts_from_each_symbols_last_bar(mocker):
+    manager = StreamManager(mocker.MagicMock(), workers=1)
+    manager.connect = mocker.AsyncMock()
+    for message in [bar("TSLA", 5), bar("AAPL", 2), bar("TSLA", 4)]:
+        manager.enqueue(message)
+    gaps = []
+
+    async def gap_handler(since):
+        gaps.append({symbol: timestamp.minute for symbol, timestamp in since.items()})
+        return []
+
+    manager.received = True
+    asyncio.run(manager.reconnect(gap_handler))
+
+    assert gaps == [{"TSLA": 5, "AAPL": 2}]
@@ -0,0 +1,36 @@
+import json
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from server.grokClient import GrokAPIClient
+from server.tracing import Trace, TraceStore, traces
+
+
+def test_trace_records_tool_and_order_spans(mocker):
+    mocker.patch('server.grokClient.create_client')
+    trading_client = mocker.MagicMock()
+    trading_client.buy_option.return_value = "bought"
+    client = GrokAPIClient("key", trading_client, disable=False)
+    trace = Trace("TSLA", datetime(2025, 1, 2, 14, 30, tzinfo=timezone.utc))
+
+    arguments = '{"symbol": "X", "quantity": 1, "stop_price": 1, "profit_price": 2}'
+    client.run_tools([SimpleNamespace(function=SimpleNamespace(name="buy_option", arguments=arguments))], "TSLA", trace=trace)
+    trace.finish("done")
+
+    assert trading_client.buy_option.call_args.args[-1] is trace
+    assert traces.get(trace.trace_id) is trace
+    details = trace.to_dict()
+    assert details["status"] == "done"
+    assert [span["name"] for span in details["spans"]] == ["tool"]
+    assert details["spans"][0]["tool"] == "buy_option"
+    assert json.dumps(details["spans"][0]["arguments"])
+
+
+def test_store_is_a_bounded_ring_newest_first():
+    store = TraceStore(capacity=2)
+    added = [Trace(symbol, datetime(2025, 1, 2, tzinfo=timezone.utc)) for symbol in ("TSLA", "AAPL", "TSLA")]
+    for trace in added:
+        store.add(trace)
+
+    assert store.get(added[0].trace_id) is None
+    assert store.recent() == [added[2], added[1]]
+    assert store.recent(symbol="TSLA") == [added[2]]
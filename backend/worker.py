@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import app, config, send_message, set_lifespan, set_stock_client, set_trading_client, snapshot_cache
+from server import AsyncExecutor, TradingDataClient, get_logger
+from server.pubsub import SeriesMirror, Subscriber
+
+logger = get_logger(__name__)
+
+# An API worker without ingestion: `uvicorn worker:app --workers 4 --port 8001` next to `python main.py` with
+# PUBSUB_SOCKET set in both. Each worker keeps its own copy of the dashboard series and its own WebSocket clients.
+
+
+@asynccontextmanager
+async def lifespan(_):
+    if not config.pubsub_socket:
+        raise RuntimeError("PUBSUB_SOCKET must be set for API workers")
+    mirror = SeriesMirror()
+    set_stock_client(mirror)
+    set_trading_client(TradingDataClient(config.alpaca_api_key, config.alpaca_secret, AsyncExecutor(config.rest_max_concurrency, config.rest_timeout), config.option_chain_max_age, config.option_chain_days))
+    subscriber = Subscriber(config.pubsub_socket, mirror, send_message, snapshot_cache.reset, on_snapshot=snapshot_cache.discard)
+    task = asyncio.create_task(subscriber.run())
+    logger.info(f"API worker following {config.pubsub_socket}")
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+set_lifespan(lifespan)
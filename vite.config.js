@@ -9,5 +9,6 @@ export default defineConfig({
   define: {
     'process.env.BACKEND_URL': JSON.stringify(process.env.BACKEND_URL),
     'process.env.WEBSOCKET_URL': JSON.stringify(process.env.WEBSOCKET_URL),
+    'process.env.SYMBOL': JSON.stringify(process.env.SYMBOL),
   },
 });
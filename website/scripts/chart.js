@@ -74,24 +74,83 @@ function waitForWebSocketClose(websocket) {
   });
 }
 
+const MAX_POINTS = 60;
+let series = {};
+let lastSeq = null;
+
+function upsertBars(bars, updates) {
+  updates.forEach((bar) => {
+    const index = bars.findIndex((item) => item.timestamp === bar.timestamp);
+    if (index >= 0) {
+      bars[index] = bar;
+    } else {
+      bars.push(bar);
+    }
+  });
+  return bars.slice(-MAX_POINTS);
+}
+
+function applyMessage(websocket, message) {
+  if (message.type === 'snapshot') {
+    series = message.data;
+    lastSeq = message.seq;
+    return true;
+  }
+  if (message.type !== 'delta' || lastSeq === null) {
+    return false;
+  }
+  if (message.seq <= lastSeq) {
+    // Already part of the snapshot, e.g. a delta that raced with it.
+    return false;
+  }
+  if (message.prev > lastSeq) {
+    // A message was missed, so the local series can no longer be trusted.
+    lastSeq = null;
+    websocket.send(JSON.stringify({ type: 'resync' }));
+    return false;
+  }
+  Object.entries(message.data).forEach(([key, bars]) => {
+    series[key] = upsertBars(series[key] || [], bars);
+  });
+  lastSeq = message.seq;
+  return true;
+}
+
+async function fetchSeries() {
+  const url = `${config.BACKEND_URL}/data?symbol=${encodeURIComponent(config.SYMBOL)}`;
+  for (;;) {
+    const response = await fetch(url);
+    if (response.ok) {
+      return response.json();
+    }
+    if (response.status !== 503) {
+      console.error(`Failed to load ${config.SYMBOL}:`, response.status);
+      return null;
+    }
+    // The backend is still backfilling and says when to ask again.
+    const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+    await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+  }
+}
+
 export async function awaitData(interval = null) {
   if (interval) {
     setCurrentInterval(interval);
   }
-  const response = await fetch(`${config.BACKEND_URL}/data`);
-  const initialData = await response.json();
-  const initialChartData = convertData(initialData);
-  await drawChart(initialChartData);
+  const data = await fetchSeries();
+  lastSeq = null;
+  if (data !== null) {
+    series = data;
+    await drawChart(convertData(series));
+  }
 
-  const websocket = new WebSocket(`${config.WEBSOCKET_URL}`);
+  const websocket = new WebSocket(`${config.WEBSOCKET_URL}?symbol=${encodeURIComponent(config.SYMBOL)}`);
 
   websocket.onmessage = async (event) => {
-    const data = event.data;
-    console.log(data);
-    const parsedData = JSON.parse(data);
-    console.log(parsedData);
-    const chartData = convertData(parsedData);
-    await drawChart(chartData);
+    const message = JSON.parse(event.data);
+    if (applyMessage(websocket, message)) {
+      await drawChart(convertData(series));
+    }
   };
 
   await waitForWebSocketClose(websocket);
@@ -1,5 +1,6 @@
 const config = {
   BACKEND_URL: process.env.BACKEND_URL || 'http://localhost:8000',
   WEBSOCKET_URL: process.env.WEBSOCKET_URL || 'ws://localhost:8000/ws',
+  SYMBOL: process.env.SYMBOL || 'TSLA',
 };
 export default config;